@@ -0,0 +1,4 @@
+import time
+
+# Reference point for the boot timings in app.startup: the package is the first thing imported.
+IMPORT_STARTED = time.perf_counter()
@@ -0,0 +1,237 @@
+"""Buffered interaction analytics.
+
+Handlers append one tuple per update to an in-memory ring buffer; a background
+task writes the buffer to the append-only ``interaction_events`` table in bulk
+and rolls finished days up into ``interaction_daily``.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from datetime import time as dt_time
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Date, bindparam, case, delete, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import AsyncSessionLocal, write_lock
+from .models import InteractionDaily, InteractionEvent
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "true").strip().lower() == "true"
+ANALYTICS_BUFFER_SIZE = int(os.getenv("ANALYTICS_BUFFER_SIZE", "10000"))
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "10"))
+ANALYTICS_RETENTION_DAYS = int(os.getenv("ANALYTICS_RETENTION_DAYS", "30"))
+
+MSK_ZONE = ZoneInfo("Europe/Moscow")
+
+# Set by cache-aware code paths (horoscope lookup) for the update being handled.
+_cache_hit: contextvars.ContextVar[bool | None] = contextvars.ContextVar("analytics_cache_hit", default=None)
+
+
+def begin_interaction() -> None:
+    _cache_hit.set(None)
+
+
+def mark_cache_hit(hit: bool) -> None:
+    _cache_hit.set(hit)
+
+
+class InteractionLog:
+    """Fixed-size ring buffer of (timestamp, command, sign, latency_ms, cache_hit) tuples.
+
+    When full, the oldest events are overwritten and counted in ``dropped``.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._events: deque[tuple[float, str, str, float, bool | None]] = deque(maxlen=capacity)
+        self.dropped = 0
+        self.flushed = 0
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def record(self, command: str, sign: str, latency_ms: float, hit: bool | None = None) -> None:
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append((time.time(), command, sign, latency_ms, hit))
+
+    def drain(self) -> list[tuple[float, str, str, float, bool | None]]:
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+    async def flush(self) -> int:
+        """Write buffered events in one INSERT; events of a failed write are dropped."""
+        events = self.drain()
+        if not events:
+            return 0
+        rows = [
+            {
+                "created_at": datetime.fromtimestamp(ts, timezone.utc),
+                "command": command,
+                "sign": sign,
+                "latency_ms": latency_ms,
+                "cache_hit": hit,
+            }
+            for ts, command, sign, latency_ms, hit in events
+        ]
+        try:
+            async with write_lock(), AsyncSessionLocal.begin() as db:
+                await db.execute(insert(InteractionEvent), rows)
+        except Exception as e:
+            self.dropped += len(rows)
+            logger.warning(f"Failed to flush {len(rows)} analytics events: {e}")
+            return 0
+        self.flushed += len(rows)
+        return len(rows)
+
+
+interaction_log = InteractionLog(ANALYTICS_BUFFER_SIZE)
+
+
+def record(command: str, sign: str, latency_ms: float) -> None:
+    if ANALYTICS_ENABLED:
+        interaction_log.record(command, sign, latency_ms, _cache_hit.get())
+
+
+def _day_bounds(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, dt_time.min, MSK_ZONE).astimezone(timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def _aggregate(start: datetime, end: datetime):
+    return (
+        select(
+            InteractionEvent.command,
+            InteractionEvent.sign,
+            func.count().label("events"),
+            func.sum(InteractionEvent.latency_ms).label("latency_ms_total"),
+            func.count(case((InteractionEvent.cache_hit.is_(True), InteractionEvent.id))).label("cache_hits"),
+            func.count(InteractionEvent.cache_hit).label("cache_lookups"),
+        )
+        .where(InteractionEvent.created_at >= start, InteractionEvent.created_at < end)
+        .group_by(InteractionEvent.command, InteractionEvent.sign)
+    )
+
+
+_UPSERT_DAILY = text(
+    "INSERT INTO interaction_daily (day, command, sign, events, latency_ms_total, cache_hits, cache_lookups) "
+    "VALUES (:day, :command, :sign, :events, :latency_ms_total, :cache_hits, :cache_lookups) "
+    "ON CONFLICT (day, command, sign) DO UPDATE SET events = excluded.events, "
+    "latency_ms_total = excluded.latency_ms_total, cache_hits = excluded.cache_hits, "
+    "cache_lookups = excluded.cache_lookups"
+).bindparams(bindparam("day", type_=Date()))
+
+
+async def rollup_day(db: AsyncSession, day: date) -> int:
+    """Recompute the daily rollup of one Moscow calendar day; safe to repeat."""
+    rows = (await db.execute(_aggregate(*_day_bounds(day)))).all()
+    if rows:
+        await db.execute(_UPSERT_DAILY, [{"day": day, **row._mapping} for row in rows])
+    return len(rows)
+
+
+async def prune_events(db: AsyncSession, keep_days: int = ANALYTICS_RETENTION_DAYS) -> None:
+    cutoff, _ = _day_bounds(datetime.now(MSK_ZONE).date() - timedelta(days=keep_days))
+    await db.execute(delete(InteractionEvent).where(InteractionEvent.created_at < cutoff))
+
+
+async def report(db: AsyncSession, days: int = 7) -> dict:
+    """Aggregate the last ``days`` days: rollups for finished days, raw events for today."""
+    today = datetime.now(MSK_ZONE).date()
+    totals: dict[tuple[str, str], list[float]] = {}
+
+    def add(command: str, sign: str, events: int, latency: float, hits: int, lookups: int) -> None:
+        acc = totals.setdefault((command, sign), [0, 0.0, 0, 0])
+        acc[0] += events
+        acc[1] += latency or 0.0
+        acc[2] += hits
+        acc[3] += lookups
+
+    rolled = await db.execute(
+        select(
+            InteractionDaily.command,
+            InteractionDaily.sign,
+            func.sum(InteractionDaily.events),
+            func.sum(InteractionDaily.latency_ms_total),
+            func.sum(InteractionDaily.cache_hits),
+            func.sum(InteractionDaily.cache_lookups),
+        )
+        .where(InteractionDaily.day > today - timedelta(days=days), InteractionDaily.day < today)
+        .group_by(InteractionDaily.command, InteractionDaily.sign)
+    )
+    for row in rolled:
+        add(*row)
+    for row in await db.execute(_aggregate(*_day_bounds(today))):
+        add(*row)
+
+    commands: dict[str, list[float]] = {}
+    signs: dict[str, int] = {}
+    hits = lookups = 0
+    for (command, sign), (events, latency, cmd_hits, cmd_lookups) in totals.items():
+        acc = commands.setdefault(command, [0, 0.0])
+        acc[0] += events
+        acc[1] += latency
+        if sign:
+            signs[sign] = signs.get(sign, 0) + int(events)
+        hits += int(cmd_hits)
+        lookups += int(cmd_lookups)
+    return {
+        "commands": sorted(
+            ((command, int(events), latency / events) for command, (events, latency) in commands.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        ),
+        "signs": sorted(signs.items(), key=lambda item: item[1], reverse=True),
+        "cache_hit_rate": hits / lookups if lookups else None,
+    }
+
+
+async def run_flusher(log: InteractionLog = interaction_log, interval: float = ANALYTICS_FLUSH_SECONDS) -> None:
+    """Flush the buffer every ``interval`` seconds and roll up each finished day once."""
+    rolled_up: date | None = None
+    while True:
+        try:
+            await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            await log.flush()
+            raise
+        await log.flush()
+        yesterday = datetime.now(MSK_ZONE).date() - timedelta(days=1)
+        if rolled_up == yesterday:
+            continue
+        try:
+            async with write_lock(), AsyncSessionLocal.begin() as db:
+                await rollup_day(db, yesterday)
+                await prune_events(db)
+            rolled_up = yesterday
+        except Exception as e:
+            logger.warning(f"Analytics rollup for {yesterday} failed: {e}")
+
+
+_flusher_task: asyncio.Task | None = None
+
+
+def start_flusher() -> None:
+    global _flusher_task
+    if ANALYTICS_ENABLED and _flusher_task is None:
+        _flusher_task = asyncio.create_task(run_flusher())
+
+
+async def stop_flusher() -> None:
+    """Cancel the flusher; it writes what is still buffered before exiting."""
+    global _flusher_task
+    if _flusher_task is None:
+        return
+    _flusher_task.cancel()
+    try:
+        await _flusher_task
+    except asyncio.CancelledError:
+        pass
+    _flusher_task = None
@@ -1,17 +1,53 @@
 import logging
 import os
 
-from aiogram import Bot, types
+from aiogram import Bot
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.types import BotCommand
 
 from .handlers import setup_handlers
+from .inline_reply import InlineReplyMiddleware
+from .lazy_update import LazyUpdate
+from .metrics import BotApiMetricsMiddleware
+from .tracing import BotApiTracingMiddleware
 
 logger = logging.getLogger(__name__)
 
 bot: Bot | None = None
 
 
+class BotApiSession(AiohttpSession):
+    """aiohttp session whose connector keeps a sized pool of keep-alive connections.
+
+    The single Bot instance, and so this one connector, is shared by webhook
+    handlers and broadcasts; aiohttp creates it on the first request and reuses
+    it until ``close_bot()``.
+    """
+
+    def __init__(self, pool_size: int, keepalive_seconds: float, **kwargs) -> None:
+        super().__init__(limit=pool_size, **kwargs)
+        self._connector_init.update(limit_per_host=pool_size, keepalive_timeout=keepalive_seconds)
+
+
+def create_session() -> BotApiSession:
+    """Bot API session configured from TELEGRAM_* environment variables.
+
+    TELEGRAM_API_URL points the bot at a self-hosted telegram-bot-api server;
+    TELEGRAM_API_LOCAL=true additionally uses its --local mode file handling.
+    """
+    api_url = os.getenv("TELEGRAM_API_URL", "").strip()
+    is_local = os.getenv("TELEGRAM_API_LOCAL", "false").strip().lower() == "true"
+    kwargs = {"api": TelegramAPIServer.from_base(api_url, is_local=is_local)} if api_url else {}
+    return BotApiSession(
+        pool_size=int(os.getenv("TELEGRAM_POOL_SIZE", "100")),
+        keepalive_seconds=float(os.getenv("TELEGRAM_KEEPALIVE_SECONDS", "60")),
+        timeout=float(os.getenv("TELEGRAM_TIMEOUT_SECONDS", "60")),
+        **kwargs,
+    )
+
+
 def initialize_bot() -> Bot:
     """Initialize bot instance from environment variables."""
     global bot
@@ -24,8 +60,12 @@ def initialize_bot() -> Bot:
 
     bot = Bot(
         token=bot_token,
+        session=create_session(),
         default=DefaultBotProperties(parse_mode="HTML"),
     )
+    bot.session.middleware(InlineReplyMiddleware())
+    bot.session.middleware(BotApiMetricsMiddleware())
+    bot.session.middleware(BotApiTracingMiddleware())
     return bot
 
 
@@ -36,6 +76,12 @@ def get_bot() -> Bot:
     return bot
 
 
+async def close_bot() -> None:
+    """Close the Bot API HTTP session."""
+    if bot is not None:
+        await bot.session.close()
+
+
 async def setup_bot_commands() -> None:
     bot_instance = get_bot()
     commands = [
@@ -57,7 +103,7 @@ async def process_update(update: dict):
         bot_instance = get_bot()
         update_id = update.get("update_id", "unknown")
         logger.info(f"Processing update: {update_id}")
-        upd = types.Update(**update)
+        upd = LazyUpdate(update)
         await setup_handlers(bot_instance, upd)
     except Exception as e:
         logger.error(f"Error processing update: {e}", exc_info=True)
@@ -0,0 +1,215 @@
+"""Opt-in capture of incoming updates for offline replay.
+
+With UPDATE_CAPTURE_DIR set, the webhook hands every update to ``record()``,
+which redacts it and queues it with its arrival time. A background task appends
+the queue as gzip members to ``updates-<started>-<pid>-<n>.jsonl.gz`` and starts a
+new file once the current one reaches UPDATE_CAPTURE_FILE_MB; only the newest
+UPDATE_CAPTURE_MAX_FILES files are kept. Replay with ``scripts/replay_updates.py``.
+
+Redaction replaces user and chat ids with keyed pseudonyms (stable within one
+UPDATE_CAPTURE_SALT), blanks names, usernames and free text except bot commands
+and reply keyboard buttons, and drops contacts and locations. What handlers see - commands, callback data,
+which user sent what - is preserved.
+"""
+
+import asyncio
+import contextvars
+import glob
+import gzip
+import hashlib
+import heapq
+import logging
+import os
+import secrets
+import time
+from collections import deque
+from typing import Any, Iterable, Iterator
+
+import orjson
+
+from .keyboards import JOKE_SUBSCRIBE_TEXT, JOKE_UNSUBSCRIBE_TEXT
+
+logger = logging.getLogger(__name__)
+
+UPDATE_CAPTURE_DIR = os.getenv("UPDATE_CAPTURE_DIR", "")
+UPDATE_CAPTURE_FILE_MB = float(os.getenv("UPDATE_CAPTURE_FILE_MB", "50"))
+UPDATE_CAPTURE_MAX_FILES = int(os.getenv("UPDATE_CAPTURE_MAX_FILES", "20"))
+UPDATE_CAPTURE_BUFFER_SIZE = int(os.getenv("UPDATE_CAPTURE_BUFFER_SIZE", "10000"))
+UPDATE_CAPTURE_FLUSH_SECONDS = float(os.getenv("UPDATE_CAPTURE_FLUSH_SECONDS", "5"))
+# Without a fixed salt, pseudonyms differ between processes and restarts.
+UPDATE_CAPTURE_SALT = os.getenv("UPDATE_CAPTURE_SALT") or secrets.token_hex(16)
+
+FILE_PATTERN = "updates-*.jsonl.gz"
+
+# Objects whose "id" identifies a person or chat.
+_ID_OWNERS = frozenset(("from", "chat", "user", "sender_chat", "forward_from", "forward_from_chat"))
+_BLANKED = frozenset(("first_name", "last_name", "username", "title", "bio", "phone_number", "email"))
+_FREE_TEXT = frozenset(("text", "caption"))
+_DROPPED = frozenset(("contact", "location", "venue", "photo", "document", "voice", "video", "sticker"))
+# Reply keyboard buttons send their label as text; it is the bot's own, not the user's.
+_KEYBOARD_TEXTS = frozenset((JOKE_SUBSCRIBE_TEXT, JOKE_UNSUBSCRIBE_TEXT))
+
+
+def _pseudonym(value: int | str) -> int:
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8, key=UPDATE_CAPTURE_SALT.encode()[:64]).digest()
+    pseudonym = 1 + int.from_bytes(digest, "big") % 9_999_999_999
+    return -pseudonym if str(value).startswith("-") else pseudonym
+
+
+def _redact_text(text: str) -> str:
+    if text in _KEYBOARD_TEXTS:
+        return text
+    # Keep the command itself (/start, /profile) but not deep-link payloads or arguments.
+    if text.startswith("/"):
+        command, _, rest = text.partition(" ")
+        return f"{command} {'*' * len(rest)}" if rest else command
+    return "*" * len(text)
+
+
+def redact(value: Any, owner: str = "") -> Any:
+    """Copy of an update with personal data pseudonymized or removed."""
+    if isinstance(value, dict):
+        redacted: dict[str, Any] = {}
+        for key, item in value.items():
+            if key in _DROPPED:
+                continue
+            if key == "id" and owner in _ID_OWNERS and isinstance(item, int):
+                redacted[key] = _pseudonym(item)
+            elif key in _BLANKED and isinstance(item, str):
+                redacted[key] = "***"
+            elif key in _FREE_TEXT and isinstance(item, str):
+                redacted[key] = _redact_text(item)
+            elif key == "chat_instance":
+                redacted[key] = str(_pseudonym(item))
+            else:
+                redacted[key] = redact(item, key)
+        return redacted
+    if isinstance(value, list):
+        return [redact(item, owner) for item in value]
+    return value
+
+
+class UpdateRecorder:
+    """Bounded queue of (arrival_time, redacted_update); when full, new updates are dropped."""
+
+    def __init__(
+        self,
+        directory: str,
+        capacity: int = UPDATE_CAPTURE_BUFFER_SIZE,
+        file_bytes: int = int(UPDATE_CAPTURE_FILE_MB * 1024 * 1024),
+        max_files: int = UPDATE_CAPTURE_MAX_FILES,
+    ) -> None:
+        self.directory = directory
+        self.file_bytes = file_bytes
+        self.max_files = max_files
+        self._pending: deque[tuple[float, dict]] = deque()
+        self._capacity = capacity
+        self._path: str | None = None
+        self._files = 0
+        self.recorded = 0
+        self.dropped = 0
+
+    def record(self, update: dict) -> None:
+        if len(self._pending) >= self._capacity:
+            self.dropped += 1
+            return
+        self._pending.append((time.time(), redact(update)))
+
+    def _new_path(self) -> str:
+        self._files += 1
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        return os.path.join(self.directory, f"updates-{stamp}-{os.getpid()}-{self._files}.jsonl.gz")
+
+    def _write(self, entries: list[tuple[float, dict]]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if self._path is None or os.path.getsize(self._path) >= self.file_bytes:
+            self._path = self._new_path()
+            self._prune()
+        body = b"".join(orjson.dumps({"t": ts, "update": update}) + b"\n" for ts, update in entries)
+        # Each flush is its own gzip member, so a crash loses at most the unflushed queue.
+        with gzip.open(self._path, "ab") as f:
+            f.write(body)
+
+    def _prune(self) -> None:
+        files = sorted(glob.glob(os.path.join(self.directory, FILE_PATTERN)), key=os.path.getmtime)
+        for path in files[: max(0, len(files) - self.max_files + 1)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove old capture {path}: {e}")
+
+    async def flush(self) -> int:
+        """Append queued updates to the current file; updates of a failed write are dropped."""
+        entries = list(self._pending)
+        self._pending.clear()
+        if not entries:
+            return 0
+        try:
+            await asyncio.to_thread(self._write, entries)
+        except OSError as e:
+            self.dropped += len(entries)
+            logger.warning(f"Failed to write {len(entries)} captured updates to {self.directory}: {e}")
+            return 0
+        self.recorded += len(entries)
+        return len(entries)
+
+
+recorder: UpdateRecorder | None = UpdateRecorder(UPDATE_CAPTURE_DIR) if UPDATE_CAPTURE_DIR else None
+
+
+def record(update: dict) -> None:
+    if recorder is not None:
+        recorder.record(update)
+
+
+def _read(path: str) -> Iterator[tuple[float, dict]]:
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                entry = orjson.loads(line)
+                yield entry["t"], entry["update"]
+
+
+def read_capture(paths: Iterable[str]) -> Iterator[tuple[float, dict]]:
+    """Updates from capture files (or directories of them) merged in arrival order."""
+    files: list[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, FILE_PATTERN))))
+        else:
+            files.append(path)
+    # Files of different workers overlap in time; each one is already in arrival order.
+    return heapq.merge(*(_read(path) for path in files), key=lambda entry: entry[0])
+
+
+async def run_writer(rec: UpdateRecorder, interval: float = UPDATE_CAPTURE_FLUSH_SECONDS) -> None:
+    while True:
+        try:
+            await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            await rec.flush()
+            raise
+        await rec.flush()
+
+
+_writer_task: asyncio.Task | None = None
+
+
+def start_writer() -> None:
+    global _writer_task
+    if recorder is not None and _writer_task is None:
+        logger.info(f"Capturing incoming updates to {recorder.directory}")
+        _writer_task = asyncio.create_task(run_writer(recorder), context=contextvars.Context())
+
+
+async def stop_writer() -> None:
+    """Cancel the writer; it writes what is still queued before exiting."""
+    global _writer_task
+    if _writer_task is None:
+        return
+    _writer_task.cancel()
+    try:
+        await _writer_task
+    except asyncio.CancelledError:
+        pass
+    _writer_task = None
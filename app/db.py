@@ -1,7 +1,17 @@
+import asyncio
+import contextlib
+import logging
 import os
+import re
+from typing import AsyncIterator
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
 
 DATA_DIR = os.getenv("DATA_DIR")
 DEFAULT_DATA_DIR = "/data"
@@ -9,29 +19,187 @@ DEFAULT_DATA_DIR = "/data"
 if not DATA_DIR and os.path.isdir(DEFAULT_DATA_DIR):
     DATA_DIR = DEFAULT_DATA_DIR
 
-if DATA_DIR:
-    os.makedirs(DATA_DIR, exist_ok=True)
-    db_path = os.path.join(DATA_DIR, "tg_bot.db")
-    DATABASE_URL = f"sqlite:///{db_path}"
+
+def _default_sqlite_url() -> str:
+    if DATA_DIR:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        db_path = os.path.join(DATA_DIR, "tg_bot.db")
+        return f"sqlite:///{db_path}"
+    return "sqlite:///./tg_bot.db"
+
+
+def _render(url: URL) -> str:
+    return url.render_as_string(hide_password=False)
+
+
+def _sync_url(url: str) -> str:
+    """Normalize DATABASE_URL to a sync driver (used by Alembic and SessionLocal)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "postgres":
+        # Heroku/Railway style scheme; SQLAlchemy only knows "postgresql".
+        backend = "postgresql"
+    if backend == "postgresql":
+        return _render(parsed.set(drivername="postgresql+psycopg2"))
+    if backend == "sqlite":
+        return _render(parsed.set(drivername="sqlite"))
+    return _render(parsed)
+
+
+def _async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}.get(parsed.get_backend_name())
+    return _render(parsed.set(drivername=driver) if driver else parsed)
+
+
+DATABASE_URL = _sync_url(os.getenv("DATABASE_URL") or _default_sqlite_url())
+ASYNC_DATABASE_URL = _async_url(DATABASE_URL)
+IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # WAL lets readers proceed while a writer commits; NORMAL sync is durable in WAL mode
+    # except for the last transactions on power loss.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+if IS_SQLITE:
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+    )
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
 else:
-    DATABASE_URL = "sqlite:///./tg_bot.db"
+    # The sync engine only runs migrations and scripts; keep it small.
+    engine = create_engine(DATABASE_URL, pool_size=1, max_overflow=1, pool_pre_ping=True)
+    # Each replica holds at most DB_POOL_SIZE + DB_MAX_OVERFLOW connections; size them so
+    # replicas * that stays under the server's max_connections. Recycling drops connections
+    # before proxies/load balancers close them, pre-ping catches the rest.
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+        connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+    )
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# SQLite has a single writer; concurrent commits from the pool wait on busy_timeout and,
+# under load, fail with "database is locked". Writers in this process queue here instead.
+_write_lock: asyncio.Lock | None = None
+_write_lock_loop: asyncio.AbstractEventLoop | None = None
+
+
+@contextlib.asynccontextmanager
+async def write_lock() -> AsyncIterator[None]:
+    """Hold around a write transaction; serializes writers on SQLite, no-op on PostgreSQL."""
+    global _write_lock, _write_lock_loop
+    if not IS_SQLITE:
+        yield
+        return
+    loop = asyncio.get_running_loop()
+    if _write_lock is None or _write_lock_loop is not loop:
+        _write_lock, _write_lock_loop = asyncio.Lock(), loop
+    async with _write_lock:
+        yield
+
+
+AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+_REVISION_RE = re.compile(r'^(down_revision|revision) = "([^"]+)"', re.MULTILINE)
+
+
+def _head_revision() -> str | None:
+    """Latest revision in migrations/versions, read without importing Alembic."""
+    revisions: set[str] = set()
+    parents: set[str] = set()
+    versions_dir = os.path.join(MIGRATIONS_DIR, "versions")
+    for name in os.listdir(versions_dir):
+        if name.endswith(".py"):
+            with open(os.path.join(versions_dir, name), encoding="utf-8") as f:
+                for key, value in _REVISION_RE.findall(f.read()):
+                    (revisions if key == "revision" else parents).add(value)
+    heads = revisions - parents
+    return heads.pop() if len(heads) == 1 else None
+
+
+def schema_is_current(connection=None) -> bool:
+    """True when the database is already stamped with the head revision."""
+    head = _head_revision()
+    if head is None:
+        return False
+    if connection is None:
+        with engine.connect() as conn:
+            return schema_is_current(conn)
+    # Checked with the inspector: a failing SELECT would abort a PostgreSQL transaction.
+    if not inspect(connection).has_table("alembic_version"):
+        return False
+    return connection.execute(text("SELECT version_num FROM alembic_version")).scalars().all() == [head]
 
-def ensure_schema() -> None:
-    if engine.dialect.name != "sqlite":
+
+# Arbitrary application-wide key for pg_advisory_lock.
+_MIGRATION_LOCK_KEY = 0x7467626F74  # "tgbot"
+
+
+def run_migrations(connection=None) -> None:
+    """Upgrade the database to the latest Alembic revision.
+
+    Pass ``connection`` to migrate an already open connection instead of DATABASE_URL.
+    An up-to-date schema is detected with one query, without loading Alembic. On
+    PostgreSQL replicas starting together take turns on an advisory lock: one
+    upgrades, the others then find the schema current.
+    """
+    if schema_is_current(connection):
+        logger.info("Database schema is up to date")
         return
+    if connection is not None or IS_SQLITE:
+        _upgrade(connection)
+        return
+
+    # Autocommit, so the session-level lock is held outside the migration transactions.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+        try:
+            if schema_is_current():
+                logger.info("Database schema was upgraded by another replica")
+                return
+            _upgrade(None)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+
+
+def _upgrade(connection) -> None:
+    from alembic import command
+    from alembic.config import Config
 
-    with engine.begin() as conn:
-        rows = conn.execute(text("PRAGMA table_info(users)")).fetchall()
-        if not rows:
-            return
-        columns = {row[1] for row in rows}
-        if "joke_subscribed" not in columns:
-            conn.execute(text("ALTER TABLE users ADD COLUMN joke_subscribed BOOLEAN NOT NULL DEFAULT 0"))
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    command.upgrade(config, "head")
 
 
 def get_db():
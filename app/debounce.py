@@ -0,0 +1,76 @@
+"""Callback debouncing with an expiry-ordered local window and optional Redis backend."""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackDebouncer:
+    """Remembers keys for ``window`` seconds.
+
+    Every entry lives for the same window and is never refreshed, so insertion
+    order equals expiry order: expired entries are always at the head and each
+    one is popped exactly once, giving O(1) amortized cost per check.
+    """
+
+    def __init__(self, window: float, max_size: int) -> None:
+        self.window = window
+        self.max_size = max_size
+        self._seen: OrderedDict[Hashable, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def is_duplicate(self, key: Hashable, now: float | None = None) -> bool:
+        if now is None:
+            now = time.monotonic()
+
+        seen = self._seen
+        while seen:
+            oldest_key, timestamp = next(iter(seen.items()))
+            if now - timestamp < self.window:
+                break
+            del seen[oldest_key]
+
+        if key in seen:
+            return True
+
+        seen[key] = now
+        if len(seen) > self.max_size:
+            seen.popitem(last=False)
+        return False
+
+
+class RedisDebouncer:
+    """Debounce window shared by all workers through ``SET NX PX``."""
+
+    def __init__(self, url: str, window: float, prefix: str = "tgbot:cb:") -> None:
+        from redis import asyncio as redis_asyncio
+
+        self.window_ms = max(1, int(window * 1000))
+        self.prefix = prefix
+        self._client = redis_asyncio.from_url(url)
+
+    async def is_duplicate(self, user_id: int, data: str) -> bool:
+        key = f"{self.prefix}{user_id}:{data}"
+        try:
+            created = await self._client.set(key, b"1", nx=True, px=self.window_ms)
+        except Exception as e:
+            # Fail open: a missed debounce is cheaper than a dropped click.
+            logger.warning(f"Shared debounce unavailable: {e}")
+            return False
+        return not created
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_shared_debouncer(window: float) -> RedisDebouncer | None:
+    url = os.getenv("DEBOUNCE_REDIS_URL")
+    if not url:
+        return None
+    return RedisDebouncer(url, window)
@@ -1,23 +1,36 @@
 import asyncio
+import contextlib
+import contextvars
+import html
 import logging
+import math
 import os
 import time
-from collections import OrderedDict
+from functools import partial
 
 from aiogram import types
-from sqlalchemy import func
+from aiogram.types import BufferedInputFile
 
-from .db import SessionLocal
-from .horo.parser import fetch_horoscope
+from . import analytics, metrics, profiling, repository, tracing
+from .db import AsyncSessionLocal, write_lock
+from .debounce import CallbackDebouncer, create_shared_debouncer
+from .horo.parser import HOROSCOPE_PREFETCH_ENABLED, fetch_horoscope, prefetch
 from .joke_parser import fetch_random_joke
 from .keyboards import (
+    ALL_SIGNS_MASK,
+    JOKE_SUBSCRIBE_TEXT,
+    JOKE_UNSUBSCRIBE_TEXT,
+    SIGN_BITS,
     SIGN_TITLES,
     ZODIAC_SIGNS,
     joke_subscription_keyboard,
+    mask_to_signs,
     sign_detail_keyboard,
     signs_keyboard,
 )
-from .models import Subscription, User
+from .lazy_update import LazyMessage, LazyUpdate
+from .user_cache import UserState, user_state_cache
+from .write_batcher import DB_WRITE_BATCH_ENABLED, WriteBatcher, WriteOp
 
 logger = logging.getLogger(__name__)
 
@@ -25,21 +38,36 @@ ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))
 
 _CALLBACK_DEBOUNCE_SECONDS = 1.0
 _CALLBACK_CACHE_MAX_SIZE = 5000
-_last_callback: OrderedDict[tuple[int, str], float] = OrderedDict()
+_callback_debouncer = CallbackDebouncer(_CALLBACK_DEBOUNCE_SECONDS, _CALLBACK_CACHE_MAX_SIZE)
+_shared_callback_debouncer = create_shared_debouncer(_CALLBACK_DEBOUNCE_SECONDS)
 
 _VALID_SIGNS = frozenset(ZODIAC_SIGNS)
 
-_JOKE_SUBSCRIBE_TEXT = "Подписаться на шутки"
-_JOKE_UNSUBSCRIBE_TEXT = "Отписаться от шуток"
+# Analytics keys; anything else is recorded as unknown to keep cardinality bounded.
+_COMMANDS = (
+    "/start",
+    "/list",
+    "/me",
+    "/help",
+    "/joke",
+    "/subscribers",
+    "/send_now",
+    "/analytics",
+    "/profile",
+    "/traces",
+)
+_CALLBACK_ACTIONS = frozenset(("sign", "sub", "unsub", "back"))
 
+_PROFILE_DEFAULT_SECONDS = 30.0
+_PROFILE_USAGE = "Использование: /profile [секунды] или /profile <N> req"
+_background_tasks: set[asyncio.Task] = set()
+_prefetch_task: asyncio.Task | None = None
 
-def _cleanup_callback_cache(now: float) -> None:
-    stale_keys = [key for key, timestamp in _last_callback.items() if now - timestamp >= _CALLBACK_DEBOUNCE_SECONDS]
-    for key in stale_keys:
-        _last_callback.pop(key, None)
+# A read overlapped by a write of the same user is retried, so the cache never keeps a pre-write state.
+_USER_STATE_READS = 3
 
-    while len(_last_callback) > _CALLBACK_CACHE_MAX_SIZE:
-        _last_callback.popitem(last=False)
+_TRACES_SHOWN = 5
+_TRACES_TEXT_LIMIT = 3500
 
 
 def _is_valid_sign(sign: str) -> bool:
@@ -47,251 +75,268 @@ def _is_valid_sign(sign: str) -> bool:
 
 
 def _is_duplicate_callback(user_id: int, data: str) -> bool:
-    key = (user_id, data)
-    now = time.monotonic()
-    _cleanup_callback_cache(now)
+    return _callback_debouncer.is_duplicate((user_id, data))
 
-    last = _last_callback.get(key)
-    if last and now - last < _CALLBACK_DEBOUNCE_SECONDS:
-        return True
 
-    _last_callback[key] = now
-    _last_callback.move_to_end(key)
-    return False
+async def _is_duplicate_click(user_id: int, data: str) -> bool:
+    """Check the local window first, then the cross-worker one if configured."""
+    if _is_duplicate_callback(user_id, data):
+        return True
+    if _shared_callback_debouncer is None:
+        return False
+    return await _shared_callback_debouncer.is_duplicate(user_id, data)
 
 
-def _get_or_create_user(
+@tracing.traced("db upsert_user")
+async def _upsert_user(
     telegram_id: int,
     username: str | None = None,
     first_name: str | None = None,
     last_name: str | None = None,
-) -> tuple[User, bool]:
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter_by(telegram_id=telegram_id).first()
-        created = False
-        if not user:
-            user = User(
-                telegram_id=telegram_id,
-                username=username,
-                first_name=first_name,
-                last_name=last_name,
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-            created = True
-        return user, created
-    finally:
-        db.close()
-
-
-def _get_user_subscriptions(telegram_id: int) -> list[str]:
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter_by(telegram_id=telegram_id).first()
-        if not user:
-            return []
-        return [subscription.sign for subscription in user.subscriptions if subscription.active]
-    finally:
-        db.close()
-
-
-def _is_subscribed(telegram_id: int, sign: str) -> bool:
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter_by(telegram_id=telegram_id).first()
-        if not user:
-            return False
-        sub = db.query(Subscription).filter_by(user_id=user.id, sign=sign, active=True).first()
-        return bool(sub)
-    finally:
-        db.close()
-
-
-def _subscribe_user(telegram_id: int, sign: str) -> bool:
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter_by(telegram_id=telegram_id).first()
-        if not user:
-            user = User(telegram_id=telegram_id)
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-
-        sub = db.query(Subscription).filter_by(user_id=user.id, sign=sign).first()
-        was_subscribed = bool(sub and sub.active)
-
-        if not sub:
-            db.add(Subscription(user_id=user.id, sign=sign, active=True))
-        else:
-            sub.active = True
-
-        db.commit()
-        return not was_subscribed
-    finally:
-        db.close()
+) -> None:
+    await _write(
+        partial(
+            repository.upsert_user,
+            telegram_id=telegram_id,
+            username=username,
+            first_name=first_name,
+            last_name=last_name,
+        )
+    )
 
 
-def _unsubscribe_user(telegram_id: int, sign: str) -> bool:
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter_by(telegram_id=telegram_id).first()
-        if not user:
-            return False
+@contextlib.asynccontextmanager
+async def _transaction():
+    async with write_lock(), AsyncSessionLocal.begin() as db:
+        yield db
 
-        if sign == "all":
-            db.query(Subscription).filter_by(user_id=user.id).update({"active": False})
-            db.commit()
-            return True
 
-        sub = db.query(Subscription).filter_by(user_id=user.id, sign=sign).first()
-        if not sub or not sub.active:
-            return False
+_write_batcher = WriteBatcher(_transaction)
 
-        sub.active = False
-        db.commit()
-        return True
-    finally:
-        db.close()
 
+async def _write(op: WriteOp):
+    """Run a repository write, group-committed with concurrent ones when enabled."""
+    if DB_WRITE_BATCH_ENABLED:
+        return await _write_batcher.submit(op)
+    async with _transaction() as db:
+        return await op(db)
 
-def _get_subscribers_stats() -> tuple[int, list[tuple[str, int]]]:
-    db = SessionLocal()
-    try:
-        active_users = (
-            db.query(func.count(func.distinct(Subscription.user_id))).filter(Subscription.active).scalar() or 0
-        )
 
-        stats = (
-            db.query(Subscription.sign, func.count(Subscription.id))
-            .filter(Subscription.active)
-            .group_by(Subscription.sign)
-            .all()
-        )
-        return active_users, stats
-    finally:
-        db.close()
+def _prefetch_horoscopes() -> None:
+    """Warm today's horoscope cache while the user picks a sign from the keyboard."""
+    global _prefetch_task
+    if not HOROSCOPE_PREFETCH_ENABLED or (_prefetch_task is not None and not _prefetch_task.done()):
+        return
+    _prefetch_task = asyncio.create_task(prefetch(ZODIAC_SIGNS), context=contextvars.Context())
+    _background_tasks.add(_prefetch_task)
+    _prefetch_task.add_done_callback(_background_tasks.discard)
+    _prefetch_task.add_done_callback(_log_prefetch_error)
 
 
-def _get_joke_subscription(telegram_id: int) -> bool:
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter_by(telegram_id=telegram_id).first()
-        return bool(user and user.joke_subscribed)
-    finally:
-        db.close()
+def _log_prefetch_error(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Horoscope prefetch failed: {task.exception()}")
 
 
-def _set_joke_subscription(telegram_id: int, subscribed: bool) -> bool:
-    db = SessionLocal()
+async def close(timeout: float) -> None:
+    """Cancel background tasks and write out queued subscription changes."""
+    for task in list(_background_tasks):
+        task.cancel()
     try:
-        user = db.query(User).filter_by(telegram_id=telegram_id).first()
-        if not user:
-            user = User(telegram_id=telegram_id, joke_subscribed=subscribed)
-            db.add(user)
-            db.commit()
-            return subscribed
-
-        if user.joke_subscribed == subscribed:
-            return subscribed
-
-        user.joke_subscribed = subscribed
-        db.commit()
-        return subscribed
-    finally:
-        db.close()
-
-
-async def setup_handlers(bot, update: types.Update):
+        await asyncio.wait_for(_write_batcher.close(), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Queued writes were not committed before the shutdown deadline")
+    if _shared_callback_debouncer is not None:
+        await _shared_callback_debouncer.close()
+
+
+@tracing.traced("db get_user_state")
+async def _get_user_state(telegram_id: int) -> UserState:
+    state = user_state_cache.get(telegram_id)
+    if state is not None:
+        return state
+    for _ in range(_USER_STATE_READS):
+        with user_state_cache.loading(telegram_id) as load:
+            async with AsyncSessionLocal() as db:
+                joke_subscribed, sign_mask = await repository.get_user_state(db, telegram_id)
+        if not load.stale:
+            return user_state_cache.put(telegram_id, joke_subscribed, sign_mask)
+    # Writes kept landing during the read; serve the last result without caching it.
+    return UserState(joke_subscribed, sign_mask, time.monotonic())
+
+
+async def _get_user_subscriptions(telegram_id: int) -> list[str]:
+    state = await _get_user_state(telegram_id)
+    return mask_to_signs(state.sign_mask)
+
+
+async def _is_subscribed(telegram_id: int, sign: str) -> bool:
+    state = await _get_user_state(telegram_id)
+    return bool(state.sign_mask & SIGN_BITS[sign])
+
+
+@tracing.traced("db subscribe")
+async def _subscribe_user(telegram_id: int, sign: str) -> bool:
+    changed = await _write(partial(repository.subscribe, telegram_id=telegram_id, sign=sign))
+    user_state_cache.update_signs(telegram_id, set_bits=SIGN_BITS[sign])
+    return changed
+
+
+@tracing.traced("db unsubscribe")
+async def _unsubscribe_user(telegram_id: int, sign: str) -> bool:
+    changed = await _write(partial(repository.unsubscribe, telegram_id=telegram_id, sign=sign))
+    user_state_cache.update_signs(telegram_id, clear_bits=ALL_SIGNS_MASK if sign == "all" else SIGN_BITS[sign])
+    return changed
+
+
+@tracing.traced("db get_subscribers_stats")
+async def _get_subscribers_stats() -> tuple[int, int, list[tuple[str, int]]]:
+    async with AsyncSessionLocal() as db:
+        return await repository.get_subscribers_stats(db)
+
+
+async def _get_joke_subscription(telegram_id: int) -> bool:
+    state = await _get_user_state(telegram_id)
+    return state.joke_subscribed
+
+
+@tracing.traced("db set_joke_subscription")
+async def _set_joke_subscription(telegram_id: int, subscribed: bool) -> bool:
+    await _write(partial(repository.set_joke_subscription, telegram_id=telegram_id, subscribed=subscribed))
+    user_state_cache.update_joke(telegram_id, subscribed)
+    return subscribed
+
+
+def _interaction_key(update: types.Update | LazyUpdate) -> tuple[str, str]:
+    """Command and sign an update is recorded under in analytics."""
+    if update.message:
+        text = update.message.text or ""
+        if text == JOKE_SUBSCRIBE_TEXT:
+            return "joke_subscribe", ""
+        if text == JOKE_UNSUBSCRIBE_TEXT:
+            return "joke_unsubscribe", ""
+        for command in _COMMANDS:
+            if text.startswith(command):
+                return command, ""
+        return "unknown", ""
+    if update.callback_query:
+        action, _, arg = (update.callback_query.data or "").partition(":")
+        if action not in _CALLBACK_ACTIONS:
+            return "cb:unknown", ""
+        return f"cb:{action}", arg if arg in _VALID_SIGNS else ""
+    return "other", ""
+
+
+async def setup_handlers(bot, update: types.Update | LazyUpdate):
     """Main dispatcher for handling messages and callbacks"""
+    started = time.perf_counter()
+    analytics.begin_interaction()
+    command, sign = _interaction_key(update)
     try:
-        if update.message:
-            msg = update.message
-            logger.info(f"Message from {msg.from_user.id}: {msg.text}")
-            if msg.text:
-                if msg.text == _JOKE_SUBSCRIBE_TEXT:
-                    await handle_joke_subscription(bot, msg, True)
-                elif msg.text == _JOKE_UNSUBSCRIBE_TEXT:
-                    await handle_joke_subscription(bot, msg, False)
-                elif msg.text.startswith("/start"):
-                    await handle_start(bot, msg)
-                elif msg.text.startswith("/list"):
-                    await handle_list(bot, msg)
-                elif msg.text.startswith("/me"):
-                    await handle_me(bot, msg)
-                elif msg.text.startswith("/help"):
-                    await handle_help(bot, msg)
-                elif msg.text.startswith("/joke"):
-                    await handle_joke(bot, msg)
-                elif msg.text.startswith("/subscribers") and msg.from_user.id == ADMIN_ID:
-                    await handle_subscribers(bot, msg)
-                elif msg.text.startswith("/send_now") and msg.from_user.id == ADMIN_ID:
-                    await handle_send_now(bot, msg)
-                else:
-                    await bot.send_message(msg.chat.id, "Неизвестная команда. Используйте /list или /start")
-        elif update.callback_query:
-            cb = update.callback_query
-            logger.info(f"Callback from {cb.from_user.id}: {cb.data}")
-            if _is_duplicate_callback(cb.from_user.id, cb.data):
-                try:
-                    await bot.answer_callback_query(cb.id)
-                except Exception:
-                    pass
-                return
-            data = cb.data
-            if data.startswith("sign:"):
-                sign = data.split(":", 1)[1]
-                if not _is_valid_sign(sign):
-                    await bot.answer_callback_query(cb.id, text="Некорректный знак")
-                    return
-                await handle_show_sign(bot, cb.message.chat.id, cb.from_user.id, sign, cb.message.message_id, cb.id)
-            elif data.startswith("sub:"):
-                sign = data.split(":", 1)[1]
-                if not _is_valid_sign(sign):
-                    await bot.answer_callback_query(cb.id, text="Некорректный знак")
-                    return
-                await handle_subscribe(bot, cb.message.chat.id, cb.from_user.id, sign, cb.message.message_id, cb.id)
-            elif data.startswith("unsub:"):
-                sign = data.split(":", 1)[1]
-                if sign != "all" and not _is_valid_sign(sign):
-                    await bot.answer_callback_query(cb.id, text="Некорректный знак")
-                    return
-                await handle_unsubscribe(bot, cb.message.chat.id, cb.from_user.id, sign, cb.message.message_id, cb.id)
-            elif data.startswith("back:"):
-                ctx = data.split(":", 1)[1]
-                if ctx == "list":
-                    await bot.edit_message_text(
-                        "Выберите знак зодиака:",
-                        chat_id=cb.message.chat.id,
-                        message_id=cb.message.message_id,
-                        reply_markup=signs_keyboard(),
-                    )
-                    try:
-                        await bot.answer_callback_query(cb.id)
-                    except Exception as e:
-                        logger.warning(f"Could not answer callback query: {e}")
+        with tracing.span(f"handler {command}"):
+            await _dispatch(bot, update)
     except Exception as e:
         logger.error(f"Error in setup_handlers: {e}", exc_info=True)
         raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.HANDLER_LATENCY.labels(command).observe(elapsed)
+        analytics.record(command, sign, elapsed * 1000)
+        profiling.request_finished()
+
+
+async def _dispatch(bot, update: types.Update | LazyUpdate):
+    """Route an update to its handler."""
+    if update.message:
+        msg = update.message
+        logger.info(f"Message from {msg.from_user.id}: {msg.text}")
+        if msg.text:
+            if msg.text == JOKE_SUBSCRIBE_TEXT:
+                await handle_joke_subscription(bot, msg, True)
+            elif msg.text == JOKE_UNSUBSCRIBE_TEXT:
+                await handle_joke_subscription(bot, msg, False)
+            elif msg.text.startswith("/start"):
+                await handle_start(bot, msg)
+            elif msg.text.startswith("/list"):
+                await handle_list(bot, msg)
+            elif msg.text.startswith("/me"):
+                await handle_me(bot, msg)
+            elif msg.text.startswith("/help"):
+                await handle_help(bot, msg)
+            elif msg.text.startswith("/joke"):
+                await handle_joke(bot, msg)
+            elif msg.text.startswith("/subscribers") and msg.from_user.id == ADMIN_ID:
+                await handle_subscribers(bot, msg)
+            elif msg.text.startswith("/send_now") and msg.from_user.id == ADMIN_ID:
+                await handle_send_now(bot, msg)
+            elif msg.text.startswith("/analytics") and msg.from_user.id == ADMIN_ID:
+                await handle_analytics(bot, msg)
+            elif msg.text.startswith("/profile") and msg.from_user.id == ADMIN_ID:
+                await handle_profile(bot, msg)
+            elif msg.text.startswith("/traces") and msg.from_user.id == ADMIN_ID:
+                await handle_traces(bot, msg)
+            else:
+                await bot.send_message(msg.chat.id, "Неизвестная команда. Используйте /list или /start")
+    elif update.callback_query:
+        cb = update.callback_query
+        logger.info(f"Callback from {cb.from_user.id}: {cb.data}")
+        if await _is_duplicate_click(cb.from_user.id, cb.data):
+            try:
+                await bot.answer_callback_query(cb.id)
+            except Exception:
+                pass
+            return
+        data = cb.data
+        if data.startswith("sign:"):
+            sign = data.split(":", 1)[1]
+            if not _is_valid_sign(sign):
+                await bot.answer_callback_query(cb.id, text="Некорректный знак")
+                return
+            await handle_show_sign(bot, cb.message.chat.id, cb.from_user.id, sign, cb.message.message_id, cb.id)
+        elif data.startswith("sub:"):
+            sign = data.split(":", 1)[1]
+            if not _is_valid_sign(sign):
+                await bot.answer_callback_query(cb.id, text="Некорректный знак")
+                return
+            await handle_subscribe(bot, cb.message.chat.id, cb.from_user.id, sign, cb.message.message_id, cb.id)
+        elif data.startswith("unsub:"):
+            sign = data.split(":", 1)[1]
+            if sign != "all" and not _is_valid_sign(sign):
+                await bot.answer_callback_query(cb.id, text="Некорректный знак")
+                return
+            await handle_unsubscribe(bot, cb.message.chat.id, cb.from_user.id, sign, cb.message.message_id, cb.id)
+        elif data.startswith("back:"):
+            ctx = data.split(":", 1)[1]
+            if ctx == "list":
+                _prefetch_horoscopes()
+                await bot.edit_message_text(
+                    "Выберите знак зодиака:",
+                    chat_id=cb.message.chat.id,
+                    message_id=cb.message.message_id,
+                    reply_markup=signs_keyboard(),
+                )
+                try:
+                    await bot.answer_callback_query(cb.id)
+                except Exception as e:
+                    logger.warning(f"Could not answer callback query: {e}")
 
 
-async def handle_start(bot, msg: types.Message):
-    await asyncio.to_thread(
-        _get_or_create_user,
+async def handle_start(bot, msg: types.Message | LazyMessage):
+    _prefetch_horoscopes()
+    await _upsert_user(
         msg.from_user.id,
         msg.from_user.username,
         msg.from_user.first_name,
         msg.from_user.last_name,
     )
-    subscribed = await asyncio.to_thread(_get_joke_subscription, msg.from_user.id)
+    subscribed = await _get_joke_subscription(msg.from_user.id)
     text = "Привет! Я бот с гороскопами.\nВыберите знак зодиака или используйте команды из меню."
     await bot.send_message(msg.chat.id, text, reply_markup=joke_subscription_keyboard(subscribed))
     await bot.send_message(msg.chat.id, "Выберите знак зодиака:", reply_markup=signs_keyboard())
 
 
-async def handle_help(bot, msg: types.Message):
-    subscribed = await asyncio.to_thread(_get_joke_subscription, msg.from_user.id)
+async def handle_help(bot, msg: types.Message | LazyMessage):
+    subscribed = await _get_joke_subscription(msg.from_user.id)
     text = (
         "Доступные команды:\n"
         "/start — начать работу\n"
@@ -303,8 +348,8 @@ async def handle_help(bot, msg: types.Message):
     await bot.send_message(msg.chat.id, text, reply_markup=joke_subscription_keyboard(subscribed))
 
 
-async def handle_joke(bot, msg: types.Message):
-    subscribed = await asyncio.to_thread(_get_joke_subscription, msg.from_user.id)
+async def handle_joke(bot, msg: types.Message | LazyMessage):
+    subscribed = await _get_joke_subscription(msg.from_user.id)
     joke = await fetch_random_joke()
     if joke:
         await bot.send_message(msg.chat.id, f"😂 {joke}", reply_markup=joke_subscription_keyboard(subscribed))
@@ -316,14 +361,15 @@ async def handle_joke(bot, msg: types.Message):
         )
 
 
-async def handle_list(bot, msg: types.Message):
-    subscribed = await asyncio.to_thread(_get_joke_subscription, msg.from_user.id)
+async def handle_list(bot, msg: types.Message | LazyMessage):
+    _prefetch_horoscopes()
+    subscribed = await _get_joke_subscription(msg.from_user.id)
     await bot.send_message(msg.chat.id, "Выберите знак:", reply_markup=signs_keyboard())
     await bot.send_message(msg.chat.id, "Меню шуток:", reply_markup=joke_subscription_keyboard(subscribed))
 
 
-async def handle_me(bot, msg: types.Message):
-    subs = await asyncio.to_thread(_get_user_subscriptions, msg.from_user.id)
+async def handle_me(bot, msg: types.Message | LazyMessage):
+    subs = await _get_user_subscriptions(msg.from_user.id)
     if not subs:
         await bot.send_message(msg.chat.id, "Вы не подписаны ни на один знак. Используйте /list")
         return
@@ -344,7 +390,7 @@ async def handle_me(bot, msg: types.Message):
 
 
 async def handle_show_sign(bot, chat_id: int, user_id: int, sign: str, message_id: int, callback_id: str):
-    subscribed = await asyncio.to_thread(_is_subscribed, user_id, sign)
+    subscribed = await _is_subscribed(user_id, sign)
     text = await fetch_horoscope(sign)
     await bot.edit_message_text(
         text,
@@ -355,7 +401,7 @@ async def handle_show_sign(bot, chat_id: int, user_id: int, sign: str, message_i
 
 
 async def handle_subscribe(bot, chat_id: int, user_id: int, sign: str, message_id: int, callback_id: str):
-    was_updated = await asyncio.to_thread(_subscribe_user, user_id, sign)
+    was_updated = await _subscribe_user(user_id, sign)
 
     try:
         await bot.answer_callback_query(callback_id, text=f"Вы подписаны на {SIGN_TITLES.get(sign, sign)}")
@@ -374,7 +420,7 @@ async def handle_subscribe(bot, chat_id: int, user_id: int, sign: str, message_i
 
 
 async def handle_unsubscribe(bot, chat_id: int, user_id: int, sign: str, message_id: int, callback_id: str):
-    unsubscribed = await asyncio.to_thread(_unsubscribe_user, user_id, sign)
+    unsubscribed = await _unsubscribe_user(user_id, sign)
     if not unsubscribed:
         try:
             await bot.answer_callback_query(callback_id, text="Вы не были подписаны")
@@ -399,18 +445,107 @@ async def handle_unsubscribe(bot, chat_id: int, user_id: int, sign: str, message
             logger.warning(f"Could not edit message reply markup: {e}")
 
 
-async def handle_subscribers(bot, msg: types.Message):
-    active_users, stats = await asyncio.to_thread(_get_subscribers_stats)
+async def handle_subscribers(bot, msg: types.Message | LazyMessage):
+    active_users, joke_subscribers, stats = await _get_subscribers_stats()
     lines = [f"Активных пользователей: {active_users}"]
     lines.append(f"Всего активных подписок: {sum(cnt for _, cnt in stats)}")
+    lines.append(f"Подписчиков на шутки: {joke_subscribers}")
     lines.append("")
     for sign, cnt in sorted(stats, key=lambda item: item[1], reverse=True):
         lines.append(f"{SIGN_TITLES.get(sign, sign.title())}: {cnt}")
+    lines.append("")
+    lines.append(
+        f"Кэш пользователей: {len(user_state_cache)} записей, hit rate {user_state_cache.hit_rate:.0%}, "
+        f"вытеснено {user_state_cache.evictions}"
+    )
+
+    await bot.send_message(msg.chat.id, "\n".join(lines))
+
+
+async def handle_analytics(bot, msg: types.Message | LazyMessage):
+    await analytics.interaction_log.flush()
+    async with AsyncSessionLocal() as db:
+        report = await analytics.report(db)
+
+    lines = ["Активность за 7 дней", ""]
+    for command, events, avg_latency in report["commands"]:
+        lines.append(f"{command}: {events} (в среднем {avg_latency:.0f} мс)")
+    if report["signs"]:
+        lines.append("")
+        lines.append("Просмотры знаков:")
+        for sign, events in report["signs"]:
+            lines.append(f"{SIGN_TITLES.get(sign, sign.title())}: {events}")
+    if report["cache_hit_rate"] is not None:
+        lines.append("")
+        lines.append(f"Гороскопы из кэша: {report['cache_hit_rate']:.0%}")
+    lines.append(f"Потеряно событий: {analytics.interaction_log.dropped}")
 
     await bot.send_message(msg.chat.id, "\n".join(lines))
 
 
-async def handle_send_now(bot, msg: types.Message):
+def _parse_profile_args(text: str) -> tuple[float | None, int | None]:
+    """``/profile 30`` samples for 30 seconds, ``/profile 200 req`` for 200 updates."""
+    args = text.split()[1:]
+    if not args:
+        return _PROFILE_DEFAULT_SECONDS, None
+    if len(args) > 1 and args[1].startswith("req"):
+        requests = int(args[0])
+        if requests <= 0:
+            raise ValueError(args[0])
+        return None, requests
+    seconds = float(args[0])
+    # float() accepts "nan" and "inf"; a NaN timeout would crash the event loop.
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError(args[0])
+    return seconds, None
+
+
+async def _send_profile(bot, chat_id: int, seconds: float | None, requests: int | None) -> None:
+    try:
+        profile = await profiling.profile(seconds, requests)
+    except Exception as e:
+        logger.error(f"Profiling failed: {e}", exc_info=True)
+        await bot.send_message(chat_id, f"Профилирование не удалось: {e}")
+        return
+    caption = f"{profile.samples} сэмплов за {profile.duration:.1f} с"
+    if not profile.samples:
+        await bot.send_message(chat_id, caption)
+        return
+    document = BufferedInputFile(profile.collapsed().encode(), filename=f"profile-{int(time.time())}.collapsed")
+    await bot.send_document(chat_id, document, caption=caption)
+
+
+async def handle_profile(bot, msg: types.Message | LazyMessage):
+    if profiling.is_running():
+        await bot.send_message(msg.chat.id, "Профилирование уже запущено")
+        return
+    try:
+        seconds, requests = _parse_profile_args(msg.text)
+    except ValueError:
+        await bot.send_message(msg.chat.id, _PROFILE_USAGE)
+        return
+
+    # A fresh context keeps the result out of this update's inline reply and analytics.
+    task = asyncio.create_task(_send_profile(bot, msg.chat.id, seconds, requests), context=contextvars.Context())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    target = f"{requests} запросов" if requests else f"{seconds:g} с"
+    await bot.send_message(msg.chat.id, f"Профилирование запущено на {target}")
+
+
+async def handle_traces(bot, msg: types.Message | LazyMessage):
+    if not tracing.TRACING_ENABLED:
+        await bot.send_message(msg.chat.id, "Трассировка выключена (TRACING_ENABLED)")
+        return
+    traces = tracing.slowest(_TRACES_SHOWN)
+    if not traces:
+        await bot.send_message(msg.chat.id, "Трасс пока нет")
+        return
+    text = "\n\n".join(tracing.format_trace(t) for t in traces)
+    await bot.send_message(msg.chat.id, html.escape(text[:_TRACES_TEXT_LIMIT]))
+
+
+async def handle_send_now(bot, msg: types.Message | LazyMessage):
     # trigger send
     from .scheduler import send_daily
 
@@ -418,7 +553,7 @@ async def handle_send_now(bot, msg: types.Message):
     await bot.send_message(msg.chat.id, "Рассылка отправлена")
 
 
-async def handle_joke_subscription(bot, msg: types.Message, subscribed: bool):
-    await asyncio.to_thread(_set_joke_subscription, msg.from_user.id, subscribed)
+async def handle_joke_subscription(bot, msg: types.Message | LazyMessage, subscribed: bool):
+    await _set_joke_subscription(msg.from_user.id, subscribed)
     label = "Вы подписались на ежедневные шутки" if subscribed else "Вы отписались от ежедневных шуток"
     await bot.send_message(msg.chat.id, label, reply_markup=joke_subscription_keyboard(subscribed))
@@ -1,20 +1,30 @@
 import asyncio
+import contextvars
 import html
 import logging
+import os
 import re
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 from zoneinfo import ZoneInfo
 
 import httpx
-from bs4 import BeautifulSoup
+from sqlalchemy import select
 
-from ..db import SessionLocal
+from .. import metrics, tracing
+from ..analytics import mark_cache_hit
+from ..db import AsyncSessionLocal, write_lock
 from ..models import CachedHoroscope
 
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://horo.mail.ru"
+BASE_URL = os.getenv("HOROSCOPE_BASE_URL", "https://horo.mail.ru")
 SIGN_PATH = "/prediction/{sign}/today/"
+HOROSCOPE_PREFETCH_ENABLED = os.getenv("HOROSCOPE_PREFETCH_ENABLED", "true").strip().lower() == "true"
+HOROSCOPE_PREFETCH_CONCURRENCY = int(os.getenv("HOROSCOPE_PREFETCH_CONCURRENCY", "2"))
+# After a sign's scrape fails, prefetching leaves it alone this long so an outage is not hammered.
+HOROSCOPE_PREFETCH_RETRY_SECONDS = float(os.getenv("HOROSCOPE_PREFETCH_RETRY_SECONDS", "300"))
 
 # Telegram message limit is 4096 characters
 TELEGRAM_MESSAGE_LIMIT = 4096
@@ -183,23 +193,141 @@ def extract_horoscope_text(soup) -> str:
     return "Не удалось получить текст гороскопа"
 
 
+# Scrapes in progress, keyed by sign; concurrent requests for a sign share one.
+_fetches: dict[str, asyncio.Task[str]] = {}
+# Signs known to be cached for _warm_day, so prefetching a warm keyboard costs no query.
+_warm: set[str] = set()
+# Monotonic time of each sign's last failed scrape on _warm_day.
+_failed: dict[str, float] = {}
+_warm_day: date | None = None
+_prefetch_slots = asyncio.Semaphore(HOROSCOPE_PREFETCH_CONCURRENCY)
+_parse_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="horo-parse")
+
+
+def _today_msk() -> date:
+    return datetime.now(ZoneInfo("Europe/Moscow")).date()
+
+
+def _roll_day(today: date) -> None:
+    global _warm_day
+    if _warm_day != today:
+        _warm.clear()
+        _failed.clear()
+        _warm_day = today
+
+
+def _mark_warm(sign: str, today: date) -> None:
+    _roll_day(today)
+    _warm.add(sign)
+    _failed.pop(sign, None)
+
+
+def _mark_failed(sign: str, today: date) -> None:
+    _roll_day(today)
+    _failed[sign] = time.monotonic()
+
+
+def _failed_recently(sign: str, today: date) -> bool:
+    failed_at = _failed.get(sign) if _warm_day == today else None
+    return failed_at is not None and time.monotonic() - failed_at < HOROSCOPE_PREFETCH_RETRY_SECONDS
+
+
+def _is_warm(sign: str, today: date) -> bool:
+    return _warm_day == today and sign in _warm
+
+
+def _shared_fetch(sign: str, context: contextvars.Context | None = None) -> asyncio.Task[str]:
+    """The scrape in progress for ``sign``, starting one if there is none."""
+    task = _fetches.get(sign)
+    if task is None:
+        task = asyncio.create_task(_scrape(sign), context=context)
+        _fetches[sign] = task
+        task.add_done_callback(lambda done: _fetches.pop(sign) if _fetches.get(sign) is done else None)
+    return task
+
+
 async def fetch_horoscope(sign: str) -> str:
     """Fetch horoscope for a given zodiac sign with ratings"""
     # check cache
-    db = SessionLocal()
     try:
-        msk = ZoneInfo("Europe/Moscow")
-        now_msk = datetime.now(msk)
-        today_msk = now_msk.date()
-        cached = db.query(CachedHoroscope).filter_by(sign=sign, date=today_msk).first()
+        today_msk = _today_msk()
+        with tracing.span("db horoscope_cache_get", sign=sign):
+            async with AsyncSessionLocal() as db:
+                cached = (
+                    await db.execute(select(CachedHoroscope.content).filter_by(sign=sign, date=today_msk))
+                ).scalar()
         if cached:
             logger.info(f"Using cached horoscope for {sign}")
-            return cached.content
+            _mark_warm(sign, today_msk)
+            mark_cache_hit(True)
+            metrics.HOROSCOPE_CACHE_HIT.inc()
+            return cached
     except Exception as e:
         logger.warning(f"Error checking cache: {e}")
-    finally:
-        db.close()
+    mark_cache_hit(False)
+    metrics.HOROSCOPE_CACHE_MISS.inc()
+
+    # Shielded: a cancelled caller must not cancel a scrape others are waiting on.
+    return await asyncio.shield(_shared_fetch(sign))
+
+
+async def prefetch(signs: list[str]) -> int:
+    """Scrape today's uncached ``signs`` in the background; returns how many were fetched.
+
+    Called when the sign keyboard is shown, so the tap that follows finds the
+    cache warm. Signs already being fetched or whose scrape failed within
+    HOROSCOPE_PREFETCH_RETRY_SECONDS are skipped, and at most
+    HOROSCOPE_PREFETCH_CONCURRENCY scrapes run for prefetching at a time.
+    """
+    today_msk = _today_msk()
+    missing = [
+        sign
+        for sign in signs
+        if not _is_warm(sign, today_msk) and sign not in _fetches and not _failed_recently(sign, today_msk)
+    ]
+    if not missing:
+        return 0
+    with tracing.span("db horoscope_cache_signs"):
+        async with AsyncSessionLocal() as db:
+            cached = set((await db.execute(select(CachedHoroscope.sign).filter_by(date=today_msk))).scalars().all())
+    for sign in cached:
+        _mark_warm(sign, today_msk)
+
+    async def fetch_one(sign: str) -> bool:
+        async with _prefetch_slots:
+            # A user's tap may have fetched it while this one waited for a slot.
+            if _is_warm(sign, today_msk) or sign in _fetches or _failed_recently(sign, today_msk):
+                return False
+            await asyncio.shield(_shared_fetch(sign, contextvars.Context()))
+        if not _is_warm(sign, today_msk):
+            return False
+        metrics.HOROSCOPE_PREFETCHES.inc()
+        return True
+
+    fetched = await asyncio.gather(*(fetch_one(sign) for sign in missing if sign not in cached))
+    return sum(fetched)
+
+
+def _parse_page(html: str) -> tuple[str, dict]:
+    """Horoscope text (truncated and escaped) and ratings from a prediction page."""
+    # Imported on the first cache miss rather than at startup.
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Extract full horoscope text
+    text = extract_horoscope_text(soup)
 
+    # Truncate text to fit Telegram limits
+    text = truncate_text(text)
+    text = sanitize_for_telegram_html(text)
+
+    # Extract ratings
+    return text, extract_ratings(soup)
+
+
+async def _scrape(sign: str) -> str:
+    """Download, parse and cache today's horoscope for ``sign``."""
     url = BASE_URL + SIGN_PATH.format(sign=sign)
     headers = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:147.0) Gecko/20100101 Firefox/147.0"}
 
@@ -207,20 +335,20 @@ async def fetch_horoscope(sign: str) -> str:
         for attempt in range(3):
             try:
                 logger.info(f"Fetching horoscope for {sign}, attempt {attempt + 1}")
-                resp = await client.get(url, headers=headers)
-                resp.raise_for_status()
-                html = resp.text
-                soup = BeautifulSoup(html, "html.parser")
-
-                # Extract full horoscope text
-                text = extract_horoscope_text(soup)
-
-                # Truncate text to fit Telegram limits
-                text = truncate_text(text)
-                text = sanitize_for_telegram_html(text)
-
-                # Extract ratings
-                ratings = extract_ratings(soup)
+                started = time.perf_counter()
+                try:
+                    with tracing.span("http GET", url=url, attempt=attempt + 1):
+                        resp = await client.get(url, headers=headers)
+                        resp.raise_for_status()
+                except Exception:
+                    metrics.UPSTREAM_LATENCY.labels("horoscope", "error").observe(time.perf_counter() - started)
+                    raise
+                metrics.UPSTREAM_LATENCY.labels("horoscope", "ok").observe(time.perf_counter() - started)
+                with tracing.span("parse horoscope"):
+                    # Parsing a page takes tens of milliseconds; on the event loop it would stall every update.
+                    # One thread: parallel parses would only fight the loop for the GIL.
+                    loop = asyncio.get_running_loop()
+                    text, ratings = await loop.run_in_executor(_parse_executor, _parse_page, resp.text)
 
                 # Format output with ratings
                 output = f"🌟 {text}\n\n"
@@ -244,19 +372,16 @@ async def fetch_horoscope(sign: str) -> str:
                 logger.info(f"Final message length: {len(output)} chars")
 
                 # save to cache
-                db = SessionLocal()
                 try:
-                    msk = ZoneInfo("Europe/Moscow")
-                    now_msk = datetime.now(msk)
-                    today_msk = now_msk.date()
-                    ch = CachedHoroscope(sign=sign, date=today_msk, content=output)
-                    db.add(ch)
-                    db.commit()
+                    today_msk = _today_msk()
+                    with tracing.span("db horoscope_cache_put", sign=sign):
+                        async with write_lock(), AsyncSessionLocal() as db:
+                            db.add(CachedHoroscope(sign=sign, date=today_msk, content=output))
+                            await db.commit()
+                    _mark_warm(sign, today_msk)
                     logger.info(f"Cached horoscope for {sign}")
                 except Exception as e:
                     logger.warning(f"Failed to cache horoscope: {e}")
-                finally:
-                    db.close()
 
                 return output
             except Exception as e:
@@ -264,4 +389,5 @@ async def fetch_horoscope(sign: str) -> str:
                 if attempt < 2:
                     await asyncio.sleep(1 + attempt)
 
+        _mark_failed(sign, _today_msk())
         return "Не удалось получить гороскоп — попробуйте позже."
@@ -0,0 +1,85 @@
+"""Return the first Bot API call of a handler inline in the webhook response."""
+
+import contextlib
+import contextvars
+import logging
+import os
+from typing import Any, Iterator
+
+from aiogram import Bot
+from aiogram.methods import (
+    AnswerCallbackQuery,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    SendMessage,
+    TelegramMethod,
+)
+
+logger = logging.getLogger(__name__)
+
+# Methods whose result is never used by handlers and which carry no files.
+_INLINE_METHODS = (SendMessage, EditMessageText, EditMessageReplyMarkup, AnswerCallbackQuery)
+
+_current_reply: contextvars.ContextVar["InlineReply | None"] = contextvars.ContextVar("inline_reply", default=None)
+
+
+def is_enabled() -> bool:
+    return os.getenv("WEBHOOK_INLINE_REPLY", "false").strip().lower() == "true"
+
+
+class InlineReply:
+    """Holds at most one deferred Bot API call for the update being processed."""
+
+    def __init__(self) -> None:
+        self.method: TelegramMethod[Any] | None = None
+        self.closed = False
+
+    def as_response(self, bot: Bot) -> dict[str, Any]:
+        """Serialize the deferred call into a webhook response body."""
+        if self.method is None:
+            return {"ok": True}
+
+        files: dict[str, Any] = {}
+        payload: dict[str, Any] = {"method": self.method.__api_method__}
+        for key, value in self.method.model_dump(warnings=False).items():
+            prepared = bot.session.prepare_value(value, bot=bot, files=files)
+            if prepared is None:
+                continue
+            payload[key] = prepared
+        return payload
+
+
+class InlineReplyMiddleware:
+    """Session middleware deferring the first eligible call of an update.
+
+    A second call made by the same handler flushes the deferred one first, so
+    the order of outgoing requests is preserved.
+    """
+
+    async def __call__(self, make_request, bot: Bot, method: TelegramMethod[Any]):
+        reply = _current_reply.get()
+        if reply is None or reply.closed:
+            return await make_request(bot, method)
+
+        if reply.method is None and isinstance(method, _INLINE_METHODS):
+            reply.method = method
+            return True
+
+        pending, reply.method = reply.method, None
+        reply.closed = True
+        if pending is not None:
+            await make_request(bot, pending)
+        return await make_request(bot, method)
+
+
+@contextlib.contextmanager
+def capture() -> Iterator[InlineReply]:
+    """Collect the first Bot API call made while the block runs."""
+    reply = InlineReply()
+    token = _current_reply.set(reply)
+    try:
+        yield reply
+    finally:
+        # Tasks spawned inside the block inherit the context; make them send directly.
+        reply.closed = True
+        _current_reply.reset(token)
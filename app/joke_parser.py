@@ -1,22 +1,34 @@
 import asyncio
 import logging
+import os
 import random
 import re
+import time
 
 import httpx
-from bs4 import BeautifulSoup
+
+from . import metrics, tracing
 
 logger = logging.getLogger(__name__)
 
-JOKE_URL = "https://nekdo.ru/random/"
+JOKE_URL = os.getenv("JOKE_URL", "https://nekdo.ru/random/")
 TIMEOUT = 10.0
 
 
 async def fetch_random_joke() -> str | None:
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-            response = await client.get(JOKE_URL, follow_redirects=True)
-            response.raise_for_status()
+        started = time.perf_counter()
+        try:
+            with tracing.span("http GET", url=JOKE_URL):
+                async with httpx.AsyncClient(timeout=TIMEOUT) as client:
+                    response = await client.get(JOKE_URL, follow_redirects=True)
+                    response.raise_for_status()
+        except Exception:
+            metrics.UPSTREAM_LATENCY.labels("joke", "error").observe(time.perf_counter() - started)
+            raise
+        metrics.UPSTREAM_LATENCY.labels("joke", "ok").observe(time.perf_counter() - started)
+
+        from bs4 import BeautifulSoup
 
         soup = BeautifulSoup(response.text, "html.parser")
 
@@ -20,6 +20,15 @@ ZODIAC_SIGNS = [
     "pisces",
 ]
 
+# Bit of each sign in a 12-bit subscription mask.
+SIGN_BITS = {sign: 1 << index for index, sign in enumerate(ZODIAC_SIGNS)}
+ALL_SIGNS_MASK = (1 << len(ZODIAC_SIGNS)) - 1
+
+
+def mask_to_signs(mask: int) -> list[str]:
+    return [sign for sign in ZODIAC_SIGNS if mask & SIGN_BITS[sign]]
+
+
 SIGN_TITLES = {
     "aries": "Овен",
     "taurus": "Телец",
@@ -63,6 +72,10 @@ def back_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="Назад", callback_data="back:list")]])
 
 
+JOKE_SUBSCRIBE_TEXT = "Подписаться на шутки"
+JOKE_UNSUBSCRIBE_TEXT = "Отписаться от шуток"
+
+
 def joke_subscription_keyboard(subscribed: bool) -> ReplyKeyboardMarkup:
-    label = "Отписаться от шуток" if subscribed else "Подписаться на шутки"
+    label = JOKE_UNSUBSCRIBE_TEXT if subscribed else JOKE_SUBSCRIBE_TEXT
     return ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text=label)]], resize_keyboard=True)
@@ -0,0 +1,75 @@
+"""Cheap views over raw update dicts for the webhook fast path."""
+
+from typing import Any
+
+import orjson
+from aiogram import types
+
+
+def loads(body: bytes | str) -> Any:
+    """Decode a JSON request body."""
+    return orjson.loads(body)
+
+
+class LazyUser:
+    __slots__ = ("id", "username", "first_name", "last_name")
+
+    def __init__(self, raw: dict) -> None:
+        self.id: int = raw["id"]
+        self.username: str | None = raw.get("username")
+        self.first_name: str | None = raw.get("first_name")
+        self.last_name: str | None = raw.get("last_name")
+
+
+class LazyChat:
+    __slots__ = ("id",)
+
+    def __init__(self, raw: dict) -> None:
+        self.id: int = raw["id"]
+
+
+class LazyMessage:
+    __slots__ = ("message_id", "date", "text", "chat", "from_user")
+
+    def __init__(self, raw: dict) -> None:
+        self.message_id: int = raw.get("message_id", 0)
+        self.date: int = raw.get("date", 0)
+        self.text: str | None = raw.get("text")
+        self.chat = LazyChat(raw["chat"])
+        sender = raw.get("from")
+        self.from_user = LazyUser(sender) if sender else None
+
+
+class LazyCallbackQuery:
+    __slots__ = ("id", "data", "from_user", "message")
+
+    def __init__(self, raw: dict) -> None:
+        self.id: str = raw["id"]
+        self.data: str | None = raw.get("data")
+        self.from_user = LazyUser(raw["from"])
+        message = raw.get("message")
+        self.message = LazyMessage(message) if message else None
+
+
+class LazyUpdate:
+    """Duck-typed stand-in for ``types.Update`` exposing only the routed fields.
+
+    Only ``message`` and ``callback_query`` are decoded; call ``to_model`` when a
+    handler needs the fully validated aiogram object.
+    """
+
+    __slots__ = ("raw", "update_id", "message", "callback_query", "_model")
+
+    def __init__(self, raw: dict) -> None:
+        self.raw = raw
+        self.update_id: int = raw["update_id"]
+        message = raw.get("message")
+        self.message = LazyMessage(message) if message else None
+        callback_query = raw.get("callback_query")
+        self.callback_query = LazyCallbackQuery(callback_query) if callback_query else None
+        self._model: types.Update | None = None
+
+    def to_model(self) -> types.Update:
+        if self._model is None:
+            self._model = types.Update(**self.raw)
+        return self._model
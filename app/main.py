@@ -1,12 +1,16 @@
+import asyncio
+import contextlib
+import contextvars
+import hmac
 import logging
 import os
 
-from fastapi import FastAPI
-from slowapi.errors import RateLimitExceeded
+from fastapi import FastAPI, Header, HTTPException, Response
+from prometheus_client import CONTENT_TYPE_LATEST
 
+from . import analytics, capture, metrics, profiling, shutdown, startup, tracing
 from .bot import initialize_bot, setup_bot_commands
-from .db import Base, engine, ensure_schema
-from .rate_limit import limiter, rate_limit_handler
+from .db import async_engine, run_migrations
 from .scheduler import setup_scheduler
 from .webhook import router as webhook_router
 
@@ -14,48 +18,74 @@ from .webhook import router as webhook_router
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="TGBot", description="Telegram Horoscope Bot")
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, rate_limit_handler)
-app.include_router(webhook_router)
+_telegram_setup_task: asyncio.Task | None = None
+
 
-# create tables if not exist (simple approach)
-try:
-    logger.info("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    ensure_schema()
-    logger.info("Database tables created successfully")
-except Exception as e:
-    logger.warning(f"Warning: Could not create tables on startup: {e}")
+async def _setup_telegram(bot_instance, webhook_url: str | None, webhook_secret: str) -> None:
+    """Register bot commands and the webhook concurrently; failures are logged, not fatal."""
+    calls = {"bot commands": setup_bot_commands()}
+    if webhook_url:
+        # Pending updates are kept: during a rolling deploy they include those the old instance refused.
+        # Stale ones are still dropped by MAX_UPDATE_AGE_SECONDS.
+        calls["webhook"] = bot_instance.set_webhook(
+            url=webhook_url,
+            secret_token=webhook_secret,
+            drop_pending_updates=False,
+        )
+    with startup.phase("telegram setup"):
+        results = await asyncio.gather(*calls.values(), return_exceptions=True)
+    for name, result in zip(calls, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Could not set {name}: {result}")
+    logger.info(f"Telegram setup finished in {startup.timings['telegram setup']:.2f} s")
 
 
-# start scheduler once on startup
-@app.on_event("startup")
-async def startup_event():
+async def _startup():
+    """Initialize the bot, schema and background workers; return the scheduler if enabled."""
+    global _telegram_setup_task
+    startup.record("imports", startup.since_import())
     bot_instance = initialize_bot()
+    metrics.instrument_engine(async_engine.sync_engine)
 
     webhook_secret = os.getenv("WEBHOOK_SECRET")
     if not webhook_secret:
         raise RuntimeError("WEBHOOK_SECRET environment variable is required.")
 
-    logger.info("Starting scheduler...")
-    setup_scheduler(bot_instance)
-    try:
-        await setup_bot_commands()
-    except Exception as e:
-        logger.warning(f"Could not set bot commands: {e}")
+    # Telegram setup calls are not needed to serve updates; run them alongside the migrations.
+    _telegram_setup_task = asyncio.create_task(
+        _setup_telegram(bot_instance, os.getenv("WEBHOOK_URL"), webhook_secret), context=contextvars.Context()
+    )
 
-    webhook_url = os.getenv("WEBHOOK_URL")
-    if webhook_url:
+    # bring the schema up to date before serving
+    with startup.phase("migrations"):
         try:
-            await bot_instance.set_webhook(
-                url=webhook_url,
-                secret_token=webhook_secret,
-                drop_pending_updates=True,
-            )
+            await asyncio.to_thread(run_migrations)
         except Exception as e:
-            logger.warning(f"Could not reset webhook: {e}")
-    logger.info("Scheduler started")
+            logger.warning(f"Warning: Could not apply migrations on startup: {e}")
+
+    analytics.start_flusher()
+    profiling.start_lag_monitor()
+    tracing.start_exporter()
+    capture.start_writer()
+
+    logger.info("Starting scheduler...")
+    sched = setup_scheduler(bot_instance)
+    startup.record("ready", startup.since_import())
+    startup.report()
+    return sched
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    sched = await _startup()
+    yield
+    if _telegram_setup_task is not None and not _telegram_setup_task.done():
+        _telegram_setup_task.cancel()
+    await shutdown.drain(sched)
+
+
+app = FastAPI(title="TGBot", description="Telegram Horoscope Bot", lifespan=lifespan)
+app.include_router(webhook_router)
 
 
 @app.get("/")
@@ -66,3 +96,24 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
+
+
+def _check_metrics_token(authorization: str | None, token: str | None) -> None:
+    """Require METRICS_TOKEN, when set, as a bearer token or ?token= for scrapers without headers."""
+    expected = os.getenv("METRICS_TOKEN", "")
+    if not expected:
+        return
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[len("bearer ") :].strip()
+    if not token:
+        # Unauthenticated callers are not told the endpoint exists.
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(token.encode(), expected.encode()):
+        logger.warning("Metrics token mismatch")
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@app.get("/metrics")
+async def prometheus_metrics(token: str | None = None, authorization: str | None = Header(None)):
+    _check_metrics_token(authorization, token)
+    return Response(metrics.render(), media_type=CONTENT_TYPE_LATEST)
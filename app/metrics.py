@@ -0,0 +1,108 @@
+"""Prometheus metrics.
+
+Histograms and counters are updated inline; values that are already counted
+elsewhere (user cache, analytics buffer) are read at scrape time by a
+collector instead of being double-counted on the hot path.
+"""
+
+import time
+from typing import Any
+
+from aiogram import Bot
+from aiogram.methods import TelegramMethod
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Telegram expects webhook answers well under a second; DB calls are sub-millisecond.
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+_SLOW_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+WEBHOOK_LATENCY = Histogram("tgbot_webhook_latency_seconds", "Webhook request handling time", buckets=_SLOW_BUCKETS)
+HANDLER_LATENCY = Histogram(
+    "tgbot_handler_latency_seconds", "Update handling time by command", ["command"], buckets=_SLOW_BUCKETS
+)
+DB_LATENCY = Histogram("tgbot_db_latency_seconds", "Database statement time", ["operation"], buckets=_FAST_BUCKETS)
+UPSTREAM_LATENCY = Histogram(
+    "tgbot_upstream_latency_seconds", "Upstream scrape time", ["source", "outcome"], buckets=_SLOW_BUCKETS
+)
+BOT_API_LATENCY = Histogram(
+    "tgbot_bot_api_latency_seconds", "Bot API call time", ["method", "outcome"], buckets=_SLOW_BUCKETS
+)
+EVENT_LOOP_LAG = Histogram("tgbot_event_loop_lag_seconds", "Event loop scheduling delay", buckets=_FAST_BUCKETS)
+
+UPDATES_DROPPED = Counter("tgbot_updates_dropped_total", "Updates dropped before handling", ["reason"])
+DEDUP_ERRORS = Counter("tgbot_dedup_errors_total", "Updates processed without dedup because it failed")
+CACHE_REQUESTS = Counter("tgbot_cache_requests_total", "Cache lookups", ["cache", "result"])
+HOROSCOPE_PREFETCHES = Counter("tgbot_horoscope_prefetches_total", "Horoscopes cached ahead of a tap on the keyboard")
+
+BROADCAST_MESSAGES = Counter("tgbot_broadcast_messages_total", "Broadcast messages by outcome", ["kind", "outcome"])
+BROADCAST_RETRIES = Counter("tgbot_broadcast_retries_total", "Broadcast sends retried after flood control", ["kind"])
+BROADCAST_IN_FLIGHT = Gauge("tgbot_broadcast_in_flight", "Broadcast messages queued but not yet sent", ["kind"])
+STARTUP_SECONDS = Gauge("tgbot_startup_seconds", "Duration of each startup step of this process", ["phase"])
+
+DROPPED_DUPLICATE = UPDATES_DROPPED.labels("duplicate")
+DROPPED_STALE = UPDATES_DROPPED.labels("stale")
+DROPPED_RATE_LIMITED = UPDATES_DROPPED.labels("rate_limited")
+HOROSCOPE_CACHE_HIT = CACHE_REQUESTS.labels("horoscope", "hit")
+HOROSCOPE_CACHE_MISS = CACHE_REQUESTS.labels("horoscope", "miss")
+
+
+class _StateCollector:
+    """Exposes counters kept by other modules without touching their hot paths."""
+
+    def describe(self):
+        # Registering would otherwise call collect() while the app is still importing.
+        return []
+
+    def collect(self):
+        from .analytics import interaction_log
+        from .user_cache import user_state_cache
+
+        cache = CounterMetricFamily("tgbot_user_cache_requests", "User state cache lookups", labels=["result"])
+        cache.add_metric(["hit"], user_state_cache.hits)
+        cache.add_metric(["miss"], user_state_cache.misses)
+        yield cache
+        yield GaugeMetricFamily("tgbot_user_cache_entries", "User state cache size", value=len(user_state_cache))
+        dropped = CounterMetricFamily("tgbot_analytics_events_dropped", "Analytics events lost")
+        dropped.add_metric([], interaction_log.dropped)
+        yield dropped
+
+
+REGISTRY.register(_StateCollector())
+
+
+class BotApiMetricsMiddleware:
+    """Session middleware timing every Bot API request by method."""
+
+    async def __call__(self, make_request, bot: Bot, method: TelegramMethod[Any]):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await make_request(bot, method)
+            outcome = "ok"
+            return result
+        finally:
+            BOT_API_LATENCY.labels(method.__api_method__, outcome).observe(time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    operation = statement.split(None, 1)[0].upper()
+    DB_LATENCY.labels(operation).observe(time.perf_counter() - context._metrics_started)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement of ``engine``; called once by the app at startup."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def render() -> bytes:
+    return generate_latest(REGISTRY)
@@ -6,7 +6,9 @@ from sqlalchemy import (
     Column,
     Date,
     DateTime,
+    Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
@@ -25,8 +27,27 @@ class User(Base):
     first_name = Column(String, nullable=True)
     last_name = Column(String, nullable=True)
     joke_subscribed = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    # Bit i set when the user is subscribed to ZODIAC_SIGNS[i]; mirrors active subscriptions rows.
+    sign_mask = Column(Integer, default=0, server_default="0", nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.datetime.now(datetime.timezone.utc))
     subscriptions = relationship("Subscription", back_populates="user")
+    # Partial indexes for the broadcast and stats reads; see migrations/versions/0002.
+    __table_args__ = (
+        Index(
+            "ix_users_sign_mask_subscribed",
+            sign_mask,
+            telegram_id,
+            sqlite_where=sign_mask != 0,
+            postgresql_where=sign_mask != 0,
+        ),
+        Index(
+            "ix_users_joke_subscribed",
+            joke_subscribed,
+            telegram_id,
+            sqlite_where=joke_subscribed.is_(True),
+            postgresql_where=joke_subscribed.is_(True),
+        ),
+    )
 
 
 class Subscription(Base):
@@ -35,7 +56,7 @@ class Subscription(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     sign = Column(String, nullable=False)
     active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.datetime.now(datetime.timezone.utc))
     user = relationship("User", back_populates="subscriptions")
     __table_args__ = (UniqueConstraint("user_id", "sign", name="_user_sign_uc"),)
 
@@ -46,7 +67,7 @@ class CachedHoroscope(Base):
     sign = Column(String, nullable=False, index=True)
     date = Column(Date, nullable=False, index=True)
     content = Column(Text, nullable=False)
-    fetched_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    fetched_at = Column(DateTime(timezone=True), default=lambda: datetime.datetime.now(datetime.timezone.utc))
     __table_args__ = (UniqueConstraint("sign", "date", name="_sign_date_uc"),)
 
 
@@ -54,4 +75,51 @@ class ProcessedUpdate(Base):
     __tablename__ = "processed_updates"
     id = Column(Integer, primary_key=True, index=True)
     update_id = Column(BigInteger, unique=True, index=True, nullable=False)
-    processed_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    processed_at = Column(DateTime(timezone=True), default=lambda: datetime.datetime.now(datetime.timezone.utc))
+
+
+class SubscriberCounter(Base):
+    """Materialized subscriber totals, updated in the same transaction as subscriptions."""
+
+    __tablename__ = "subscriber_counters"
+    name = Column(String, primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+
+
+class InteractionEvent(Base):
+    """Append-only log of handled updates, written in bulk by app.analytics."""
+
+    __tablename__ = "interaction_events"
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    command = Column(String, nullable=False)
+    sign = Column(String, nullable=False, default="")
+    latency_ms = Column(Float, nullable=False)
+    cache_hit = Column(Boolean, nullable=True)
+
+
+class InteractionDaily(Base):
+    __tablename__ = "interaction_daily"
+    day = Column(Date, primary_key=True)
+    command = Column(String, primary_key=True)
+    # "" when the interaction has no sign, so the key never contains NULL.
+    sign = Column(String, primary_key=True)
+    events = Column(Integer, nullable=False)
+    latency_ms_total = Column(Float, nullable=False)
+    cache_hits = Column(Integer, nullable=False)
+    cache_lookups = Column(Integer, nullable=False)
+
+
+class BroadcastCheckpoint(Base):
+    """Position of the last broadcast of each kind, so an interrupted run resumes after it."""
+
+    __tablename__ = "broadcast_checkpoints"
+    kind = Column(String, primary_key=True)
+    day = Column(Date, nullable=False)
+    # Recipients are sent in (sign order, telegram_id) order; "" for broadcasts without signs.
+    sign = Column(String, nullable=False, default="")
+    last_telegram_id = Column(BigInteger, nullable=True)
+    # Message of a broadcast that is not re-fetchable (the daily joke).
+    payload = Column(Text, nullable=True)
+    completed = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,153 @@
+"""Long-polling runner, an alternative to the webhook for local runs and NAT setups.
+
+Run with ``python -m app.polling``.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+
+from . import analytics, metrics, profiling, shutdown, tracing
+from .bot import initialize_bot, process_update, setup_bot_commands
+from .db import async_engine, run_migrations
+from .scheduler import setup_scheduler
+from .updates import _unmark_update_processed, accept_update
+
+logger = logging.getLogger(__name__)
+
+POLLING_TIMEOUT_SECONDS = int(os.getenv("POLLING_TIMEOUT_SECONDS", "30"))
+POLLING_BATCH_SIZE = 100
+POLLING_MAX_BATCH_ATTEMPTS = 3
+POLLING_RETRY_DELAY_SECONDS = 2.0
+
+
+def _chat_key(update: dict) -> int:
+    """Key used to keep updates of one chat in order."""
+    for key in ("message", "edited_message"):
+        msg = update.get(key)
+        if isinstance(msg, dict) and isinstance(msg.get("chat"), dict):
+            return msg["chat"]["id"]
+    cb = update.get("callback_query")
+    if isinstance(cb, dict):
+        msg = cb.get("message")
+        if isinstance(msg, dict) and isinstance(msg.get("chat"), dict):
+            return msg["chat"]["id"]
+        return cb["from"]["id"]
+    return update["update_id"]
+
+
+async def _process_chat(updates: list[dict]) -> list[int]:
+    """Process one chat sequentially; return ids left unprocessed after a failure."""
+    for index, update in enumerate(updates):
+        with tracing.trace("polling", update_id=update["update_id"]):
+            if not await accept_update(update):
+                continue
+            try:
+                await process_update(update)
+            except Exception:
+                await _unmark_update_processed(update["update_id"])
+                return [u["update_id"] for u in updates[index:]]
+    return []
+
+
+async def process_batch(updates: list[dict]) -> list[int]:
+    """Dispatch a batch concurrently across chats, in order within each chat.
+
+    Returns ids of updates that failed or were skipped behind a failure.
+    """
+    by_chat: dict[int, list[dict]] = {}
+    for update in sorted(updates, key=lambda u: u["update_id"]):
+        by_chat.setdefault(_chat_key(update), []).append(update)
+
+    results = await asyncio.gather(*(_process_chat(chat_updates) for chat_updates in by_chat.values()))
+    return [update_id for failed in results for update_id in failed]
+
+
+async def _next_batch(bot_instance, offset: int | None, stop: asyncio.Event):
+    """getUpdates, or None once ``stop`` is set; unconfirmed updates are redelivered later."""
+    fetch = asyncio.ensure_future(
+        bot_instance.get_updates(
+            offset=offset,
+            limit=POLLING_BATCH_SIZE,
+            timeout=POLLING_TIMEOUT_SECONDS,
+            request_timeout=POLLING_TIMEOUT_SECONDS + 10,
+        )
+    )
+    stopped = asyncio.ensure_future(stop.wait())
+    await asyncio.wait({fetch, stopped}, return_when=asyncio.FIRST_COMPLETED)
+    stopped.cancel()
+    if stop.is_set():
+        fetch.cancel()
+        return None
+    return fetch.result()
+
+
+async def run_polling(stop: asyncio.Event) -> None:
+    bot_instance = initialize_bot()
+    metrics.instrument_engine(async_engine.sync_engine)
+
+    run_migrations()
+    analytics.start_flusher()
+    profiling.start_lag_monitor()
+    tracing.start_exporter()
+    sched = setup_scheduler(bot_instance)
+    try:
+        await setup_bot_commands()
+    except Exception as e:
+        logger.warning(f"Could not set bot commands: {e}")
+
+    try:
+        # getUpdates is rejected while a webhook is set.
+        await bot_instance.delete_webhook(drop_pending_updates=False)
+        logger.info("Polling started")
+
+        offset: int | None = None
+        attempts = 0
+        while not stop.is_set():
+            try:
+                batch = await _next_batch(bot_instance, offset, stop)
+            except Exception as e:
+                logger.warning(f"getUpdates failed: {e}")
+                await asyncio.sleep(POLLING_RETRY_DELAY_SECONDS)
+                continue
+
+            if not batch:
+                continue
+
+            updates = [u.model_dump(mode="json", by_alias=True, exclude_none=True) for u in batch]
+            # A batch in progress when the signal arrives is finished before draining.
+            failed = await process_batch(updates)
+            attempts += 1
+            if failed and attempts < POLLING_MAX_BATCH_ATTEMPTS:
+                # Keep the offset so Telegram redelivers the batch; processed updates are deduplicated.
+                logger.warning(f"Batch attempt {attempts} failed for updates {failed}, retrying")
+                await asyncio.sleep(POLLING_RETRY_DELAY_SECONDS)
+                continue
+            if failed:
+                logger.error(f"Giving up on updates {failed} after {attempts} attempts")
+
+            offset = max(u.update_id for u in batch) + 1
+            attempts = 0
+        if offset is not None:
+            # Confirm the last batch so the next process does not receive it again.
+            await bot_instance.get_updates(offset=offset, limit=1, timeout=0)
+    finally:
+        await shutdown.drain(sched)
+
+
+async def _run() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    await run_polling(stop)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""On-demand sampling profiler and event-loop lag monitor.
+
+Both inspect the event-loop thread from a helper thread via ``sys._current_frames()``,
+so the loop itself does no extra work per update. While no profile is running the
+only hot-path cost is a ``None`` check in ``request_finished``.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from types import FrameType
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "250"))
+LOOP_LAG_CHECK_MS = float(os.getenv("LOOP_LAG_CHECK_MS", "100"))
+
+
+def _frame_name(frame: FrameType) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}:{frame.f_lineno}"
+
+
+def collapse_stack(frame: FrameType | None) -> str:
+    """Render a stack root-first in the collapsed format read by flamegraph tools."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread at a fixed interval.
+
+    With ``requests`` set, ``finished`` is set once that many updates were handled.
+    """
+
+    def __init__(self, thread_id: int, interval: float, requests: int | None = None) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.requests_left = requests
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.duration = 0.0
+        self.finished = asyncio.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+        self.duration = time.perf_counter() - self.started
+
+    def request_finished(self) -> None:
+        if self.requests_left is None:
+            return
+        self.requests_left -= 1
+        if self.requests_left <= 0:
+            self.finished.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+                self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+_active: SamplingProfiler | None = None
+
+
+def is_running() -> bool:
+    return _active is not None
+
+
+def request_finished() -> None:
+    profiler = _active
+    if profiler is not None:
+        profiler.request_finished()
+
+
+async def profile(seconds: float | None = None, requests: int | None = None) -> SamplingProfiler:
+    """Sample the event loop for ``seconds`` or until ``requests`` updates were handled.
+
+    Either way the run is capped at PROFILE_MAX_SECONDS.
+    """
+    global _active
+    if seconds is not None and not (math.isfinite(seconds) and seconds > 0):
+        raise ValueError(f"Profile duration must be a positive number of seconds, got {seconds}")
+    if _active is not None:
+        raise RuntimeError("A profile is already running")
+    profiler = SamplingProfiler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000, requests)
+    _active = profiler
+    profiler.start()
+    try:
+        timeout = min(seconds or PROFILE_MAX_SECONDS, PROFILE_MAX_SECONDS)
+        try:
+            await asyncio.wait_for(profiler.finished.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    finally:
+        _active = None
+        await profiler.stop()
+    return profiler
+
+
+class LoopLagMonitor:
+    """Detects callbacks that block the event loop.
+
+    A task on the loop records a heartbeat every ``interval``; a watchdog thread
+    logs the loop thread's stack when the heartbeat is older than ``threshold``,
+    i.e. while the slow callback is still running.
+    """
+
+    def __init__(self, threshold: float, interval: float) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls = 0
+        self._heartbeat = time.monotonic()
+        self._thread_id = 0
+        self._stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+
+    async def _beat(self) -> None:
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._heartbeat = now = time.monotonic()
+            lag = max(now - before - self.interval, 0.0)
+            metrics.EVENT_LOOP_LAG.observe(lag)
+            if lag > self.threshold:
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+
+    def _watch(self) -> None:
+        reported: float | None = None
+        while not self._stop.wait(self.interval):
+            heartbeat = self._heartbeat
+            if heartbeat == reported or time.monotonic() - heartbeat < self.threshold:
+                continue
+            # Report each stall once, with the stack of whatever is holding the loop.
+            reported = heartbeat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>\n"
+            logger.warning(f"Event loop blocked for over {self.threshold * 1000:.0f} ms in:\n{stack}")
+
+
+_monitor: LoopLagMonitor | None = None
+
+
+def start_lag_monitor() -> None:
+    global _monitor
+    if LOOP_LAG_THRESHOLD_MS > 0 and _monitor is None:
+        _monitor = LoopLagMonitor(LOOP_LAG_THRESHOLD_MS / 1000, LOOP_LAG_CHECK_MS / 1000)
+        _monitor.start()
+
+
+async def stop_lag_monitor() -> None:
+    global _monitor
+    if _monitor is None:
+        return
+    await _monitor.stop()
+    _monitor = None
@@ -1,21 +1,79 @@
-"""Rate limiting middleware for webhook endpoint."""
+"""Per-user rate limiting for webhook updates."""
 
 import logging
-
-from fastapi import Request, Response
-from fastapi.responses import JSONResponse
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+import os
+import time
+from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
-limiter = Limiter(key_func=get_remote_address, default_limits=["100/minute"])
+USER_RATE_LIMIT_PER_MINUTE = float(os.getenv("USER_RATE_LIMIT_PER_MINUTE", "60"))
+USER_RATE_LIMIT_BURST = float(os.getenv("USER_RATE_LIMIT_BURST", "10"))
+USER_RATE_LIMIT_IDLE_SECONDS = float(os.getenv("USER_RATE_LIMIT_IDLE_SECONDS", "600"))
+
+
+class TokenBucketLimiter:
+    """Token bucket per key with idle eviction.
+
+    Buckets are kept in last-access order, so idle ones are always at the head
+    and eviction only touches expired entries.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: float, idle_seconds: float) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.idle_seconds = idle_seconds
+        self._buckets: OrderedDict[int, list[float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, key: int, now: float | None = None) -> bool:
+        if now is None:
+            now = time.monotonic()
+        self._evict_idle(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [self.burst - 1, now]
+            return True
+
+        self._buckets.move_to_end(key)
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def _evict_idle(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if now - bucket[1] < self.idle_seconds:
+                return
+            del buckets[key]
+
+
+def extract_user_id(update: dict) -> int | None:
+    """Return ``from.id`` of whatever object the update carries."""
+    for value in update.values():
+        if isinstance(value, dict):
+            sender = value.get("from")
+            if isinstance(sender, dict) and isinstance(sender.get("id"), int):
+                return sender["id"]
+    return None
+
+
+limiter = TokenBucketLimiter(USER_RATE_LIMIT_PER_MINUTE, USER_RATE_LIMIT_BURST, USER_RATE_LIMIT_IDLE_SECONDS)
 
 
-async def rate_limit_handler(request: Request, exc: Exception) -> Response:
-    """Handle rate limit exceeded exceptions."""
-    logger.warning(f"Rate limit exceeded for {get_remote_address(request)}")
-    return JSONResponse(
-        status_code=429,
-        content={"ok": False, "error": "Rate limit exceeded"},
-    )
+def is_rate_limited(update: dict) -> bool:
+    user_id = extract_user_id(update)
+    if user_id is None:
+        return False
+    if limiter.allow(user_id):
+        return False
+    logger.debug(f"Rate limit exceeded for user {user_id}")
+    return True
@@ -0,0 +1,260 @@
+"""Single-statement data access for handler operations.
+
+Every function runs on a caller-provided session, so several operations can
+share one transaction; none of them commits.
+"""
+
+import datetime
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    DateTime,
+    Integer,
+    String,
+    bindparam,
+    case,
+    func,
+    literal_column,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .keyboards import ALL_SIGNS_MASK, SIGN_BITS, mask_to_signs
+from .models import SubscriberCounter, Subscription, User
+
+# Literal so PostgreSQL's generic prepared plans still match the partial index predicate.
+_HAS_SIGNS = User.sign_mask != literal_column("0")
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+# Upserts are written as text because SQLAlchemy 1.4 cannot cache compiled
+# ON CONFLICT statements, and compiling them dominated the cost of a click.
+# The syntax is shared by SQLite and PostgreSQL.
+_NOW = bindparam("now", type_=DateTime(timezone=True))
+_ON = bindparam("on", type_=Boolean())
+_OFF = bindparam("off", type_=Boolean())
+# Typed so asyncpg need not infer them from context, e.g. in a SELECT list or a bitwise operand.
+_TELEGRAM_ID = bindparam("telegram_id", type_=BigInteger())
+_SIGN = bindparam("sign", type_=String())
+_BITS = bindparam("bits", type_=Integer())
+_KEEP = bindparam("keep", type_=Integer())
+_VALUE = bindparam("value", type_=Integer())
+
+_UPSERT_USER = text(
+    "INSERT INTO users (telegram_id, username, first_name, last_name, joke_subscribed, created_at) "
+    "VALUES (:telegram_id, :username, :first_name, :last_name, :off, :now) "
+    "ON CONFLICT (telegram_id) DO UPDATE SET "
+    "username = excluded.username, first_name = excluded.first_name, last_name = excluded.last_name"
+).bindparams(_NOW, _OFF)
+
+_ADD_SIGN_BITS = text(
+    "INSERT INTO users (telegram_id, joke_subscribed, sign_mask, created_at) "
+    "VALUES (:telegram_id, :off, :bits, :now) "
+    "ON CONFLICT (telegram_id) DO UPDATE SET sign_mask = users.sign_mask | excluded.sign_mask "
+    "RETURNING sign_mask"
+).bindparams(_NOW, _OFF, _TELEGRAM_ID, _BITS)
+
+_CLEAR_SIGN_BITS = text(
+    "UPDATE users SET sign_mask = sign_mask & :keep WHERE telegram_id = :telegram_id RETURNING sign_mask"
+).bindparams(_KEEP, _TELEGRAM_ID)
+
+_SUBSCRIBE = text(
+    "INSERT INTO subscriptions (user_id, sign, active, created_at) "
+    "SELECT id, :sign, :on, :now FROM users WHERE telegram_id = :telegram_id "
+    "ON CONFLICT (user_id, sign) DO UPDATE SET active = :on WHERE subscriptions.active = :off"
+).bindparams(_NOW, _ON, _OFF, _SIGN, _TELEGRAM_ID)
+
+_UNSUBSCRIBE = (
+    "UPDATE subscriptions SET active = :off "
+    "WHERE user_id = (SELECT id FROM users WHERE telegram_id = :telegram_id) AND active = :on"
+)
+_UNSUBSCRIBE_ALL = text(_UNSUBSCRIBE + " RETURNING sign").bindparams(_ON, _OFF)
+_UNSUBSCRIBE_SIGN = text(_UNSUBSCRIBE + " AND sign = :sign RETURNING sign").bindparams(_ON, _OFF)
+
+_JOKE_ON = text(
+    "INSERT INTO users (telegram_id, joke_subscribed, created_at) VALUES (:telegram_id, :on, :now) "
+    "ON CONFLICT (telegram_id) DO UPDATE SET joke_subscribed = excluded.joke_subscribed "
+    "WHERE users.joke_subscribed = :off"
+).bindparams(_NOW, _ON, _OFF)
+
+_BUMP_COUNTER = text(
+    "INSERT INTO subscriber_counters (name, value) VALUES (:name, :value) "
+    "ON CONFLICT (name) DO UPDATE SET value = subscriber_counters.value + excluded.value"
+).bindparams(_VALUE)
+_SET_COUNTER = text(
+    "INSERT INTO subscriber_counters (name, value) VALUES (:name, :value) "
+    "ON CONFLICT (name) DO UPDATE SET value = excluded.value"
+)
+
+ACTIVE_USERS = "active_users"
+JOKE_SUBSCRIBERS = "joke_subscribers"
+
+
+def sign_counter(sign: str) -> str:
+    return f"sign:{sign}"
+
+
+async def _bump(db: AsyncSession, deltas: dict[str, int]) -> None:
+    await db.execute(_BUMP_COUNTER, [{"name": name, "value": value} for name, value in deltas.items()])
+
+
+async def upsert_user(
+    db: AsyncSession,
+    telegram_id: int,
+    username: str | None = None,
+    first_name: str | None = None,
+    last_name: str | None = None,
+) -> None:
+    """Create the user or refresh their profile fields."""
+    await db.execute(
+        _UPSERT_USER,
+        {
+            "telegram_id": telegram_id,
+            "username": username,
+            "first_name": first_name,
+            "last_name": last_name,
+            "off": False,
+            "now": _now(),
+        },
+    )
+
+
+async def subscribe(db: AsyncSession, telegram_id: int, sign: str) -> bool:
+    """Activate a subscription; return False if it was already active."""
+    bit = SIGN_BITS[sign]
+    # Creates the user if needed and keeps users.sign_mask in step with the row below.
+    mask = (
+        await db.execute(_ADD_SIGN_BITS, {"telegram_id": telegram_id, "bits": bit, "off": False, "now": _now()})
+    ).scalar_one()
+    result = await db.execute(
+        _SUBSCRIBE, {"telegram_id": telegram_id, "sign": sign, "on": True, "off": False, "now": _now()}
+    )
+    if result.rowcount <= 0:
+        return False
+    deltas = {sign_counter(sign): 1}
+    if mask == bit:
+        deltas[ACTIVE_USERS] = 1
+    await _bump(db, deltas)
+    return True
+
+
+async def unsubscribe(db: AsyncSession, telegram_id: int, sign: str) -> bool:
+    """Deactivate one sign, or every sign for ``"all"``; return False if nothing was active."""
+    params = {"telegram_id": telegram_id, "on": True, "off": False}
+    if sign == "all":
+        removed = (await db.execute(_UNSUBSCRIBE_ALL, params)).scalars().all()
+        keep = 0
+    else:
+        removed = (await db.execute(_UNSUBSCRIBE_SIGN, {**params, "sign": sign})).scalars().all()
+        keep = ALL_SIGNS_MASK ^ SIGN_BITS[sign]
+    mask = (await db.execute(_CLEAR_SIGN_BITS, {"telegram_id": telegram_id, "keep": keep})).scalar()
+    if not removed:
+        return False
+    deltas = {sign_counter(removed_sign): -1 for removed_sign in removed}
+    if not mask:
+        deltas[ACTIVE_USERS] = -1
+    await _bump(db, deltas)
+    return True
+
+
+async def is_subscribed(db: AsyncSession, telegram_id: int, sign: str) -> bool:
+    _, mask = await get_user_state(db, telegram_id)
+    return bool(mask & SIGN_BITS[sign])
+
+
+async def get_subscriptions(db: AsyncSession, telegram_id: int) -> list[str]:
+    _, mask = await get_user_state(db, telegram_id)
+    return mask_to_signs(mask)
+
+
+async def get_user_state(db: AsyncSession, telegram_id: int) -> tuple[bool, int]:
+    """Return the joke flag and sign bitmask of a user in one query."""
+    row = (
+        await db.execute(select(User.joke_subscribed, User.sign_mask).where(User.telegram_id == telegram_id))
+    ).first()
+    if row is None:
+        return False, 0
+    return bool(row.joke_subscribed), row.sign_mask
+
+
+async def get_subscribers_stats(db: AsyncSession) -> tuple[int, int, list[tuple[str, int]]]:
+    """Return active users, joke subscribers and subscribers per sign from the counters."""
+    counters = dict((await db.execute(select(SubscriberCounter.name, SubscriberCounter.value))).all())
+    stats = [(sign, counters[sign_counter(sign)]) for sign in SIGN_BITS if counters.get(sign_counter(sign))]
+    return counters.get(ACTIVE_USERS, 0), counters.get(JOKE_SUBSCRIBERS, 0), stats
+
+
+async def count_subscribers(db: AsyncSession) -> dict[str, int]:
+    """Compute every counter from the subscriptions and users tables."""
+    actual = {ACTIVE_USERS: 0, JOKE_SUBSCRIBERS: 0}
+    actual.update({sign_counter(sign): 0 for sign in SIGN_BITS})
+    active = Subscription.active.is_(True)
+    actual[ACTIVE_USERS] = (
+        await db.execute(select(func.count(func.distinct(Subscription.user_id))).where(active))
+    ).scalar_one()
+    per_sign = await db.execute(select(Subscription.sign, func.count()).where(active).group_by(Subscription.sign))
+    for sign, count in per_sign:
+        actual[sign_counter(sign)] = count
+    actual[JOKE_SUBSCRIBERS] = (
+        await db.execute(select(func.count()).select_from(User).where(User.joke_subscribed.is_(True)))
+    ).scalar_one()
+    return actual
+
+
+async def reconcile_counters(db: AsyncSession) -> dict[str, tuple[int, int]]:
+    """Correct counters that drifted from the tables; return them as name -> (stored, actual)."""
+    if (await db.connection()).dialect.name == "postgresql":
+        # Hold off concurrent increments so they are not overwritten by the recount.
+        await db.execute(text("LOCK TABLE subscriber_counters IN SHARE ROW EXCLUSIVE MODE"))
+    actual = await count_subscribers(db)
+    stored = dict((await db.execute(select(SubscriberCounter.name, SubscriberCounter.value))).all())
+    drift = {name: (stored.get(name, 0), value) for name, value in actual.items() if stored.get(name, 0) != value}
+    if drift:
+        await db.execute(_SET_COUNTER, [{"name": name, "value": actual[name]} for name in drift])
+    return drift
+
+
+async def rebuild_sign_masks(db: AsyncSession) -> None:
+    """Recompute every users.sign_mask from active subscriptions, e.g. after a bulk load."""
+    bit = case({sign: literal_column(str(value)) for sign, value in SIGN_BITS.items()}, value=Subscription.sign)
+    mask = (
+        select(func.coalesce(func.sum(bit), literal_column("0")))
+        .where(Subscription.user_id == User.id, Subscription.active.is_(True))
+        .scalar_subquery()
+    )
+    await db.execute(update(User).values(sign_mask=mask).execution_options(synchronize_session=False))
+
+
+async def load_recipients_by_sign(db: AsyncSession) -> dict[str, list[int]]:
+    rows = await db.execute(select(User.telegram_id, User.sign_mask).where(_HAS_SIGNS))
+    recipients: dict[str, list[int]] = {}
+    for telegram_id, mask in rows:
+        for sign in mask_to_signs(mask):
+            recipients.setdefault(sign, []).append(telegram_id)
+    return recipients
+
+
+async def get_joke_subscription(db: AsyncSession, telegram_id: int) -> bool:
+    result = await db.execute(select(User.joke_subscribed).where(User.telegram_id == telegram_id))
+    return bool(result.scalar())
+
+
+async def set_joke_subscription(db: AsyncSession, telegram_id: int, subscribed: bool) -> bool:
+    if subscribed:
+        result = await db.execute(_JOKE_ON, {"telegram_id": telegram_id, "on": True, "off": False, "now": _now()})
+    else:
+        result = await db.execute(
+            update(User)
+            .where(User.telegram_id == telegram_id, User.joke_subscribed.is_(True))
+            .values(joke_subscribed=False)
+            .execution_options(synchronize_session=False)
+        )
+    if result.rowcount > 0:
+        await _bump(db, {JOKE_SUBSCRIBERS: 1 if subscribed else -1})
+    return subscribed
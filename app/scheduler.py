@@ -1,93 +1,256 @@
 import asyncio
+import bisect
 import logging
 import os
+from collections import Counter
+from datetime import date, datetime, timezone
 from zoneinfo import ZoneInfo
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from sqlalchemy import select
 
-from .db import SessionLocal
+from . import metrics, repository
+from .db import AsyncSessionLocal, write_lock
 from .horo.parser import fetch_horoscope
 from .joke_parser import fetch_random_joke
-from .models import Subscription, User
+from .keyboards import ZODIAC_SIGNS
+from .models import BroadcastCheckpoint, User
 
 logger = logging.getLogger(__name__)
 
 MSK_ZONE = ZoneInfo("Europe/Moscow")
 
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
+BROADCAST_CHECKPOINT_EVERY = int(os.getenv("BROADCAST_CHECKPOINT_EVERY", "100"))
 
-def _load_recipients_by_sign() -> dict[str, list[int]]:
-    db = SessionLocal()
-    try:
-        rows = (
-            db.query(Subscription.sign, User.telegram_id)
-            .join(User, User.id == Subscription.user_id)
-            .filter(Subscription.active)
-            .all()
-        )
-        recipients: dict[str, list[int]] = {}
-        for sign, telegram_id in rows:
-            recipients.setdefault(sign, []).append(telegram_id)
+# Set on shutdown; broadcasts check it before each recipient.
+_stopping = False
+_running: dict[str, asyncio.Task | None] = {}
+
+
+async def _load_recipients_by_sign() -> dict[str, list[int]]:
+    async with AsyncSessionLocal() as db:
+        return await repository.load_recipients_by_sign(db)
+
+
+async def _load_joke_recipients() -> list[int]:
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(select(User.telegram_id).filter(User.joke_subscribed.is_(True)))
+        return list(rows.scalars())
+
+
+async def _deliver(bot, chat_id: int, text: str, kind: str) -> str:
+    """Send one broadcast message; return "sent", "blocked" or "failed".
+
+    Flood-control errors are waited out and retried up to BROADCAST_MAX_RETRIES times.
+    """
+    for attempt in range(BROADCAST_MAX_RETRIES + 1):
+        try:
+            await bot.send_message(chat_id, text)
+            outcome = "sent"
+            break
+        except TelegramRetryAfter as e:
+            if attempt == BROADCAST_MAX_RETRIES:
+                logger.error(f"Giving up on user {chat_id} after {attempt + 1} flood-control errors")
+                outcome = "failed"
+                break
+            metrics.BROADCAST_RETRIES.labels(kind).inc()
+            await asyncio.sleep(e.retry_after)
+        except TelegramForbiddenError:
+            outcome = "blocked"
+            break
+        except Exception as e:
+            logger.error(f"Failed to send {kind} to user {chat_id}: {e}")
+            outcome = "failed"
+            break
+    metrics.BROADCAST_MESSAGES.labels(kind, outcome).inc()
+    return outcome
+
+
+class _Checkpoint:
+    """Broadcast position, saved every BROADCAST_CHECKPOINT_EVERY recipients and when stopped.
+
+    Recipients are walked in (ZODIAC_SIGNS order, telegram_id) order, so the last
+    recipient identifies where to resume. A crash can resend at most the
+    recipients since the last save.
+    """
+
+    def __init__(self, kind: str, day: date, saved: BroadcastCheckpoint | None = None) -> None:
+        self.kind = kind
+        self.day = day
+        resuming = saved is not None and saved.day == day and not saved.completed
+        self.resumed = resuming
+        self.sign = saved.sign if resuming else ""
+        self.last_telegram_id = saved.last_telegram_id if resuming else None
+        self.payload = saved.payload if resuming else None
+        self._unsaved = 0
+
+    def pending(self, sign: str, recipients: list[int]) -> list[int]:
+        """Recipients of ``sign`` not reached before the interruption, in send order."""
+        recipients = sorted(recipients)
+        if not self.resumed:
+            return recipients
+        if self.sign and ZODIAC_SIGNS.index(sign) < ZODIAC_SIGNS.index(self.sign):
+            return []
+        if sign == self.sign and self.last_telegram_id is not None:
+            return recipients[bisect.bisect_right(recipients, self.last_telegram_id) :]
         return recipients
+
+    async def advance(self, sign: str, telegram_id: int) -> None:
+        self.sign, self.last_telegram_id = sign, telegram_id
+        self._unsaved += 1
+        if self._unsaved >= BROADCAST_CHECKPOINT_EVERY:
+            await self.save()
+
+    async def save(self, completed: bool = False) -> None:
+        self._unsaved = 0
+        checkpoint = BroadcastCheckpoint(
+            kind=self.kind,
+            day=self.day,
+            sign=self.sign,
+            last_telegram_id=self.last_telegram_id,
+            payload=self.payload,
+            completed=completed,
+            updated_at=datetime.now(timezone.utc),
+        )
+        try:
+            async with write_lock(), AsyncSessionLocal.begin() as db:
+                await db.merge(checkpoint)
+        except Exception as e:
+            logger.warning(f"Could not checkpoint {self.kind} broadcast: {e}")
+
+
+async def _load_checkpoint(kind: str) -> _Checkpoint:
+    day = datetime.now(MSK_ZONE).date()
+    try:
+        async with AsyncSessionLocal() as db:
+            saved = await db.get(BroadcastCheckpoint, kind)
+    except Exception as e:
+        logger.warning(f"Could not load {kind} broadcast checkpoint, starting from the beginning: {e}")
+        saved = None
+    return _Checkpoint(kind, day, saved)
+
+
+async def _broadcast(bot, checkpoint: _Checkpoint, batches: list[tuple[str, str, list[int]]]) -> Counter[str]:
+    """Send each (sign, text, recipients) batch; stop and checkpoint when shutdown is requested."""
+    kind = checkpoint.kind
+    in_flight = metrics.BROADCAST_IN_FLIGHT.labels(kind)
+    in_flight.set(sum(len(recipients) for _, _, recipients in batches))
+    outcomes: Counter[str] = Counter()
+    _running[kind] = asyncio.current_task()
+    try:
+        for sign, text, recipients in batches:
+            for telegram_id in recipients:
+                if _stopping:
+                    await checkpoint.save()
+                    logger.info(f"{kind} broadcast stopped after user {checkpoint.last_telegram_id}; will resume")
+                    return outcomes
+                try:
+                    outcomes[await _deliver(bot, telegram_id, text, kind)] += 1
+                finally:
+                    in_flight.dec()
+                await checkpoint.advance(sign, telegram_id)
+        await checkpoint.save(completed=True)
+    except asyncio.CancelledError:
+        await checkpoint.save()
+        raise
     finally:
-        db.close()
+        _running.pop(kind, None)
+        in_flight.set(0)
+    return outcomes
 
 
 async def send_daily(bot):
-    """Send daily horoscopes to all subscribers"""
+    """Send daily horoscopes to all subscribers, resuming today's interrupted run."""
     try:
-        logger.info("Starting daily horoscope distribution...")
-        recipients_by_sign = await asyncio.to_thread(_load_recipients_by_sign)
+        checkpoint = await _load_checkpoint("horoscope")
+        verb = "Resuming" if checkpoint.resumed else "Starting"
+        logger.info(f"{verb} daily horoscope distribution...")
+        recipients_by_sign = await _load_recipients_by_sign()
 
-        for sign, recipients in recipients_by_sign.items():
+        batches = []
+        for sign in ZODIAC_SIGNS:
+            recipients = checkpoint.pending(sign, recipients_by_sign.get(sign, []))
+            if not recipients:
+                continue
             try:
                 text = await fetch_horoscope(sign)
-                logger.info(f"Sending horoscope for {sign} to {len(recipients)} subscribers")
-
-                for telegram_id in recipients:
-                    try:
-                        await bot.send_message(telegram_id, text)
-                    except Exception as e:
-                        logger.error(f"Failed to send message to user {telegram_id}: {e}")
             except Exception as e:
                 logger.error(f"Failed to fetch horoscope for {sign}: {e}")
+                continue
+            logger.info(f"Sending horoscope for {sign} to {len(recipients)} subscribers")
+            batches.append((sign, text, recipients))
 
-        logger.info("Daily horoscope distribution completed")
+        outcomes = await _broadcast(bot, checkpoint, batches)
+        logger.info(f"Daily horoscope distribution finished: {dict(outcomes)}")
     except Exception as e:
         logger.error(f"Error in send_daily: {e}", exc_info=True)
 
 
 async def send_daily_joke(bot):
-    """Send daily joke to opted-in users"""
+    """Send daily joke to opted-in users, resuming today's interrupted run with the same joke."""
     try:
-        logger.info("Starting daily joke distribution...")
-        db = SessionLocal()
-        try:
-            user_ids = db.query(User.telegram_id).filter(User.joke_subscribed.is_(True)).all()
-        finally:
-            db.close()
+        checkpoint = await _load_checkpoint("joke")
+        logger.info(f"{'Resuming' if checkpoint.resumed else 'Starting'} daily joke distribution...")
+        user_ids = checkpoint.pending("", await _load_joke_recipients())
 
         if not user_ids:
             logger.info("No opted-in users for joke distribution")
             return
 
-        joke = await fetch_random_joke()
-        if not joke:
-            logger.warning("Failed to fetch joke for daily distribution")
-            return
-
-        message = f"😂 {joke}"
-        for (user_id,) in user_ids:
-            try:
-                await bot.send_message(user_id, message)
-            except Exception as e:
-                logger.error(f"Failed to send joke to user {user_id}: {e}")
+        if checkpoint.payload is None:
+            joke = await fetch_random_joke()
+            if not joke:
+                logger.warning("Failed to fetch joke for daily distribution")
+                return
+            checkpoint.payload = f"😂 {joke}"
 
-        logger.info(f"Daily joke sent to {len(user_ids)} users")
+        outcomes = await _broadcast(bot, checkpoint, [("", checkpoint.payload, user_ids)])
+        logger.info(f"Daily joke sent to {sum(outcomes.values())} users: {dict(outcomes)}")
     except Exception as e:
         logger.error(f"Error in send_daily_joke: {e}", exc_info=True)
 
 
+async def resume_interrupted_broadcasts(bot):
+    """Finish broadcasts of today that a previous process checkpointed before exiting."""
+    for kind, job in (("horoscope", send_daily), ("joke", send_daily_joke)):
+        if kind in _running:
+            continue
+        checkpoint = await _load_checkpoint(kind)
+        if checkpoint.resumed:
+            await job(bot)
+
+
+def request_stop() -> None:
+    """Make running broadcasts checkpoint and return before their next recipient."""
+    global _stopping
+    _stopping = True
+
+
+async def wait_for_broadcasts(timeout: float) -> bool:
+    """Wait for stopped broadcasts to finish; cancel (and checkpoint) them after ``timeout``."""
+    tasks = [task for task in _running.values() if task is not None]
+    if not tasks:
+        return True
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending, timeout=1)
+    return not pending
+
+
+async def reconcile_subscriber_counters():
+    """Check materialized subscriber counters against the tables and fix drift."""
+    try:
+        async with write_lock(), AsyncSessionLocal.begin() as db:
+            drift = await repository.reconcile_counters(db)
+        for name, (stored, actual) in drift.items():
+            logger.warning(f"Subscriber counter {name} drifted: stored {stored}, actual {actual}")
+    except Exception as e:
+        logger.error(f"Error in reconcile_subscriber_counters: {e}", exc_info=True)
+
+
 def setup_scheduler(bot):
     """Setup and start APScheduler"""
     try:
@@ -100,6 +263,12 @@ def setup_scheduler(bot):
         minute = int(os.getenv("SCHEDULER_MINUTE_MSK", "13"))
         joke_hour = int(os.getenv("JOKE_HOUR_MSK", "10"))
         joke_minute = int(os.getenv("JOKE_MINUTE_MSK", "0"))
+        reconcile_minutes = int(os.getenv("COUNTER_RECONCILE_INTERVAL_MINUTES", "60"))
+
+        # Imported here: most replicas run with the scheduler disabled.
+        from apscheduler.schedulers.asyncio import AsyncIOScheduler
+        from apscheduler.triggers.cron import CronTrigger
+        from apscheduler.triggers.interval import IntervalTrigger
 
         sched = AsyncIOScheduler(timezone=MSK_ZONE)
         sched.add_job(
@@ -120,6 +289,16 @@ def setup_scheduler(bot):
             max_instances=1,
             coalesce=True,
         )
+        sched.add_job(
+            reconcile_subscriber_counters,
+            IntervalTrigger(minutes=reconcile_minutes),
+            id="reconcile_subscriber_counters",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        # No trigger: runs once, right after start.
+        sched.add_job(resume_interrupted_broadcasts, args=[bot], id="resume_interrupted_broadcasts")
         sched.start()
         logger.info(
             f"Scheduler started. Daily horoscope: {hour:02d}:{minute:02d} MSK, Daily joke: {joke_hour:02d}:{joke_minute:02d} MSK"
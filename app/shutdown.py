@@ -0,0 +1,91 @@
+"""Graceful shutdown for rolling deploys.
+
+On SIGTERM uvicorn stops accepting connections and waits for open requests
+(bounded by ``--timeout-graceful-shutdown``); the lifespan then calls ``drain()``:
+
+- updates that still arrive are refused with 503, so Telegram redelivers them
+  to the instance that replaces this one
+- running broadcasts stop before their next recipient and checkpoint their position
+- in-flight updates, admin background tasks and queued writes are awaited
+- analytics, captured updates and traces are flushed; the Bot API session,
+  Redis and database pools are closed
+
+All waiting shares one SHUTDOWN_TIMEOUT_SECONDS deadline; whatever is still
+running then is cancelled.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+from typing import Iterator
+
+from . import analytics, capture, handlers, profiling, scheduler, tracing
+from .bot import close_bot
+from .db import async_engine
+
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("SHUTDOWN_TIMEOUT_SECONDS", "20"))
+
+_draining = False
+_in_flight: set[asyncio.Task] = set()
+
+
+def is_draining() -> bool:
+    return _draining
+
+
+@contextlib.contextmanager
+def in_flight() -> Iterator[None]:
+    """Mark the current task as processing an update until the block exits."""
+    task = asyncio.current_task()
+    if task is None:
+        yield
+        return
+    _in_flight.add(task)
+    try:
+        yield
+    finally:
+        _in_flight.discard(task)
+
+
+async def _wait(tasks: set[asyncio.Task], deadline: float, what: str) -> None:
+    if not tasks:
+        return
+    remaining = max(0.0, deadline - asyncio.get_running_loop().time())
+    _, pending = await asyncio.wait(tasks, timeout=remaining)
+    if pending:
+        logger.warning(f"{len(pending)} {what} still running at the shutdown deadline")
+
+
+async def drain(sched=None, timeout: float = SHUTDOWN_TIMEOUT_SECONDS) -> None:
+    """Stop taking work, finish or checkpoint what is running, then release connections."""
+    global _draining
+    _draining = True
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + timeout
+    logger.info(f"Shutting down: draining in-flight work for up to {timeout:g} s")
+
+    scheduler.request_stop()
+    if sched is not None:
+        sched.pause()
+
+    await _wait(set(_in_flight), deadline, "updates")
+    if not await scheduler.wait_for_broadcasts(max(0.0, deadline - loop.time())):
+        logger.warning("Broadcast cancelled at the shutdown deadline; it resumes from its checkpoint")
+    if sched is not None:
+        sched.shutdown(wait=False)
+    await handlers.close(max(0.0, deadline - loop.time()))
+
+    # Workers write out what they buffered when cancelled.
+    await profiling.stop_lag_monitor()
+    await tracing.stop_exporter()
+    await analytics.stop_flusher()
+    await capture.stop_writer()
+
+    await close_bot()
+    # aiosqlite connections run on their own threads; close them so the process can exit.
+    await async_engine.dispose()
+    logger.info(f"Shutdown finished in {loop.time() - started:.2f} s")
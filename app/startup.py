@@ -0,0 +1,39 @@
+"""Boot-time instrumentation.
+
+Startup steps are timed from the first import of the ``app`` package, logged
+once the app serves traffic and exported as ``tgbot_startup_seconds``. For a
+per-module import breakdown run ``python scripts/startup_profile.py``.
+"""
+
+import contextlib
+import logging
+import time
+from typing import Iterator
+
+from . import IMPORT_STARTED, metrics
+
+logger = logging.getLogger(__name__)
+
+timings: dict[str, float] = {}
+
+
+def since_import() -> float:
+    return time.perf_counter() - IMPORT_STARTED
+
+
+def record(phase: str, seconds: float) -> None:
+    timings[phase] = seconds
+    metrics.STARTUP_SECONDS.labels(phase).set(seconds)
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def report() -> None:
+    logger.info("Startup: " + ", ".join(f"{name} {seconds:.2f} s" for name, seconds in timings.items()))
@@ -0,0 +1,317 @@
+"""Lightweight request tracing.
+
+Each update gets a root span; nested ``span()`` blocks record children through a
+context variable, so spans follow the update across awaits. With tracing off,
+``span()`` returns a shared no-op object.
+
+Finished traces are exported with probability TRACE_SAMPLE_RATE as OTLP/JSON:
+appended to TRACE_FILE (one document per line) and/or posted to an OTLP/HTTP
+collector at TRACE_COLLECTOR_URL. Independently of sampling, the slowest
+traces are kept in memory for the admin ``/traces`` command.
+"""
+
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, TypeVar
+
+import httpx
+import orjson
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").strip().lower() == "true"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_COLLECTOR_URL = os.getenv("TRACE_COLLECTOR_URL", "")
+TRACE_KEEP_SLOWEST = int(os.getenv("TRACE_KEEP_SLOWEST", "20"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "1000"))
+TRACE_EXPORT_SECONDS = float(os.getenv("TRACE_EXPORT_SECONDS", "5"))
+
+SERVICE_NAME = "tgbot"
+
+T = TypeVar("T")
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, span_id: int, parent_id: int | None, attributes: dict[str, Any]) -> None:
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans", "_ids")
+
+    def __init__(self) -> None:
+        self.trace_id = random.getrandbits(128)
+        self.spans: list[Span] = []
+        self._ids = itertools.count(1)
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def new_span(self, name: str, parent: Span | None, attributes: dict[str, Any]) -> Span:
+        span = Span(name, next(self._ids), parent.span_id if parent else None, attributes)
+        self.spans.append(span)
+        return span
+
+
+_current_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("trace_span", default=None)
+
+
+class _NoopSpan:
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _ActiveSpan:
+    __slots__ = ("_trace", "_name", "_attributes", "_root", "_span", "_token", "_root_token")
+
+    def __init__(self, trace: Trace, name: str, attributes: dict[str, Any], root: bool = False) -> None:
+        self._trace = trace
+        self._name = name
+        self._attributes = attributes
+        self._root = root
+        self._span: Span | None = None
+        self._token: contextvars.Token | None = None
+        self._root_token: contextvars.Token | None = None
+
+    def __enter__(self) -> "_ActiveSpan":
+        if self._root:
+            self._root_token = _current_trace.set(self._trace)
+        parent = None if self._root else _current_span.get()
+        self._span = self._trace.new_span(self._name, parent, self._attributes)
+        self._token = _current_span.set(self._span)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        span = self._span
+        span.end_ns = time.time_ns()
+        if exc is not None:
+            span.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        if self._root_token is not None:
+            _current_trace.reset(self._root_token)
+            _finish(self._trace)
+
+    def set(self, key: str, value: Any) -> None:
+        self._span.attributes[key] = value
+
+
+def trace(name: str, **attributes: Any) -> _ActiveSpan | _NoopSpan:
+    """Root span of one update; a no-op when tracing is disabled."""
+    if not TRACING_ENABLED:
+        return _NOOP
+    return _ActiveSpan(Trace(), name, attributes, root=True)
+
+
+def span(name: str, **attributes: Any) -> _ActiveSpan | _NoopSpan:
+    """Child span of the current trace; a no-op outside a trace."""
+    current = _current_trace.get()
+    if current is None:
+        return _NOOP
+    return _ActiveSpan(current, name, attributes)
+
+
+def traced(name: str) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Decorate a coroutine function to run inside a child span."""
+
+    def decorate(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            if _current_trace.get() is None:
+                return await fn(*args, **kwargs)
+            with span(name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+class BotApiTracingMiddleware:
+    """Session middleware recording each Bot API request as a span."""
+
+    async def __call__(self, make_request, bot, method):
+        with span(f"bot_api {method.__api_method__}"):
+            return await make_request(bot, method)
+
+
+# Min-heap of (duration_ms, seq, trace): the root of the heap is the fastest retained trace.
+_slowest: list[tuple[float, int, Trace]] = []
+_seq = itertools.count()
+_export_buffer: deque[Trace] = deque(maxlen=TRACE_BUFFER_SIZE)
+
+
+def _finish(finished: Trace) -> None:
+    duration = finished.root.duration_ms
+    entry = (duration, next(_seq), finished)
+    if len(_slowest) < TRACE_KEEP_SLOWEST:
+        heapq.heappush(_slowest, entry)
+    elif TRACE_KEEP_SLOWEST and duration > _slowest[0][0]:
+        heapq.heapreplace(_slowest, entry)
+    if (TRACE_FILE or TRACE_COLLECTOR_URL) and random.random() < TRACE_SAMPLE_RATE:
+        _export_buffer.append(finished)
+
+
+def slowest(limit: int | None = None) -> list[Trace]:
+    """Retained traces, slowest first."""
+    return [t for _, _, t in sorted(_slowest, reverse=True)[:limit]]
+
+
+def format_trace(t: Trace) -> str:
+    """Indented span tree with durations, children in start order."""
+    children: dict[int | None, list[Span]] = {}
+    for s in t.spans:
+        children.setdefault(s.parent_id, []).append(s)
+    lines: list[str] = []
+
+    def walk(parent_id: int | None, depth: int) -> None:
+        for s in sorted(children.get(parent_id, ()), key=lambda s: s.start_ns):
+            attrs = " ".join(f"{k}={v}" for k, v in s.attributes.items())
+            error = f" ! {s.error}" if s.error else ""
+            lines.append(f"{'  ' * depth}{s.name} {s.duration_ms:.1f} ms {attrs}".rstrip() + error)
+            walk(s.span_id, depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def clear() -> None:
+    _slowest.clear()
+    _export_buffer.clear()
+
+
+def _attribute(key: str, value: Any) -> dict[str, Any]:
+    typed: dict[str, Any]
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def to_otlp(traces: list[Trace]) -> dict[str, Any]:
+    """Encode traces as an OTLP/JSON ExportTraceServiceRequest."""
+    spans = []
+    for t in traces:
+        trace_id = f"{t.trace_id:032x}"
+        for s in t.spans:
+            encoded: dict[str, Any] = {
+                "traceId": trace_id,
+                "spanId": f"{s.span_id:016x}",
+                "name": s.name,
+                "kind": 2 if s.parent_id is None else 1,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [_attribute(k, v) for k, v in s.attributes.items()],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            }
+            if s.parent_id is not None:
+                encoded["parentSpanId"] = f"{s.parent_id:016x}"
+            spans.append(encoded)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def _append_lines(path: str, traces: list[Trace]) -> None:
+    with open(path, "ab") as f:
+        for t in traces:
+            f.write(orjson.dumps(to_otlp([t])))
+            f.write(b"\n")
+
+
+async def export_pending(client: httpx.AsyncClient | None = None) -> int:
+    """Write sampled traces to the file and/or collector; failed exports are dropped."""
+    traces = list(_export_buffer)
+    _export_buffer.clear()
+    if not traces:
+        return 0
+    if TRACE_FILE:
+        try:
+            await asyncio.to_thread(_append_lines, TRACE_FILE, traces)
+        except OSError as e:
+            logger.warning(f"Failed to write {len(traces)} traces to {TRACE_FILE}: {e}")
+    if TRACE_COLLECTOR_URL and client is not None:
+        try:
+            resp = await client.post(
+                TRACE_COLLECTOR_URL,
+                content=orjson.dumps(to_otlp(traces)),
+                headers={"Content-Type": "application/json"},
+            )
+            resp.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to export {len(traces)} traces to collector: {e}")
+    return len(traces)
+
+
+async def run_exporter(interval: float = TRACE_EXPORT_SECONDS) -> None:
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        while True:
+            try:
+                await asyncio.sleep(interval)
+            except asyncio.CancelledError:
+                await export_pending(client)
+                raise
+            await export_pending(client)
+
+
+_exporter_task: asyncio.Task | None = None
+
+
+def start_exporter() -> None:
+    global _exporter_task
+    if TRACING_ENABLED and (TRACE_FILE or TRACE_COLLECTOR_URL) and _exporter_task is None:
+        _exporter_task = asyncio.create_task(run_exporter(), context=contextvars.Context())
+
+
+async def stop_exporter() -> None:
+    """Cancel the exporter; it exports what is still buffered before exiting."""
+    global _exporter_task
+    if _exporter_task is None:
+        return
+    _exporter_task.cancel()
+    try:
+        await _exporter_task
+    except asyncio.CancelledError:
+        pass
+    _exporter_task = None
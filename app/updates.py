@@ -0,0 +1,77 @@
+"""Dedup and staleness checks shared by the webhook and polling runners."""
+
+import logging
+import os
+import time
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from . import metrics, tracing
+from .db import AsyncSessionLocal, write_lock
+from .models import ProcessedUpdate
+
+logger = logging.getLogger(__name__)
+
+MAX_UPDATE_AGE_SECONDS = int(os.getenv("MAX_UPDATE_AGE_SECONDS", "300"))
+
+
+def _extract_update_timestamp(update: dict) -> int:
+    # Prefer message/edited_message/callback message timestamp if present.
+    for key in ("message", "edited_message"):
+        msg = update.get(key)
+        if msg and isinstance(msg, dict) and isinstance(msg.get("date"), int):
+            return msg["date"]
+    cb = update.get("callback_query")
+    if cb and isinstance(cb, dict):
+        msg = cb.get("message")
+        if msg and isinstance(msg, dict) and isinstance(msg.get("date"), int):
+            return msg["date"]
+    return 0
+
+
+@tracing.traced("db mark_update_processed")
+async def _mark_update_processed(update_id: int) -> bool:
+    """Persist update id and return False for duplicates."""
+    async with write_lock(), AsyncSessionLocal() as db:
+        try:
+            db.add(ProcessedUpdate(update_id=update_id))
+            await db.commit()
+            return True
+        except IntegrityError:
+            await db.rollback()
+            return False
+
+
+async def _unmark_update_processed(update_id: int) -> None:
+    """Forget a failed update so a redelivery is processed again."""
+    async with write_lock(), AsyncSessionLocal() as db:
+        await db.execute(delete(ProcessedUpdate).where(ProcessedUpdate.update_id == update_id))
+        await db.commit()
+
+
+async def accept_update(update: dict) -> bool:
+    """Return False for duplicate or stale updates."""
+    update_id = update.get("update_id")
+    if isinstance(update_id, int):
+        try:
+            is_new_update = await _mark_update_processed(update_id)
+        except OperationalError as e:
+            # A failed request makes Telegram redeliver everything queued after this update;
+            # handling it without dedup risks at most one duplicate reply.
+            logger.warning(f"Dedup unavailable, processing update {update_id} without it: {e}")
+            metrics.DEDUP_ERRORS.inc()
+            is_new_update = True
+        if not is_new_update:
+            metrics.DROPPED_DUPLICATE.inc()
+            return False
+
+    ts = _extract_update_timestamp(update)
+    if ts:
+        age = int(time.time()) - ts
+        if age > MAX_UPDATE_AGE_SECONDS:
+            logger.info(f"Dropping stale update age={age}s id={update_id}")
+            metrics.DROPPED_STALE.inc()
+            return False
+
+    return True
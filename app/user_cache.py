@@ -0,0 +1,106 @@
+"""Bounded write-through cache of per-user subscription state."""
+
+import contextlib
+import os
+import time
+from collections import OrderedDict
+from typing import Iterator
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# Bounds staleness when another worker changes the same user.
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+
+
+class UserState:
+    __slots__ = ("joke_subscribed", "sign_mask", "loaded_at")
+
+    def __init__(self, joke_subscribed: bool, sign_mask: int, loaded_at: float) -> None:
+        self.joke_subscribed = joke_subscribed
+        self.sign_mask = sign_mask
+        self.loaded_at = loaded_at
+
+
+class Load:
+    """A database read of one user's state in progress."""
+
+    __slots__ = ("stale",)
+
+    def __init__(self) -> None:
+        # Set when a write for the user lands while the read runs; its result may predate the write.
+        self.stale = False
+
+
+class UserStateCache:
+    """LRU map of telegram id to joke flag and 12-bit sign mask."""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._states: OrderedDict[int, UserState] = OrderedDict()
+        self._loads: dict[int, list[Load]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def get(self, telegram_id: int) -> UserState | None:
+        state = self._states.get(telegram_id)
+        if state is None or time.monotonic() - state.loaded_at >= self.ttl:
+            self.misses += 1
+            return None
+        self._states.move_to_end(telegram_id)
+        self.hits += 1
+        return state
+
+    def put(self, telegram_id: int, joke_subscribed: bool, sign_mask: int) -> UserState:
+        state = UserState(joke_subscribed, sign_mask, time.monotonic())
+        self._states[telegram_id] = state
+        self._states.move_to_end(telegram_id)
+        if len(self._states) > self.max_size:
+            self._states.popitem(last=False)
+            self.evictions += 1
+        return state
+
+    @contextlib.contextmanager
+    def loading(self, telegram_id: int) -> Iterator[Load]:
+        """Track a read of ``telegram_id`` so writes during it can mark it stale; put() only fresh ones."""
+        load = Load()
+        self._loads.setdefault(telegram_id, []).append(load)
+        try:
+            yield load
+        finally:
+            loads = self._loads[telegram_id]
+            loads.remove(load)
+            if not loads:
+                del self._loads[telegram_id]
+
+    def _written(self, telegram_id: int) -> None:
+        for load in self._loads.get(telegram_id, ()):
+            load.stale = True
+
+    def update_signs(self, telegram_id: int, set_bits: int = 0, clear_bits: int = 0) -> None:
+        """Apply a committed subscription change to a cached entry, if any."""
+        self._written(telegram_id)
+        state = self._states.get(telegram_id)
+        if state is not None:
+            state.sign_mask = (state.sign_mask | set_bits) & ~clear_bits
+
+    def update_joke(self, telegram_id: int, subscribed: bool) -> None:
+        self._written(telegram_id)
+        state = self._states.get(telegram_id)
+        if state is not None:
+            state.joke_subscribed = subscribed
+
+    def clear(self) -> None:
+        self._states.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+user_state_cache = UserStateCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
@@ -1,64 +1,34 @@
-import asyncio
+import contextlib
 import logging
 import os
-import time
 
 from fastapi import APIRouter, Header, HTTPException, Request
-from sqlalchemy.exc import IntegrityError
 
-from .bot import process_update
-from .db import SessionLocal
-from .models import ProcessedUpdate
-from .rate_limit import limiter
+from . import capture, inline_reply, lazy_update, metrics, shutdown, tracing
+from .bot import get_bot, process_update
+from .rate_limit import is_rate_limited
+from .updates import accept_update
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-MAX_UPDATE_AGE_SECONDS = int(os.getenv("MAX_UPDATE_AGE_SECONDS", "300"))
-
 
 def _get_webhook_secret() -> str:
     return os.getenv("WEBHOOK_SECRET", "")
 
 
-def _extract_update_timestamp(update: dict) -> int:
-    # Prefer message/edited_message/callback message timestamp if present.
-    for key in ("message", "edited_message"):
-        msg = update.get(key)
-        if msg and isinstance(msg, dict) and isinstance(msg.get("date"), int):
-            return msg["date"]
-    cb = update.get("callback_query")
-    if cb and isinstance(cb, dict):
-        msg = cb.get("message")
-        if msg and isinstance(msg, dict) and isinstance(msg.get("date"), int):
-            return msg["date"]
-    return 0
-
-
-def _mark_update_processed(update_id: int) -> bool:
-    """Persist update id and return False for duplicates."""
-    db = SessionLocal()
-    try:
-        record = ProcessedUpdate(update_id=update_id)
-        db.add(record)
-        db.commit()
-        return True
-    except IntegrityError:
-        db.rollback()
-        return False
-    finally:
-        db.close()
-
-
 @router.post("/")
-@limiter.limit("60/minute")
 async def telegram_webhook_root(request: Request, x_telegram_bot_api_secret_token: str = Header(None)):
     return await telegram_webhook(request, x_telegram_bot_api_secret_token)
 
 
 @router.post("/webhook")
-@limiter.limit("60/minute")
 async def telegram_webhook(request: Request, x_telegram_bot_api_secret_token: str = Header(None)):
+    with metrics.WEBHOOK_LATENCY.time():
+        return await _handle_webhook(request, x_telegram_bot_api_secret_token)
+
+
+async def _handle_webhook(request: Request, x_telegram_bot_api_secret_token: str | None):
     webhook_secret = _get_webhook_secret()
 
     if not webhook_secret:
@@ -70,28 +40,38 @@ async def telegram_webhook(request: Request, x_telegram_bot_api_secret_token: st
         logger.warning("Webhook secret mismatch")
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    update = await request.json()
+    update = lazy_update.loads(await request.body())
     if not isinstance(update, dict) or "update_id" not in update:
         # Treat non-Telegram POSTs as ok (health checks, etc.)
         return {"ok": True}
 
-    # Drop duplicate or stale updates
-    update_id = update.get("update_id")
-    if isinstance(update_id, int):
-        is_new_update = await asyncio.to_thread(_mark_update_processed, update_id)
-        if not is_new_update:
+    if shutdown.is_draining():
+        # Not acknowledged: Telegram retries, and the retry reaches the instance replacing this one.
+        raise HTTPException(status_code=503, detail="Shutting down")
+
+    # Captured before any filtering so a replay reproduces the real arrival stream
+    capture.record(update)
+
+    with shutdown.in_flight(), tracing.trace("webhook", update_id=update["update_id"]) as root:
+        # Throttled updates are acknowledged so Telegram does not redeliver them
+        if is_rate_limited(update):
+            metrics.DROPPED_RATE_LIMITED.inc()
+            root.set("dropped", "rate_limited")
             return {"ok": True}
 
-    ts = _extract_update_timestamp(update)
-    if ts:
-        age = int(time.time()) - ts
-        if age > MAX_UPDATE_AGE_SECONDS:
-            logger.info(f"Dropping stale update age={age}s id={update_id}")
+        # Drop duplicate or stale updates
+        if not await accept_update(update):
+            root.set("dropped", "duplicate_or_stale")
             return {"ok": True}
 
-    try:
-        await process_update(update)
-    except Exception as e:
-        logger.error(f"Error processing webhook: {e}", exc_info=True)
+        reply_capture = inline_reply.capture() if inline_reply.is_enabled() else contextlib.nullcontext()
+        with reply_capture as reply:
+            try:
+                await process_update(update)
+            except Exception as e:
+                logger.error(f"Error processing webhook: {e}", exc_info=True)
 
+    # Telegram executes a Bot API call passed back in the webhook response body.
+    if reply is not None:
+        return reply.as_response(get_bot())
     return {"ok": True}
@@ -0,0 +1,92 @@
+"""Group commit for small writes issued by concurrent handlers."""
+
+import asyncio
+import logging
+import os
+from typing import Any, AsyncContextManager, Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+DB_WRITE_BATCH_ENABLED = os.getenv("DB_WRITE_BATCH_ENABLED", "true").strip().lower() == "true"
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "100"))
+DB_WRITE_BATCH_DELAY_MS = float(os.getenv("DB_WRITE_BATCH_DELAY_MS", "5"))
+
+WriteOp = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class WriteBatcher:
+    """Collects write operations and applies them in one transaction.
+
+    A batch is flushed when ``max_batch`` operations are queued or ``max_delay``
+    seconds after the first one arrived. Each caller is resumed with its own
+    result only after the shared commit succeeded. If the batch fails, its
+    operations are retried one per transaction so a single bad write cannot
+    fail the others.
+    """
+
+    def __init__(
+        self,
+        transaction: Callable[[], AsyncContextManager[AsyncSession]],
+        max_batch: int = DB_WRITE_BATCH_SIZE,
+        max_delay: float = DB_WRITE_BATCH_DELAY_MS / 1000,
+    ) -> None:
+        self._transaction = transaction
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: list[tuple[WriteOp, asyncio.Future]] = []
+        self._task: asyncio.Task | None = None
+        self._full: asyncio.Event | None = None
+        self.batches = 0
+        self.operations = 0
+
+    async def submit(self, op: WriteOp) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((op, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        elif len(self._queue) >= self.max_batch and self._full is not None:
+            self._full.set()
+        return await future
+
+    async def close(self) -> None:
+        """Wait for queued operations to be written."""
+        if self._task is None:
+            return
+        if self._full is not None:
+            self._full.set()
+        await self._task
+
+    async def _run(self) -> None:
+        self._full = asyncio.Event()
+        while self._queue:
+            if len(self._queue) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            batch, self._queue = self._queue[: self.max_batch], self._queue[self.max_batch :]
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[WriteOp, asyncio.Future]]) -> None:
+        try:
+            async with self._transaction() as db:
+                results = [await op(db) for op, _ in batch]
+        except Exception as e:
+            if len(batch) == 1:
+                future = batch[0][1]
+                if not future.done():
+                    future.set_exception(e)
+                return
+            logger.warning(f"Write batch of {len(batch)} failed, retrying individually: {e}")
+            for item in batch:
+                await self._flush([item])
+            return
+
+        self.batches += 1
+        self.operations += len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
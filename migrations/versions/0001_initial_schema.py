@@ -0,0 +1,130 @@
+"""Initial schema.
+
+Databases created before migrations existed (create_all plus the ad-hoc
+ALTERs in ensure_schema) are upgraded in place: missing tables are created,
+missing user columns are added and the sign mask is backfilled.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Bit order of users.sign_mask, fixed at the time of this migration.
+SIGNS = (
+    "aries",
+    "taurus",
+    "gemini",
+    "cancer",
+    "leo",
+    "virgo",
+    "libra",
+    "scorpio",
+    "sagittarius",
+    "capricorn",
+    "aquarius",
+    "pisces",
+)
+
+
+def _create_users() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("telegram_id", sa.BigInteger(), nullable=False),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("first_name", sa.String(), nullable=True),
+        sa.Column("last_name", sa.String(), nullable=True),
+        sa.Column("joke_subscribed", sa.Boolean(), nullable=False),
+        sa.Column("sign_mask", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_telegram_id", "users", ["telegram_id"], unique=True)
+
+
+def _create_subscriptions() -> None:
+    op.create_table(
+        "subscriptions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("sign", sa.String(), nullable=False),
+        sa.Column("active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("user_id", "sign", name="_user_sign_uc"),
+    )
+    op.create_index("ix_subscriptions_id", "subscriptions", ["id"])
+
+
+def _create_cached_horoscopes() -> None:
+    op.create_table(
+        "cached_horoscopes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("sign", sa.String(), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("fetched_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("sign", "date", name="_sign_date_uc"),
+    )
+    op.create_index("ix_cached_horoscopes_id", "cached_horoscopes", ["id"])
+    op.create_index("ix_cached_horoscopes_sign", "cached_horoscopes", ["sign"])
+    op.create_index("ix_cached_horoscopes_date", "cached_horoscopes", ["date"])
+
+
+def _create_processed_updates() -> None:
+    op.create_table(
+        "processed_updates",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("update_id", sa.BigInteger(), nullable=False),
+        sa.Column("processed_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_processed_updates_id", "processed_updates", ["id"])
+    op.create_index("ix_processed_updates_update_id", "processed_updates", ["update_id"], unique=True)
+
+
+def _backfill_sign_masks() -> None:
+    bits = " ".join(f"WHEN '{sign}' THEN {1 << index}" for index, sign in enumerate(SIGNS))
+    op.execute(
+        "UPDATE users SET sign_mask = COALESCE("
+        f"(SELECT SUM(CASE subscriptions.sign {bits} ELSE 0 END) FROM subscriptions "
+        "WHERE subscriptions.user_id = users.id AND subscriptions.active), 0)"
+    )
+
+
+def upgrade() -> None:
+    # Offline (--sql) runs cannot inspect the database; they script a fresh one.
+    tables = set() if context.is_offline_mode() else set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in tables:
+        _create_users()
+    else:
+        columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("users")}
+        if "joke_subscribed" not in columns:
+            op.add_column(
+                "users", sa.Column("joke_subscribed", sa.Boolean(), server_default=sa.false(), nullable=False)
+            )
+        if "sign_mask" not in columns:
+            op.add_column("users", sa.Column("sign_mask", sa.Integer(), server_default="0", nullable=False))
+            if "subscriptions" in tables:
+                _backfill_sign_masks()
+
+    if "subscriptions" not in tables:
+        _create_subscriptions()
+    if "cached_horoscopes" not in tables:
+        _create_cached_horoscopes()
+    if "processed_updates" not in tables:
+        _create_processed_updates()
+
+
+def downgrade() -> None:
+    op.drop_table("processed_updates")
+    op.drop_table("cached_horoscopes")
+    op.drop_table("subscriptions")
+    op.drop_table("users")
@@ -0,0 +1,51 @@
+"""Partial indexes for broadcast, joke and stats queries.
+
+The daily broadcast and /subscribers read only users with a non-zero
+sign_mask, the joke broadcast only users with joke_subscribed set. Partial
+indexes keep both reads proportional to subscribers instead of all users.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# Written as expressions so each dialect renders them exactly as the queries do;
+# a partial index is only used when the query repeats its predicate.
+HAS_SIGNS = sa.column("sign_mask") != 0
+JOKE_SUBSCRIBED = sa.column("joke_subscribed").is_(True)
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        existing = set()
+    else:
+        existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("users")}
+    if "ix_users_sign_mask_subscribed" not in existing:
+        op.create_index(
+            "ix_users_sign_mask_subscribed",
+            "users",
+            ["sign_mask", "telegram_id"],
+            sqlite_where=HAS_SIGNS,
+            postgresql_where=HAS_SIGNS,
+        )
+    if "ix_users_joke_subscribed" not in existing:
+        op.create_index(
+            "ix_users_joke_subscribed",
+            "users",
+            ["joke_subscribed", "telegram_id"],
+            sqlite_where=JOKE_SUBSCRIBED,
+            postgresql_where=JOKE_SUBSCRIBED,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_joke_subscribed", table_name="users")
+    op.drop_index("ix_users_sign_mask_subscribed", table_name="users")
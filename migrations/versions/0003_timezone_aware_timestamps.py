@@ -0,0 +1,51 @@
+"""Store timestamps as timestamptz on PostgreSQL.
+
+The application writes timezone-aware UTC datetimes, which asyncpg refuses
+for "timestamp without time zone" columns. SQLite keeps no type distinction,
+so this revision is a no-op there.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    ("users", "created_at"),
+    ("subscriptions", "created_at"),
+    ("cached_horoscopes", "fetched_at"),
+    ("processed_updates", "processed_at"),
+)
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name != "postgresql":
+        return
+    for table, column in COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=sa.DateTime(timezone=True),
+            existing_type=sa.DateTime(),
+            postgresql_using=f"{column} AT TIME ZONE 'UTC'",
+        )
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != "postgresql":
+        return
+    for table, column in COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=sa.DateTime(),
+            existing_type=sa.DateTime(timezone=True),
+            postgresql_using=f"{column} AT TIME ZONE 'UTC'",
+        )
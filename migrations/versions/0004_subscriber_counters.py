@@ -0,0 +1,38 @@
+"""Materialized subscriber counters.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "subscriber_counters",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("value", sa.Integer(), nullable=False),
+    )
+    op.execute(
+        "INSERT INTO subscriber_counters (name, value) "
+        "SELECT 'active_users', COUNT(DISTINCT user_id) FROM subscriptions WHERE active"
+    )
+    op.execute(
+        "INSERT INTO subscriber_counters (name, value) "
+        "SELECT 'joke_subscribers', COUNT(*) FROM users WHERE joke_subscribed"
+    )
+    op.execute(
+        "INSERT INTO subscriber_counters (name, value) "
+        "SELECT 'sign:' || sign, COUNT(*) FROM subscriptions WHERE active GROUP BY sign"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("subscriber_counters")
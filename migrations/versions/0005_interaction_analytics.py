@@ -0,0 +1,43 @@
+"""Interaction analytics tables.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "interaction_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("command", sa.String(), nullable=False),
+        sa.Column("sign", sa.String(), nullable=False),
+        sa.Column("latency_ms", sa.Float(), nullable=False),
+        sa.Column("cache_hit", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_interaction_events_created_at", "interaction_events", ["created_at"])
+    op.create_table(
+        "interaction_daily",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("command", sa.String(), primary_key=True),
+        sa.Column("sign", sa.String(), primary_key=True),
+        sa.Column("events", sa.Integer(), nullable=False),
+        sa.Column("latency_ms_total", sa.Float(), nullable=False),
+        sa.Column("cache_hits", sa.Integer(), nullable=False),
+        sa.Column("cache_lookups", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("interaction_daily")
+    op.drop_index("ix_interaction_events_created_at", table_name="interaction_events")
+    op.drop_table("interaction_events")
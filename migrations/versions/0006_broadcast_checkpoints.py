@@ -0,0 +1,31 @@
+"""Broadcast checkpoints.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "broadcast_checkpoints",
+        sa.Column("kind", sa.String(), primary_key=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("sign", sa.String(), nullable=False),
+        sa.Column("last_telegram_id", sa.BigInteger(), nullable=True),
+        sa.Column("payload", sa.Text(), nullable=True),
+        sa.Column("completed", sa.Boolean(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("broadcast_checkpoints")
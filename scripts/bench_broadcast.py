@@ -0,0 +1,202 @@
+"""Benchmark: send_daily / send_daily_joke against a fake bot with Telegram-like limits.
+
+Seeds a temporary SQLite database with N users holding random sign and joke
+subscriptions, then runs the real broadcast jobs against ``FakeBot``, which
+enforces a global flood limit (429 with retry_after), rejects users who
+blocked the bot (403) and adds per-call latency. Horoscope and joke fetches are
+stubbed. Each size runs in its own process so peak RSS is comparable.
+
+Simulated time is compressed by --time-scale: latency, the flood limit and
+retry_after are all scaled, e.g. 0.001 turns 30 msg/s into 30 000 msg/s.
+
+Usage: python scripts/bench_broadcast.py [--sizes 10000,100000,1000000] [--rate 30]
+    [--latency-ms 50] [--blocked 0.05] [--time-scale 0.001]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+SEED_CHUNK = 10_000
+
+
+class FakeBot:
+    """send_message with a global token bucket, blocked users and latency."""
+
+    def __init__(self, rate: float, latency: float, blocked: float, time_scale: float) -> None:
+        self.time_scale = time_scale
+        self.rate = rate / time_scale
+        self.burst = max(1.0, rate)
+        self.latency = latency * time_scale
+        self.blocked_per_10k = int(blocked * 10_000)
+        self.tokens = self.burst
+        self._latency_debt = 0.0
+        self.updated = time.monotonic()
+        self.sent = 0
+        self.flood_errors = 0
+        self.forbidden = 0
+
+    def _is_blocked(self, chat_id: int) -> bool:
+        return (chat_id * 2654435761) % 10_000 < self.blocked_per_10k
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> bool:
+        from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+        from aiogram.methods import SendMessage
+
+        if self.latency:
+            # Sub-millisecond sleeps are rounded up by the event loop; sleep accumulated latency instead.
+            self._latency_debt += self.latency
+            if self._latency_debt >= 0.001:
+                await asyncio.sleep(self._latency_debt)
+                self._latency_debt = 0.0
+        if self._is_blocked(chat_id):
+            self.forbidden += 1
+            raise TelegramForbiddenError(
+                SendMessage(chat_id=chat_id, text=text), "Forbidden: bot was blocked by the user"
+            )
+
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            self.flood_errors += 1
+            # Telegram reports whole seconds; convert to compressed time.
+            retry_after = math.ceil((1 - self.tokens) / self.rate / self.time_scale) * self.time_scale
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "Flood control exceeded", retry_after)
+        self.tokens -= 1
+        self.sent += 1
+        return True
+
+
+def _seed(users: int, seed: int) -> tuple[int, int]:
+    """Insert users with 0-3 random signs and a 30% joke opt-in; return (horoscope, joke) message counts."""
+    from sqlalchemy import insert
+
+    from app.db import engine
+    from app.keyboards import SIGN_BITS, ZODIAC_SIGNS
+    from app.models import Subscription, User
+
+    rng = random.Random(seed)
+    horoscope_messages = joke_messages = 0
+    with engine.begin() as conn:
+        for start in range(0, users, SEED_CHUNK):
+            user_rows, sub_rows = [], []
+            for user_id in range(start + 1, min(start + SEED_CHUNK, users) + 1):
+                signs = rng.sample(ZODIAC_SIGNS, rng.choices((0, 1, 2, 3), (10, 60, 20, 10))[0])
+                joke = rng.random() < 0.3
+                mask = 0
+                for sign in signs:
+                    mask |= SIGN_BITS[sign]
+                    sub_rows.append({"user_id": user_id, "sign": sign, "active": True})
+                user_rows.append(
+                    {"id": user_id, "telegram_id": 5_000_000 + user_id, "joke_subscribed": joke, "sign_mask": mask}
+                )
+                horoscope_messages += len(signs)
+                joke_messages += joke
+            conn.execute(insert(User.__table__), user_rows)
+            if sub_rows:
+                conn.execute(insert(Subscription.__table__), sub_rows)
+    return horoscope_messages, joke_messages
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _run_child(args: argparse.Namespace) -> dict:
+    logging.basicConfig(level=logging.WARNING)
+    from app import scheduler
+    from app.db import async_engine, run_migrations
+
+    run_migrations()
+    seed_started = time.perf_counter()
+    horoscope_messages, joke_messages = _seed(args.child, args.seed)
+    seed_seconds = time.perf_counter() - seed_started
+
+    async def fetch_horoscope(sign: str) -> str:
+        return f"🌟 Гороскоп для {sign}\n" + "Текст гороскопа. " * 40
+
+    async def fetch_random_joke() -> str:
+        return "Короткий анекдот для бенчмарка."
+
+    scheduler.fetch_horoscope = fetch_horoscope
+    scheduler.fetch_random_joke = fetch_random_joke
+
+    results = {"users": args.child, "seed_seconds": seed_seconds}
+    for job, expected in (("send_daily", horoscope_messages), ("send_daily_joke", joke_messages)):
+        bot = FakeBot(args.rate, args.latency_ms / 1000, args.blocked, args.time_scale)
+        rss_before = _peak_rss_mb()
+        started = time.perf_counter()
+        await getattr(scheduler, job)(bot)
+        wall = time.perf_counter() - started
+        results[job] = {
+            "messages": expected,
+            "wall_seconds": wall,
+            "sent": bot.sent,
+            "msg_per_second": bot.sent / wall if wall else 0.0,
+            "retries": bot.flood_errors,
+            "blocked": bot.forbidden,
+            "peak_rss_mb": _peak_rss_mb(),
+            "rss_growth_mb": _peak_rss_mb() - rss_before,
+        }
+    await async_engine.dispose()
+    return results
+
+
+def _child(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+        os.environ.setdefault("SCHEDULER_ENABLED", "false")
+        print(json.dumps(asyncio.run(_run_child(args))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--rate", type=float, default=30.0, help="flood limit, messages per simulated second")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="simulated Bot API latency")
+    parser.add_argument("--blocked", type=float, default=0.05, help="share of users who blocked the bot")
+    parser.add_argument("--time-scale", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    print(
+        f"flood limit {args.rate:g} msg/s, latency {args.latency_ms:g} ms, blocked {args.blocked:.0%}, "
+        f"time scale {args.time_scale:g} (limit {args.rate / args.time_scale:,.0f} msg/s real)"
+    )
+    print(
+        f"{'users':>9s} {'job':16s} {'messages':>9s} {'wall s':>8s} {'msg/s':>9s} {'retries':>8s} "
+        f"{'blocked':>8s} {'peak MB':>8s} {'+MB':>6s}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        command = [sys.executable, __file__, "--child", str(size)]
+        command += ["--rate", str(args.rate), "--latency-ms", str(args.latency_ms), "--blocked", str(args.blocked)]
+        command += ["--time-scale", str(args.time_scale), "--seed", str(args.seed)]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        for job in ("send_daily", "send_daily_joke"):
+            r = result[job]
+            print(
+                f"{size:9d} {job:16s} {r['messages']:9d} {r['wall_seconds']:8.2f} {r['msg_per_second']:9.0f} "
+                f"{r['retries']:8d} {r['blocked']:8d} {r['peak_rss_mb']:8.0f} {r['rss_growth_mb']:6.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark: callback debounce cost per click with many active users.
+
+Compares the previous full-scan cleanup with the expiry-ordered debouncer.
+Usage: python scripts/bench_debounce.py [active_users] [clicks]
+"""
+
+import os
+import random
+import sys
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.debounce import CallbackDebouncer  # noqa: E402
+
+WINDOW = 1.0
+
+
+class ScanDebouncer:
+    """Previous implementation: scans the whole cache on every click."""
+
+    def __init__(self, window: float, max_size: int) -> None:
+        self.window = window
+        self.max_size = max_size
+        self._last: OrderedDict = OrderedDict()
+
+    def is_duplicate(self, key, now: float) -> bool:
+        stale = [k for k, ts in self._last.items() if now - ts >= self.window]
+        for k in stale:
+            self._last.pop(k, None)
+        while len(self._last) > self.max_size:
+            self._last.popitem(last=False)
+
+        last = self._last.get(key)
+        if last and now - last < self.window:
+            return True
+        self._last[key] = now
+        self._last.move_to_end(key)
+        return False
+
+
+def _run(debouncer, keys: list, clicks_per_second: float) -> float:
+    now = 1000.0
+    step = 1.0 / clicks_per_second
+    start = time.perf_counter()
+    for key in keys:
+        debouncer.is_duplicate(key, now=now)
+        now += step
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def main() -> None:
+    active_users = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    clicks = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    rng = random.Random(42)
+    keys = [(rng.randrange(active_users), f"sign:{rng.randrange(12)}") for _ in range(clicks)]
+    # Every active user clicks about once per debounce window.
+    clicks_per_second = active_users / WINDOW
+
+    scan = _run(ScanDebouncer(WINDOW, max(5000, active_users)), keys, clicks_per_second)
+    ordered = _run(CallbackDebouncer(WINDOW, max(5000, active_users)), keys, clicks_per_second)
+    print(f"active users: {active_users}, clicks: {clicks}")
+    print(f"full scan:      {scan:9.2f} us/click")
+    print(f"expiry ordered: {ordered:9.2f} us/click  speedup: {scan / ordered:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
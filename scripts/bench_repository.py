@@ -0,0 +1,137 @@
+"""Benchmark: round-trips and latency per handler DB operation, ORM helpers vs repository.
+
+Runs each operation for many users concurrently against a temporary SQLite file.
+Usage: python scripts/bench_repository.py [users] [concurrency]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import event, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import AsyncAdaptedQueuePool  # noqa: E402
+
+from app import repository  # noqa: E402
+from app.db import Base, _set_sqlite_pragmas  # noqa: E402
+from app.models import Subscription, User  # noqa: E402
+
+
+class OrmOps:
+    """Query-then-write helpers as the handlers used them before the repository."""
+
+    def __init__(self, factory) -> None:
+        self.factory = factory
+
+    async def subscribe(self, telegram_id: int, sign: str) -> bool:
+        async with self.factory() as db:
+            user = (await db.execute(select(User).filter_by(telegram_id=telegram_id))).scalars().first()
+            if not user:
+                user = User(telegram_id=telegram_id)
+                db.add(user)
+                await db.commit()
+            sub = (await db.execute(select(Subscription).filter_by(user_id=user.id, sign=sign))).scalars().first()
+            was_subscribed = bool(sub and sub.active)
+            if not sub:
+                db.add(Subscription(user_id=user.id, sign=sign, active=True))
+            else:
+                sub.active = True
+            await db.commit()
+            return not was_subscribed
+
+    async def is_subscribed(self, telegram_id: int, sign: str) -> bool:
+        async with self.factory() as db:
+            user = (await db.execute(select(User).filter_by(telegram_id=telegram_id))).scalars().first()
+            if not user:
+                return False
+            stmt = select(Subscription).filter_by(user_id=user.id, sign=sign, active=True)
+            return bool((await db.execute(stmt)).scalars().first())
+
+    async def unsubscribe(self, telegram_id: int, sign: str) -> bool:
+        async with self.factory() as db:
+            user = (await db.execute(select(User).filter_by(telegram_id=telegram_id))).scalars().first()
+            if not user:
+                return False
+            sub = (await db.execute(select(Subscription).filter_by(user_id=user.id, sign=sign))).scalars().first()
+            if not sub or not sub.active:
+                return False
+            sub.active = False
+            await db.commit()
+            return True
+
+
+class RepositoryOps:
+    def __init__(self, factory) -> None:
+        self.factory = factory
+
+    async def subscribe(self, telegram_id: int, sign: str) -> bool:
+        async with self.factory.begin() as db:
+            return await repository.subscribe(db, telegram_id, sign)
+
+    async def is_subscribed(self, telegram_id: int, sign: str) -> bool:
+        async with self.factory() as db:
+            return await repository.is_subscribed(db, telegram_id, sign)
+
+    async def unsubscribe(self, telegram_id: int, sign: str) -> bool:
+        async with self.factory.begin() as db:
+            return await repository.unsubscribe(db, telegram_id, sign)
+
+
+async def _run_op(fn, users: range, concurrency: int) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(telegram_id: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await fn(telegram_id, "leo")
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(telegram_id) for telegram_id in users))
+    return latencies
+
+
+async def _bench(name: str, ops_cls, users: int, concurrency: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp}/bench.db", poolclass=AsyncAdaptedQueuePool, pool_size=concurrency
+        )
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+        statements = 0
+
+        def count(*args) -> None:
+            nonlocal statements
+            statements += 1
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        event.listen(engine.sync_engine, "before_cursor_execute", count)
+
+        ops = ops_cls(sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+        print(f"{name}:")
+        for op_name in ("subscribe", "is_subscribed", "unsubscribe"):
+            statements = 0
+            latencies = await _run_op(getattr(ops, op_name), range(1, users + 1), concurrency)
+            latencies.sort()
+            p50 = statistics.median(latencies) * 1000
+            p95 = latencies[int(len(latencies) * 0.95)] * 1000
+            print(f"  {op_name:14s} statements/op: {statements / users:4.1f}  p50: {p50:6.2f} ms  p95: {p95:6.2f} ms")
+        await engine.dispose()
+
+
+async def main() -> None:
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"users: {users}, concurrency: {concurrency}")
+    await _bench("ORM helpers", OrmOps, users, concurrency)
+    await _bench("repository", RepositoryOps, users, concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
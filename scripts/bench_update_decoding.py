@@ -0,0 +1,95 @@
+"""Microbenchmark: per-update CPU time of full vs lazy update decoding.
+
+Usage: python scripts/bench_update_decoding.py [iterations]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from aiogram import types  # noqa: E402
+
+from app.lazy_update import LazyUpdate, loads  # noqa: E402
+
+NOW = int(time.time())
+USER = {
+    "id": 123456789,
+    "is_bot": False,
+    "first_name": "Ivan",
+    "last_name": "Petrov",
+    "username": "ivan",
+    "language_code": "ru",
+}
+CHAT = {"id": 123456789, "first_name": "Ivan", "last_name": "Petrov", "username": "ivan", "type": "private"}
+
+MESSAGE_UPDATE = {
+    "update_id": 100,
+    "message": {
+        "message_id": 10,
+        "from": USER,
+        "chat": CHAT,
+        "date": NOW,
+        "text": "/list",
+        "entities": [{"offset": 0, "length": 5, "type": "bot_command"}],
+    },
+}
+
+CALLBACK_UPDATE = {
+    "update_id": 101,
+    "callback_query": {
+        "id": "4382bfdwdsb323b2d9",
+        "from": USER,
+        "chat_instance": "-2000000000000000000",
+        "data": "sign:aries",
+        "message": {
+            "message_id": 11,
+            "from": {"id": 42, "is_bot": True, "first_name": "HoroBot", "username": "horo_bot"},
+            "chat": CHAT,
+            "date": NOW,
+            "text": "Выберите знак зодиака:",
+            "reply_markup": {
+                "inline_keyboard": [
+                    [
+                        {"text": "Овен", "callback_data": "sign:aries"},
+                        {"text": "Телец", "callback_data": "sign:taurus"},
+                    ],
+                    [
+                        {"text": "Близнецы", "callback_data": "sign:gemini"},
+                        {"text": "Рак", "callback_data": "sign:cancer"},
+                    ],
+                ]
+            },
+        },
+    },
+}
+
+
+def _full(body: bytes) -> None:
+    types.Update(**json.loads(body))
+
+
+def _lazy(body: bytes) -> None:
+    LazyUpdate(loads(body))
+
+
+def _measure(fn, body: bytes, iterations: int) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        fn(body)
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    for name, update in (("message", MESSAGE_UPDATE), ("callback", CALLBACK_UPDATE)):
+        body = json.dumps(update).encode()
+        full = _measure(_full, body, iterations)
+        lazy = _measure(_lazy, body, iterations)
+        print(f"{name:9s} full: {full:7.2f} us/update  lazy: {lazy:6.2f} us/update  speedup: {full / lazy:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark: SQLite write throughput with one transaction per click vs group commit.
+
+Usage: python scripts/bench_write_batcher.py [writes] [synchronous]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import AsyncAdaptedQueuePool  # noqa: E402
+
+from app import repository  # noqa: E402
+from app.db import Base  # noqa: E402
+from app.keyboards import ZODIAC_SIGNS  # noqa: E402
+from app.write_batcher import WriteBatcher  # noqa: E402
+
+
+async def _bench(name: str, writes: int, synchronous: str, batched: bool) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/bench.db", poolclass=AsyncAdaptedQueuePool)
+
+        def pragmas(dbapi_connection, connection_record) -> None:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+            cursor.execute("PRAGMA busy_timeout=30000")
+            cursor.close()
+
+        event.listen(engine.sync_engine, "connect", pragmas)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        batcher = WriteBatcher(factory.begin)
+
+        async def write(telegram_id: int) -> None:
+            op = partial(repository.subscribe, telegram_id=telegram_id, sign=ZODIAC_SIGNS[telegram_id % 12])
+            if batched:
+                await batcher.submit(op)
+                return
+            async with factory.begin() as db:
+                await op(db)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(write(telegram_id) for telegram_id in range(writes)))
+        elapsed = time.perf_counter() - start
+        extra = f"  transactions: {batcher.batches}" if batched else f"  transactions: {writes}"
+        print(f"{name:22s} {writes / elapsed:9.0f} writes/s{extra}")
+        await engine.dispose()
+
+
+async def main() -> None:
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    synchronous = sys.argv[2] if len(sys.argv) > 2 else "NORMAL"
+    print(f"writes: {writes}, synchronous={synchronous}")
+    await _bench("transaction per write", writes, synchronous, batched=False)
+    await _bench("group commit", writes, synchronous, batched=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,267 @@
+"""Stream users, subscriptions and cached horoscopes to and from gzip-compressed files.
+
+Rows are read with a streaming cursor and written in chunks, so memory stays flat
+regardless of table size. Subscriptions are exported with the user's telegram_id
+instead of the internal user id, so a dump can be loaded into another instance or
+backend. Sign masks and subscriber counters are recomputed after an import.
+
+Usage:
+    python scripts/data_transfer.py export DIR [--format jsonl|csv] [--tables users,subscriptions]
+    python scripts/data_transfer.py import DIR [--format jsonl|csv] [--on-conflict update|skip]
+
+The database is DATABASE_URL (or the default SQLite file); override with --database-url.
+Import migrates the target database first.
+In CSV files an empty field is read back as NULL.
+"""
+
+import argparse
+import asyncio
+import csv
+import datetime
+import gzip
+import json
+import os
+import sys
+import time
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import (  # noqa: E402
+    BigInteger,
+    Boolean,
+    Date,
+    DateTime,
+    Integer,
+    String,
+    bindparam,
+    create_engine,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+
+from app import repository  # noqa: E402
+from app.db import DATABASE_URL, _async_url, _sync_url, run_migrations  # noqa: E402
+from app.models import CachedHoroscope, Subscription, User  # noqa: E402
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Column name -> SQLAlchemy type, in file order.
+TABLES: dict[str, dict[str, Any]] = {
+    "users": {
+        "columns": {
+            "telegram_id": BigInteger(),
+            "username": String(),
+            "first_name": String(),
+            "last_name": String(),
+            "joke_subscribed": Boolean(),
+            "created_at": DateTime(timezone=True),
+        },
+        "select": select(
+            User.telegram_id, User.username, User.first_name, User.last_name, User.joke_subscribed, User.created_at
+        ).order_by(User.id),
+        "insert": (
+            "INSERT INTO users (telegram_id, username, first_name, last_name, joke_subscribed, created_at) "
+            "VALUES (:telegram_id, :username, :first_name, :last_name, :joke_subscribed, :created_at) "
+            "ON CONFLICT (telegram_id) DO "
+        ),
+        "update": (
+            "UPDATE SET username = excluded.username, first_name = excluded.first_name, "
+            "last_name = excluded.last_name, joke_subscribed = excluded.joke_subscribed"
+        ),
+    },
+    "subscriptions": {
+        "columns": {
+            "telegram_id": BigInteger(),
+            "sign": String(),
+            "active": Boolean(),
+            "created_at": DateTime(timezone=True),
+        },
+        "select": select(User.telegram_id, Subscription.sign, Subscription.active, Subscription.created_at)
+        .join(User, User.id == Subscription.user_id)
+        .order_by(Subscription.id),
+        # Rows whose user is not in the target database are skipped by the join.
+        "insert": (
+            "INSERT INTO subscriptions (user_id, sign, active, created_at) "
+            "SELECT id, :sign, :active, :created_at FROM users WHERE telegram_id = :telegram_id "
+            "ON CONFLICT (user_id, sign) DO "
+        ),
+        "update": "UPDATE SET active = excluded.active",
+    },
+    "cached_horoscopes": {
+        "columns": {
+            "sign": String(),
+            "date": Date(),
+            "content": String(),
+            "fetched_at": DateTime(timezone=True),
+        },
+        "select": select(
+            CachedHoroscope.sign, CachedHoroscope.date, CachedHoroscope.content, CachedHoroscope.fetched_at
+        ).order_by(CachedHoroscope.id),
+        "insert": (
+            "INSERT INTO cached_horoscopes (sign, date, content, fetched_at) "
+            "VALUES (:sign, :date, :content, :fetched_at) "
+            "ON CONFLICT (sign, date) DO "
+        ),
+        "update": "UPDATE SET content = excluded.content, fetched_at = excluded.fetched_at",
+    },
+}
+
+
+def _to_text(value: Any) -> Any:
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _from_text(value: Any, type_: Any) -> Any:
+    if value is None or value == "":
+        return None
+    if isinstance(type_, DateTime):
+        return datetime.datetime.fromisoformat(value)
+    if isinstance(type_, Date):
+        return datetime.date.fromisoformat(value)
+    if isinstance(type_, Boolean):
+        return value if isinstance(value, bool) else value.lower() == "true"
+    if isinstance(type_, Integer):
+        return int(value)
+    return value
+
+
+def _path(directory: str, table: str, fmt: str) -> str:
+    return os.path.join(directory, f"{table}.{fmt}.gz")
+
+
+def _write_rows(path: str, fmt: str, columns: list[str], rows: Iterable[tuple]) -> int:
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(["true" if v is True else "false" if v is False else _to_text(v) for v in row])
+                count += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(columns, map(_to_text, row))), ensure_ascii=False))
+                f.write("\n")
+                count += 1
+    return count
+
+
+def _read_rows(path: str, fmt: str) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _chunks(rows: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def export_table(conn: Connection, table: str, directory: str, fmt: str, chunk_size: int) -> int:
+    spec = TABLES[table]
+    result = conn.execution_options(stream_results=True).execute(spec["select"])
+
+    def rows() -> Iterator[tuple]:
+        for partition in result.partitions(chunk_size):
+            yield from partition
+
+    return _write_rows(_path(directory, table, fmt), fmt, list(spec["columns"]), rows())
+
+
+def import_table(
+    conn: Connection, table: str, directory: str, fmt: str, chunk_size: int, on_conflict: str
+) -> int | None:
+    path = _path(directory, table, fmt)
+    if not os.path.exists(path):
+        return None
+    spec = TABLES[table]
+    columns: dict[str, Any] = spec["columns"]
+    action = spec["update"] if on_conflict == "update" else "NOTHING"
+    stmt = text(spec["insert"] + action).bindparams(*(bindparam(name, type_=t) for name, t in columns.items()))
+
+    count = 0
+    for chunk in _chunks(_read_rows(path, fmt), chunk_size):
+        params = [{name: _from_text(row.get(name), type_) for name, type_ in columns.items()} for row in chunk]
+        with conn.begin():
+            conn.execute(stmt, params)
+        count += len(params)
+    return count
+
+
+async def _rebuild_derived(database_url: str) -> dict[str, tuple[int, int]]:
+    engine = create_async_engine(_async_url(database_url))
+    try:
+        async with engine.begin() as conn:
+            db = AsyncSession(bind=conn)
+            await repository.rebuild_sign_masks(db)
+            return await repository.reconcile_counters(db)
+    finally:
+        await engine.dispose()
+
+
+def _timed(label: str, fn: Callable[[], int | None]) -> None:
+    start = time.perf_counter()
+    count = fn()
+    if count is None:
+        print(f"{label:18s} skipped (no file)")
+        return
+    elapsed = time.perf_counter() - start
+    print(f"{label:18s} {count:9d} rows  {elapsed:6.2f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("directory")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--tables", default=",".join(TABLES), help="comma-separated subset of " + ", ".join(TABLES))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--on-conflict", choices=("update", "skip"), default="update")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    args = parser.parse_args()
+
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()]
+    unknown = set(tables) - set(TABLES)
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(sorted(unknown))}")
+    # Users must exist before their subscriptions are resolved.
+    tables.sort(key=list(TABLES).index)
+
+    database_url = _sync_url(args.database_url)
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as conn:
+            if args.command == "export":
+                os.makedirs(args.directory, exist_ok=True)
+                for table in tables:
+                    _timed(table, lambda: export_table(conn, table, args.directory, args.format, args.chunk_size))
+            else:
+                with conn.begin():
+                    run_migrations(conn)
+                for table in tables:
+                    _timed(
+                        table,
+                        lambda: import_table(
+                            conn, table, args.directory, args.format, args.chunk_size, args.on_conflict
+                        ),
+                    )
+    finally:
+        engine.dispose()
+
+    if args.command == "import" and {"users", "subscriptions"} & set(tables):
+        drift = asyncio.run(_rebuild_derived(database_url))
+        print(f"sign masks rebuilt, {len(drift)} subscriber counters updated")
+
+
+if __name__ == "__main__":
+    main()
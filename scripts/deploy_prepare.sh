@@ -228,7 +228,7 @@ else
 builder = "nixpacks"
 
 [deploy]
-startCommand = "uvicorn app.main:app --host 0.0.0.0 --port $PORT"
+startCommand = "uvicorn app.main:app --host 0.0.0.0 --port $PORT --timeout-graceful-shutdown 15"
 EOF
     log_success "railway.toml создан"
 fi
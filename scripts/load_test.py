@@ -0,0 +1,302 @@
+"""Load test: synthetic update streams against the webhook, fully offline.
+
+Starts mock Bot API, horo.mail.ru and nekdo.ru servers (scripts/mock_services.py),
+runs ``uvicorn app.main:app`` in a subprocess pointed at them with a fresh SQLite
+database, then posts a mix of /start, /list, /me, /joke, sign clicks and
+subscribe toggles to /webhook and reports throughput, latency percentiles and
+error rates per update kind. Server-side drops are read from /metrics.
+
+Usage:
+    python scripts/load_test.py [--updates 5000] [--concurrency 50] [--rate RPS] [--users 1000]
+        [--api-latency-ms 30] [--api-error-rate 0.01] [--upstream-latency-ms 300]
+        [--upstream-error-rate 0.05] [--page-kb 150] [--workers 1] [--seed 1]
+
+With --rate updates arrive open-loop at that rate; otherwise --concurrency
+clients send back to back. The run exits with status 1 when any request got a
+5xx response. Pass --target URL to load an already running server instead
+(start it with the environment printed by --print-env).
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from itertools import count
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mock_services import MockServices  # noqa: E402
+
+from app.keyboards import ZODIAC_SIGNS  # noqa: E402
+
+WEBHOOK_SECRET = "load-test-secret"
+BOT_TOKEN = "123456:LOADTEST"
+
+# Relative frequency of each kind of update in the synthetic stream.
+UPDATE_MIX = {
+    "/start": 1.0,
+    "/list": 1.5,
+    "/me": 1.0,
+    "/joke": 0.5,
+    "sign": 4.0,
+    "sub": 1.5,
+    "unsub": 1.0,
+    "back": 0.5,
+}
+
+
+class UpdateFactory:
+    """Builds Telegram updates for a pool of synthetic users."""
+
+    def __init__(self, users: int, seed: int | None) -> None:
+        self.random = random.Random(seed)
+        self.user_ids = [10_000_000 + i for i in range(users)]
+        self._update_ids = count(1)
+        self._message_ids = count(1)
+        self._kinds = list(UPDATE_MIX)
+        self._weights = list(UPDATE_MIX.values())
+
+    def _user(self, user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "language_code": "ru"}
+
+    def _message(self, user_id: int, text: str | None = None) -> dict:
+        msg = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": f"User{user_id}"},
+            "from": self._user(user_id),
+        }
+        if text is not None:
+            msg["text"] = text
+            msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+        return msg
+
+    def next(self) -> tuple[str, dict]:
+        kind = self.random.choices(self._kinds, self._weights)[0]
+        user_id = self.random.choice(self.user_ids)
+        update: dict = {"update_id": next(self._update_ids)}
+        if kind.startswith("/"):
+            update["message"] = self._message(user_id, kind)
+            return kind, update
+        data = "back:list" if kind == "back" else f"{kind}:{self.random.choice(ZODIAC_SIGNS)}"
+        message = self._message(user_id)
+        message["from"] = {"id": 1, "is_bot": True, "first_name": "MockBot"}
+        update["callback_query"] = {
+            "id": str(update["update_id"]),
+            "from": self._user(user_id),
+            "message": message,
+            "chat_instance": str(user_id),
+            "data": data,
+        }
+        return f"cb:{kind}", update
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.statuses: Counter[str] = Counter()
+
+    def add(self, kind: str, latency: float, status: str) -> None:
+        self.latencies[kind].append(latency)
+        self.statuses[status] += 1
+        if status != "200":
+            self.errors[kind] += 1
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _report(stats: Stats, elapsed: float) -> None:
+    total = sum(len(v) for v in stats.latencies.values())
+    errors = sum(stats.errors.values())
+    print(f"\n{total} updates in {elapsed:.2f} s -> {total / elapsed:.1f} updates/s, errors {errors / total:.2%}")
+    print(f"{'kind':12s} {'count':>7s} {'p50 ms':>8s} {'p90 ms':>8s} {'p99 ms':>8s} {'max ms':>8s} {'errors':>7s}")
+    rows = sorted(stats.latencies.items(), key=lambda item: len(item[1]), reverse=True)
+    everything = sorted(v for values in stats.latencies.values() for v in values)
+    for kind, values in rows + [("all", everything)]:
+        values = sorted(values)
+        err = errors if kind == "all" else stats.errors[kind]
+        print(
+            f"{kind:12s} {len(values):7d} "
+            + " ".join(f"{_percentile(values, q) * 1000:8.1f}" for q in (0.5, 0.9, 0.99))
+            + f" {values[-1] * 1000:8.1f} {err:7d}"
+        )
+    print("responses: " + ", ".join(f"{status} {n}" for status, n in stats.statuses.most_common()))
+
+
+async def _send(client: httpx.AsyncClient, kind: str, update: dict, stats: Stats) -> None:
+    started = time.perf_counter()
+    try:
+        resp = await client.post("/webhook", json=update)
+        status = str(resp.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    stats.add(kind, time.perf_counter() - started, status)
+
+
+async def _closed_loop(client, factory: UpdateFactory, updates: int, concurrency: int, stats: Stats) -> None:
+    remaining = count(updates, -1)
+
+    async def worker() -> None:
+        while next(remaining) > 0:
+            kind, update = factory.next()
+            await _send(client, kind, update, stats)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def _open_loop(client, factory: UpdateFactory, updates: int, rate: float, stats: Stats) -> None:
+    start = time.perf_counter()
+    tasks = []
+    for i in range(updates):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind, update = factory.next()
+        tasks.append(asyncio.create_task(_send(client, kind, update, stats)))
+    await asyncio.gather(*tasks)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _server_env(mocks: MockServices, data_dir: str) -> dict[str, str]:
+    env = {
+        "BOT_TOKEN": BOT_TOKEN,
+        "WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "DATABASE_URL": f"sqlite:///{data_dir}/load_test.db",
+        "SCHEDULER_ENABLED": "false",
+        **mocks.env(),
+    }
+    # Synthetic users send far more than real ones; keep the limiter out of the measurement.
+    env.setdefault("USER_RATE_LIMIT_PER_MINUTE", os.getenv("USER_RATE_LIMIT_PER_MINUTE", "100000"))
+    env.setdefault("USER_RATE_LIMIT_BURST", os.getenv("USER_RATE_LIMIT_BURST", "100000"))
+    return env
+
+
+async def _wait_healthy(client: httpx.AsyncClient, process: subprocess.Popen | None, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not become healthy")
+
+
+async def _server_drops(client: httpx.AsyncClient) -> str:
+    try:
+        body = (await client.get("/metrics")).text
+    except httpx.HTTPError:
+        return "unavailable"
+    drops = [line for line in body.splitlines() if line.startswith("tgbot_updates_dropped_total{")]
+    return ", ".join(line.split('"')[1] + " " + line.rsplit(" ", 1)[1] for line in drops) or "none"
+
+
+async def run(args: argparse.Namespace) -> Stats:
+    async with MockServices(
+        api_latency_ms=args.api_latency_ms,
+        api_error_rate=args.api_error_rate,
+        upstream_latency_ms=args.upstream_latency_ms,
+        upstream_error_rate=args.upstream_error_rate,
+        page_kb=args.page_kb,
+        seed=args.seed,
+    ) as mocks:
+        data_dir = tempfile.mkdtemp(prefix="tgbot-load-")
+        env = _server_env(mocks, data_dir)
+        if args.print_env:
+            print(" ".join(f"{key}={value}" for key, value in env.items()))
+            print("Mocks are running; press Ctrl+C to stop.")
+            await asyncio.Event().wait()
+
+        process = None
+        target = args.target
+        log_path = args.server_log or os.path.join(data_dir, "server.log")
+        if target is None:
+            port = _free_port()
+            target = f"http://127.0.0.1:{port}"
+            command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)]
+            command += ["--workers", str(args.workers), "--log-level", "warning"]
+            with open(log_path, "wb") as log:
+                process = subprocess.Popen(
+                    command,
+                    cwd=os.path.join(os.path.dirname(__file__), ".."),
+                    env={**os.environ, **env},
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                )
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        headers = {"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}
+        try:
+            async with httpx.AsyncClient(base_url=target, headers=headers, limits=limits, timeout=60) as client:
+                await _wait_healthy(client, process)
+                factory = UpdateFactory(args.users, args.seed)
+                stats = Stats()
+                mode = f"open loop at {args.rate}/s" if args.rate else f"concurrency {args.concurrency}"
+                print(f"{args.updates} updates from {args.users} users, {mode}, target {target}")
+                started = time.perf_counter()
+                if args.rate:
+                    await _open_loop(client, factory, args.updates, args.rate, stats)
+                else:
+                    await _closed_loop(client, factory, args.updates, args.concurrency, stats)
+                elapsed = time.perf_counter() - started
+                _report(stats, elapsed)
+                print(f"\nserver drops: {await _server_drops(client)}")
+                print(mocks.summary())
+                return stats
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+                if process.returncode not in (0, -15):
+                    print(f"server exited with {process.returncode}; log:\n{open(log_path).read()[-4000:]}")
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rate", type=float, help="open-loop arrival rate, updates per second")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--api-latency-ms", type=float, default=30.0)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-latency-ms", type=float, default=300.0)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--page-kb", type=int, default=150, help="size of mock horoscope pages")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--target", help="base URL of a running server instead of spawning one")
+    parser.add_argument("--server-log", help="keep the spawned server's output in this file")
+    parser.add_argument("--print-env", action="store_true", help="start the mocks and print the server env")
+    stats = asyncio.run(run(parser.parse_args()))
+    server_errors = sum(n for status, n in stats.statuses.items() if status.startswith("5"))
+    if server_errors:
+        # A run with server errors is a failed run, whatever its throughput.
+        print(f"\nFAIL: {server_errors} responses with 5xx status")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
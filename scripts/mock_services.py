@@ -0,0 +1,190 @@
+"""Local stand-ins for the Telegram Bot API, horo.mail.ru and nekdo.ru.
+
+Each mock is an aiohttp app with configurable latency and error injection, so
+the bot can be exercised fully offline. Point the bot at them with
+``MockServices.env()``: TELEGRAM_API_URL, HOROSCOPE_BASE_URL and JOKE_URL.
+"""
+
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+# Methods whose result is a Message; everything else answers True.
+_MESSAGE_METHODS = frozenset(
+    ("sendMessage", "sendDocument", "sendPhoto", "editMessageText", "editMessageReplyMarkup", "copyMessage")
+)
+
+_HOROSCOPE_PARAGRAPH = (
+    "Сегодня звёзды советуют не торопиться с важными решениями и внимательно слушать близких. "
+    "Вторая половина дня подходит для завершения начатых дел и спокойных прогулок."
+)
+_JOKES = (
+    "— Доктор, я буду жить?<br>— А смысл?",
+    "Программист ставит на тумбочку два стакана: с водой — если захочет пить, и пустой — если не захочет.",
+    "Оптимист изучает английский, пессимист — китайский, реалист — автомат Калашникова.",
+)
+
+
+class MockServer:
+    """One aiohttp app on 127.0.0.1 with shared latency/error knobs and counters."""
+
+    def __init__(self, latency_ms: float = 0.0, error_rate: float = 0.0, seed: int | None = None) -> None:
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls: Counter[str] = Counter()
+        self.errors = 0
+        self.url = ""
+        self._runner: web.AppRunner | None = None
+
+    def routes(self, app: web.Application) -> None:
+        raise NotImplementedError
+
+    async def _delay(self) -> bool:
+        """Apply latency; return True when this call should fail."""
+        if self.latency:
+            await asyncio.sleep(self.random.expovariate(1 / self.latency))
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+    async def start(self) -> str:
+        app = web.Application()
+        self.routes(app)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class MockBotApi(MockServer):
+    """Bot API answering every method with a plausible result; errors are HTTP 500."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._message_ids = itertools.count(1)
+
+    def routes(self, app: web.Application) -> None:
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_get("/bot{token}/{method}", self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        params = await request.post() if request.can_read_body else {}
+        if await self._delay():
+            return web.json_response(
+                {"ok": False, "error_code": 500, "description": "Internal Server Error"}, status=500
+            )
+        return web.json_response({"ok": True, "result": self.result(method, params)})
+
+    def result(self, method: str, params) -> object:
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "MockBot", "username": "mock_bot"}
+        if method in _MESSAGE_METHODS:
+            chat_id = int(params.get("chat_id") or 0)
+            return {
+                "message_id": int(params.get("message_id") or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text") or "",
+            }
+        if method == "getUpdates":
+            return []
+        return True
+
+
+class MockHoroscopeSite(MockServer):
+    """horo.mail.ru prediction pages padded to roughly ``page_kb`` kilobytes."""
+
+    def __init__(self, *args, page_kb: int = 150, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.page_kb = page_kb
+
+    def routes(self, app: web.Application) -> None:
+        app.router.add_get("/prediction/{sign}/today/", self.handle)
+
+    def page(self, sign: str) -> str:
+        blocks = "".join(f'<div article-item-type="html"><p>{sign}: {_HOROSCOPE_PARAGRAPH}</p></div>' for _ in range(3))
+        ratings = "".join(
+            f'<a href="#">{title}</a><ul aria-label="{self.random.randint(1, 5)} из 5"><li></li></ul>'
+            for title in ("Финансы", "Здоровье", "Любовь")
+        )
+        filler_block = '<div class="teaser"><span>Новости</span><a href="/news">Читать далее</a></div>\n'
+        filler = filler_block * max(0, self.page_kb * 1024 // len(filler_block.encode()))
+        return f"<html><head><title>{sign}</title></head><body>{filler}{blocks}{ratings}{filler}</body></html>"
+
+    async def handle(self, request: web.Request) -> web.Response:
+        sign = request.match_info["sign"]
+        self.calls[sign] += 1
+        if await self._delay():
+            return web.Response(status=500, text="upstream error")
+        return web.Response(text=self.page(sign), content_type="text/html")
+
+
+class MockJokeSite(MockServer):
+    """nekdo.ru/random page with a handful of jokes."""
+
+    def routes(self, app: web.Application) -> None:
+        app.router.add_get("/random/", self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.calls["random"] += 1
+        if await self._delay():
+            return web.Response(status=500, text="upstream error")
+        body = "".join(f'<div class="text">{joke}</div>' for joke in _JOKES)
+        return web.Response(text=f"<html><body>{body}</body></html>", content_type="text/html")
+
+
+class MockServices:
+    """Starts and stops all three mocks together."""
+
+    def __init__(
+        self,
+        api_latency_ms: float = 0.0,
+        api_error_rate: float = 0.0,
+        upstream_latency_ms: float = 0.0,
+        upstream_error_rate: float = 0.0,
+        page_kb: int = 150,
+        seed: int | None = None,
+    ) -> None:
+        self.bot_api = MockBotApi(api_latency_ms, api_error_rate, seed)
+        self.horoscope = MockHoroscopeSite(upstream_latency_ms, upstream_error_rate, seed, page_kb=page_kb)
+        self.jokes = MockJokeSite(upstream_latency_ms, upstream_error_rate, seed)
+
+    async def __aenter__(self) -> "MockServices":
+        for server in (self.bot_api, self.horoscope, self.jokes):
+            await server.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        for server in (self.bot_api, self.horoscope, self.jokes):
+            await server.stop()
+
+    def env(self) -> dict[str, str]:
+        return {
+            "TELEGRAM_API_URL": self.bot_api.url,
+            "HOROSCOPE_BASE_URL": self.horoscope.url,
+            "JOKE_URL": f"{self.jokes.url}/random/",
+        }
+
+    def summary(self) -> str:
+        api = self.bot_api
+        return (
+            f"mock Bot API: {sum(api.calls.values())} calls ({', '.join(f'{m} {n}' for m, n in api.calls.most_common())}), "
+            f"{api.errors} injected errors\n"
+            f"mock horo.mail.ru: {sum(self.horoscope.calls.values())} requests, {self.horoscope.errors} injected errors\n"
+            f"mock nekdo.ru: {sum(self.jokes.calls.values())} requests, {self.jokes.errors} injected errors"
+        )
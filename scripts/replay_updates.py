@@ -0,0 +1,182 @@
+"""Replay captured updates (UPDATE_CAPTURE_DIR) through process_update, offline.
+
+Starts the mock Bot API, horo.mail.ru and nekdo.ru servers from
+scripts/mock_services.py, points the bot at them with a fresh SQLite database
+and feeds the capture to ``process_update`` in this process, so the run can be
+profiled with --profile or an external sampler (py-spy, /proc). Updates are
+dispatched in arrival order at the original pacing, --speed N times faster, or
+with --max-speed as fast as --concurrency allows. Dedupe, staleness and rate
+limiting in the webhook are bypassed; everything behind process_update is real.
+
+Usage:
+    python scripts/replay_updates.py CAPTURE [CAPTURE ...] [--speed 1 | --max-speed]
+        [--concurrency 50] [--limit N] [--api-latency-ms 30] [--upstream-latency-ms 300]
+        [--profile replay.prof]
+
+CAPTURE is a ``updates-*.jsonl.gz`` file or a directory of them.
+"""
+
+import argparse
+import asyncio
+import cProfile
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mock_services import MockServices  # noqa: E402
+
+from app.capture import read_capture  # noqa: E402
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _kind(update: dict) -> str:
+    message = update.get("message")
+    if isinstance(message, dict):
+        text = message.get("text") or ""
+        return text.split()[0] if text.startswith("/") else "message"
+    callback = update.get("callback_query")
+    if isinstance(callback, dict):
+        return "cb:" + (callback.get("data") or "").split(":", 1)[0]
+    return next((key for key in update if key != "update_id"), "unknown")
+
+
+class Replay:
+    def __init__(self, process_update, speed: float, concurrency: int) -> None:
+        self.process_update = process_update
+        self.speed = speed
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.latencies: list[float] = []
+        self.kinds: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.max_lag = 0.0
+
+    async def _one(self, update: dict) -> None:
+        kind = _kind(update)
+        self.kinds[kind] += 1
+        started = time.perf_counter()
+        try:
+            await self.process_update(update)
+        except Exception:
+            self.errors[kind] += 1
+        self.latencies.append(time.perf_counter() - started)
+
+    async def run(self, entries) -> None:
+        tasks: set[asyncio.Task] = set()
+        started = time.perf_counter()
+        first: float | None = None
+        for arrived, update in entries:
+            if self.speed:
+                first = arrived if first is None else first
+                due = started + (arrived - first) / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    self.max_lag = max(self.max_lag, -delay)
+                task = asyncio.create_task(self._one(update))
+            else:
+                # Read ahead only as far as there are free slots.
+                await self.semaphore.acquire()
+                task = asyncio.create_task(self._one(update))
+                task.add_done_callback(lambda _: self.semaphore.release())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    def report(self, elapsed: float) -> None:
+        total = len(self.latencies)
+        values = sorted(self.latencies)
+        errors = sum(self.errors.values())
+        print(f"{total} updates in {elapsed:.2f} s -> {total / elapsed:.1f} updates/s, errors {errors}")
+        print(
+            "process_update ms: "
+            + ", ".join(f"p{int(q * 100)} {_percentile(values, q) * 1000:.1f}" for q in (0.5, 0.9, 0.99))
+            + f", max {values[-1] * 1000:.1f}"
+        )
+        if self.speed:
+            print(f"max dispatch lag behind the capture's pacing: {self.max_lag * 1000:.1f} ms")
+        print("kinds: " + ", ".join(f"{kind} {n} ({self.errors[kind]} err)" for kind, n in self.kinds.most_common()))
+
+
+async def run(args: argparse.Namespace) -> None:
+    async with MockServices(
+        api_latency_ms=args.api_latency_ms,
+        api_error_rate=args.api_error_rate,
+        upstream_latency_ms=args.upstream_latency_ms,
+        upstream_error_rate=args.upstream_error_rate,
+        page_kb=args.page_kb,
+        seed=args.seed,
+    ) as mocks:
+        data_dir = tempfile.mkdtemp(prefix="tgbot-replay-")
+        os.environ.update(mocks.env())
+        os.environ["DATABASE_URL"] = f"sqlite:///{data_dir}/replay.db"
+        os.environ.setdefault("BOT_TOKEN", "123456:REPLAY")
+        os.environ["SCHEDULER_ENABLED"] = "false"
+        os.environ.pop("UPDATE_CAPTURE_DIR", None)
+        # Imported only now: the parsers and the database read their URLs at import time.
+        from app.bot import initialize_bot, process_update
+        from app.db import async_engine, run_migrations
+
+        bot = initialize_bot()
+        try:
+            run_migrations()
+            entries = read_capture(args.captures)
+            if args.limit:
+                entries = islice(entries, args.limit)
+            replay = Replay(process_update, 0.0 if args.max_speed else args.speed, args.concurrency)
+            mode = "max speed" if args.max_speed else f"{args.speed:g}x speed"
+            print(f"replaying {', '.join(args.captures)} at {mode}")
+
+            profiler = cProfile.Profile() if args.profile else None
+            started = time.perf_counter()
+            if profiler is not None:
+                profiler.enable()
+            await replay.run(entries)
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(args.profile)
+            elapsed = time.perf_counter() - started
+
+            if not replay.latencies:
+                print("capture is empty")
+                return
+            replay.report(elapsed)
+            print(mocks.summary())
+            if args.profile:
+                print(f"profile written to {args.profile} (python -m pstats {args.profile})")
+        finally:
+            await bot.session.close()
+            await async_engine.dispose()
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("captures", nargs="+", help="capture files or directories")
+    parser.add_argument("--speed", type=float, default=1.0, help="multiple of the original pacing")
+    parser.add_argument("--max-speed", action="store_true", help="ignore pacing, replay as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=50, help="updates in flight with --max-speed")
+    parser.add_argument("--limit", type=int, help="replay only the first N updates")
+    parser.add_argument("--api-latency-ms", type=float, default=30.0)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-latency-ms", type=float, default=300.0)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--page-kb", type=int, default=150, help="size of mock horoscope pages")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--profile", help="write cProfile stats of the replay to this file")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Cold-start profile: import-time breakdown and time until /health answers.
+
+Imports ``app.main`` in a fresh interpreter under ``python -X importtime`` and
+prints self time summed per top-level package plus the slowest modules. With
+--serve it also starts ``uvicorn app.main:app`` --runs times against a mock Bot
+API and one SQLite file (the first run migrates it, later runs find the schema
+current) and reports how long each took to answer /health, along with the
+server's own "Startup:" log line.
+
+Usage: python scripts/startup_profile.py [--top 15] [--serve] [--runs 3]
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mock_services import MockBotApi  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+BASE_ENV = {"BOT_TOKEN": "123456:STARTUP", "WEBHOOK_SECRET": "startup-profile", "SCHEDULER_ENABLED": "false"}
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def import_breakdown(env: dict[str, str], top: int) -> None:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT,
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules: list[tuple[int, str]] = []
+    packages: dict[str, int] = defaultdict(int)
+    total = 0
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = int(match[1]), int(match[2]), match[3], match[4]
+        modules.append((self_us, name))
+        packages[name.split(".")[0]] += self_us
+        if not indent:
+            total += cumulative_us
+
+    print(f"import app.main: {total / 1e6:.2f} s")
+    print(f"\n{'package':24s} {'self s':>8s} {'share':>6s}")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{package:24s} {self_us / 1e6:8.3f} {self_us / total:6.1%}")
+    print(f"\n{'module':48s} {'self s':>8s}")
+    for self_us, name in sorted(modules, reverse=True)[:top]:
+        print(f"{name:48s} {self_us / 1e6:8.3f}")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def time_to_healthy(env: dict[str, str], log_path: str, timeout: float = 60) -> float:
+    port = _free_port()
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "info"]
+    started = time.perf_counter()
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(command, cwd=ROOT, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            while time.perf_counter() - started < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"server exited with code {process.returncode}")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.01)
+        raise RuntimeError("server did not become healthy")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+async def serve(env: dict[str, str], runs: int) -> None:
+    bot_api = MockBotApi()
+    await bot_api.start()
+    data_dir = tempfile.mkdtemp(prefix="tgbot-startup-")
+    env = {**env, "TELEGRAM_API_URL": bot_api.url, "DATABASE_URL": f"sqlite:///{data_dir}/startup.db"}
+    try:
+        print()
+        for run in range(1, runs + 1):
+            log_path = os.path.join(data_dir, f"server-{run}.log")
+            seconds = await time_to_healthy(env, log_path)
+            with open(log_path, encoding="utf-8", errors="replace") as f:
+                report = next((line.split("Startup: ", 1)[1].strip() for line in f if "Startup: " in line), "")
+            print(f"run {run}: /health answered after {seconds:.2f} s ({report})")
+    finally:
+        await bot_api.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--serve", action="store_true", help="also measure time until /health answers")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    env = {key: os.environ.get(key, value) for key, value in BASE_ENV.items()}
+    import_breakdown(env, args.top)
+    if args.serve:
+        asyncio.run(serve(env, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Tests for buffered interaction analytics."""
+
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app import analytics
+from app.analytics import MSK_ZONE, InteractionLog
+from app.handlers import _interaction_key, setup_handlers
+from app.lazy_update import LazyUpdate
+
+
+def test_ring_buffer_overwrites_oldest_and_counts_drops() -> None:
+    log = InteractionLog(capacity=3)
+    for index in range(5):
+        log.record(f"/cmd{index}", "", 1.0)
+
+    assert len(log) == 3
+    assert log.dropped == 2
+    assert [event[1] for event in log.drain()] == ["/cmd2", "/cmd3", "/cmd4"]
+    assert len(log) == 0
+
+
+def test_interaction_key_bounds_cardinality() -> None:
+    def message(text: str) -> LazyUpdate:
+        return LazyUpdate({"update_id": 1, "message": {"message_id": 1, "chat": {"id": 1}, "text": text}})
+
+    def callback(data: str) -> LazyUpdate:
+        return LazyUpdate({"update_id": 1, "callback_query": {"id": "1", "from": {"id": 1}, "data": data}})
+
+    assert _interaction_key(message("/start payload")) == ("/start", "")
+    assert _interaction_key(message("/whatever")) == ("unknown", "")
+    assert _interaction_key(callback("sign:leo")) == ("cb:sign", "leo")
+    assert _interaction_key(callback("unsub:all")) == ("cb:unsub", "")
+    assert _interaction_key(callback("evil:leo")) == ("cb:unknown", "")
+
+
+@pytest.mark.asyncio
+async def test_flush_rollup_and_report(async_session_factory) -> None:
+    log = InteractionLog(capacity=100)
+    log.record("cb:sign", "leo", 10.0, True)
+    log.record("cb:sign", "leo", 30.0, False)
+    log.record("/start", "", 5.0)
+    assert await log.flush() == 3
+    assert log.flushed == 3 and len(log) == 0
+
+    today = datetime.now(MSK_ZONE).date()
+    async with async_session_factory.begin() as db:
+        assert await analytics.rollup_day(db, today) == 2
+        # Rollups are recomputed, not accumulated.
+        assert await analytics.rollup_day(db, today) == 2
+        assert await analytics.rollup_day(db, today - timedelta(days=1)) == 0
+
+    async with async_session_factory() as db:
+        report = await analytics.report(db)
+    assert report["commands"] == [("cb:sign", 2, 20.0), ("/start", 1, 5.0)]
+    assert report["signs"] == [("leo", 2)]
+    assert report["cache_hit_rate"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_setup_handlers_records_interaction(monkeypatch) -> None:
+    log = InteractionLog(capacity=10)
+    monkeypatch.setattr(analytics, "interaction_log", log)
+    update = LazyUpdate(
+        {"update_id": 1, "message": {"message_id": 1, "chat": {"id": 5}, "from": {"id": 5}, "text": "/nope"}}
+    )
+
+    await setup_handlers(AsyncMock(), update)
+
+    [(_, command, sign, latency_ms, hit)] = log.drain()
+    assert (command, sign, hit) == ("unknown", "", None)
+    assert latency_ms >= 0
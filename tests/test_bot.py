@@ -0,0 +1,42 @@
+"""Tests for the Bot API session configuration."""
+
+import pytest
+
+from app import bot as bot_module
+
+
+@pytest.fixture
+def fresh_bot(monkeypatch):
+    monkeypatch.setattr(bot_module, "bot", None)
+    yield
+    monkeypatch.setattr(bot_module, "bot", None)
+
+
+@pytest.mark.asyncio
+async def test_bot_talks_to_local_server_over_one_connection(bot_api_server, fresh_bot, monkeypatch) -> None:
+    monkeypatch.setenv("TELEGRAM_API_URL", bot_api_server.url)
+    monkeypatch.setenv("TELEGRAM_API_LOCAL", "true")
+    bot = bot_module.initialize_bot()
+    try:
+        await bot.get_me()
+        for chat_id in (10, 11, 12):
+            await bot.send_message(chat_id, "hi")
+    finally:
+        await bot_module.close_bot()
+
+    assert bot.session.api.is_local
+    assert bot_api_server.calls == {"getMe": 1, "sendMessage": 3}
+    assert len(bot_api_server.client_ports) == 1
+
+
+def test_session_pool_and_timeouts_from_env(monkeypatch) -> None:
+    monkeypatch.delenv("TELEGRAM_API_URL", raising=False)
+    monkeypatch.setenv("TELEGRAM_POOL_SIZE", "8")
+    monkeypatch.setenv("TELEGRAM_KEEPALIVE_SECONDS", "30")
+    monkeypatch.setenv("TELEGRAM_TIMEOUT_SECONDS", "5")
+    session = bot_module.create_session()
+
+    assert session.api.base.startswith("https://api.telegram.org/")
+    assert session.timeout == 5
+    assert session._connector_init["limit"] == session._connector_init["limit_per_host"] == 8
+    assert session._connector_init["keepalive_timeout"] == 30
@@ -0,0 +1,79 @@
+"""Tests for update capture."""
+
+import pytest
+
+from app import capture
+from app.capture import UpdateRecorder, read_capture, redact
+from app.handlers import _interaction_key
+from app.keyboards import JOKE_SUBSCRIBE_TEXT, JOKE_UNSUBSCRIBE_TEXT
+from app.lazy_update import LazyUpdate
+
+
+def _message(user_id: int, text: str) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": "Анна", "username": "anna", "language_code": "ru"}
+    return {
+        "update_id": 10,
+        "message": {
+            "message_id": 3,
+            "date": 1700000000,
+            "chat": {"id": user_id, "type": "private", "first_name": "Анна"},
+            "from": user,
+            "text": text,
+            "contact": {"phone_number": "+79990000000", "first_name": "Анна"},
+        },
+    }
+
+
+def test_redacted_joke_buttons_replay_as_joke_subscription() -> None:
+    subscribe = LazyUpdate(redact(_message(42, JOKE_SUBSCRIBE_TEXT)))
+    unsubscribe = LazyUpdate(redact(_message(42, JOKE_UNSUBSCRIBE_TEXT)))
+
+    assert subscribe.message.text == JOKE_SUBSCRIBE_TEXT
+    assert _interaction_key(subscribe) == ("joke_subscribe", "")
+    assert _interaction_key(unsubscribe) == ("joke_unsubscribe", "")
+
+
+def test_redact_pseudonymizes_ids_and_strips_personal_data() -> None:
+    redacted = redact(_message(42, "/start secret-payload"))
+    message = redacted["message"]
+
+    assert message["from"]["id"] == message["chat"]["id"] != 42
+    assert redact(_message(42, "hi"))["message"]["from"]["id"] == message["from"]["id"]
+    assert message["from"]["first_name"] == message["from"]["username"] == "***"
+    assert message["from"]["language_code"] == "ru"
+    assert message["text"] == "/start **************"
+    assert "contact" not in message
+    assert redact(_message(42, "мой адрес"))["message"]["text"] == "*********"
+    assert (redacted["update_id"], message["message_id"], message["date"]) == (10, 3, 1700000000)
+
+
+@pytest.mark.asyncio
+async def test_recorder_rotates_and_prunes_files(tmp_path) -> None:
+    recorder = UpdateRecorder(str(tmp_path), file_bytes=1, max_files=2)
+    for update_id in range(3):
+        recorder.record({"update_id": update_id})
+        assert await recorder.flush() == 1
+
+    files = sorted(tmp_path.glob(capture.FILE_PATTERN))
+    assert len(files) == 2
+    assert [update["update_id"] for _, update in read_capture([str(tmp_path)])] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_read_capture_merges_workers_in_arrival_order(tmp_path) -> None:
+    first, second = UpdateRecorder(str(tmp_path / "a")), UpdateRecorder(str(tmp_path / "b"))
+    for update_id, recorder in enumerate((first, second, first, second)):
+        recorder.record({"update_id": update_id})
+    await first.flush()
+    await second.flush()
+
+    entries = list(read_capture([str(tmp_path / "a"), str(tmp_path / "b")]))
+    assert [update["update_id"] for _, update in entries] == [0, 1, 2, 3]
+    assert [ts for ts, _ in entries] == sorted(ts for ts, _ in entries)
+
+
+def test_capacity_bounds_the_queue(tmp_path) -> None:
+    recorder = UpdateRecorder(str(tmp_path), capacity=2)
+    for update_id in range(5):
+        recorder.record({"update_id": update_id})
+    assert recorder.dropped == 3
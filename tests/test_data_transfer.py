@@ -0,0 +1,127 @@
+"""Round trip of scripts/data_transfer.py between two SQLite files."""
+
+import asyncio
+import datetime
+import importlib.util
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app import repository
+from app.db import _async_url, run_migrations
+from app.keyboards import mask_to_signs
+from app.models import CachedHoroscope, SubscriberCounter, Subscription, User
+
+_SCRIPT = os.path.join(os.path.dirname(__file__), "..", "scripts", "data_transfer.py")
+_spec = importlib.util.spec_from_file_location("data_transfer", _SCRIPT)
+data_transfer = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(data_transfer)
+
+BIG_ID = 8_123_456_789  # beyond 32 bits, as new Telegram accounts get
+
+
+def _run(monkeypatch, *args: str) -> None:
+    monkeypatch.setattr(sys, "argv", ["data_transfer.py", *args])
+    data_transfer.main()
+
+
+async def _in_db(url: str, fn):
+    engine = create_async_engine(_async_url(url))
+    try:
+        async with engine.begin() as conn:
+            return await fn(AsyncSession(bind=conn))
+    finally:
+        await engine.dispose()
+
+
+def _create(url: str) -> None:
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        run_migrations(conn)
+    engine.dispose()
+
+
+async def _seed(db: AsyncSession) -> None:
+    await repository.upsert_user(db, BIG_ID, 'o"brien, jr', "Имя, с запятой", None)
+    await repository.upsert_user(db, 2, None, None, None)
+    await repository.upsert_user(db, 3, "plain", "Plain", "User")
+    await repository.subscribe(db, BIG_ID, "aries")
+    await repository.subscribe(db, BIG_ID, "leo")
+    await repository.subscribe(db, 2, "leo")
+    await repository.subscribe(db, 3, "pisces")
+    await repository.unsubscribe(db, 3, "pisces")
+    await repository.set_joke_subscription(db, BIG_ID, True)
+    db.add(CachedHoroscope(sign="leo", date=datetime.date(2026, 1, 2), content='Текст, "в кавычках"\n'))
+
+
+async def _snapshot(db: AsyncSession) -> dict:
+    users = (
+        await db.execute(select(User.telegram_id, User.username, User.first_name, User.last_name, User.joke_subscribed))
+    ).all()
+    masks = dict((await db.execute(select(User.telegram_id, User.sign_mask))).all())
+    subscriptions = (
+        await db.execute(
+            select(User.telegram_id, Subscription.sign, Subscription.active).join(User, User.id == Subscription.user_id)
+        )
+    ).all()
+    horoscopes = (await db.execute(select(CachedHoroscope.sign, CachedHoroscope.date, CachedHoroscope.content))).all()
+    stored = dict((await db.execute(select(SubscriberCounter.name, SubscriberCounter.value))).all())
+    actual = await repository.count_subscribers(db)
+    return {
+        "users": sorted(users),
+        "signs": {telegram_id: sorted(mask_to_signs(mask)) for telegram_id, mask in masks.items()},
+        "subscriptions": sorted(subscriptions),
+        "horoscopes": sorted(horoscopes),
+        "counters": {name: stored.get(name, 0) for name in actual},
+        "actual": actual,
+    }
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_export_import_round_trip(tmp_path, monkeypatch, capsys, fmt) -> None:
+    source = f"sqlite:///{tmp_path / 'source.db'}"
+    target = f"sqlite:///{tmp_path / 'target.db'}"
+    dump = str(tmp_path / "dump")
+    _create(source)
+    asyncio.run(_in_db(source, _seed))
+
+    _run(monkeypatch, "export", dump, "--format", fmt, "--database-url", source)
+    _run(monkeypatch, "import", dump, "--format", fmt, "--database-url", target)
+
+    expected = asyncio.run(_in_db(source, _snapshot))
+    imported = asyncio.run(_in_db(target, _snapshot))
+    assert imported == expected
+    assert len(imported["users"]) == 3
+    assert len(imported["subscriptions"]) == 4
+    assert (BIG_ID, 'o"brien, jr', "Имя, с запятой", None, True) in imported["users"]
+    assert (2, None, None, None, False) in imported["users"]
+    assert imported["signs"] == {BIG_ID: ["aries", "leo"], 2: ["leo"], 3: []}
+    assert imported["counters"] == imported["actual"]
+    assert imported["actual"][repository.ACTIVE_USERS] == 2
+    assert imported["actual"][repository.sign_counter("leo")] == 2
+    assert imported["actual"][repository.JOKE_SUBSCRIBERS] == 1
+
+    async def change(db: AsyncSession) -> None:
+        await repository.upsert_user(db, BIG_ID, "renamed, again", None, "Last")
+        await repository.unsubscribe(db, BIG_ID, "leo")
+        await repository.subscribe(db, 3, "pisces")
+        await repository.set_joke_subscription(db, BIG_ID, False)
+
+    asyncio.run(_in_db(source, change))
+    _run(monkeypatch, "export", dump, "--format", fmt, "--database-url", source)
+    _run(monkeypatch, "import", dump, "--format", fmt, "--on-conflict", "update", "--database-url", target)
+
+    expected = asyncio.run(_in_db(source, _snapshot))
+    updated = asyncio.run(_in_db(target, _snapshot))
+    assert updated == expected
+    assert len(updated["users"]) == 3
+    assert len(updated["subscriptions"]) == 4
+    assert (BIG_ID, "renamed, again", None, "Last", False) in updated["users"]
+    assert updated["signs"] == {BIG_ID: ["aries"], 2: ["leo"], 3: ["pisces"]}
+    assert updated["counters"] == updated["actual"]
+    assert updated["actual"][repository.ACTIVE_USERS] == 3
+    assert updated["actual"][repository.JOKE_SUBSCRIBERS] == 0
+    assert "subscriber counters updated" in capsys.readouterr().out
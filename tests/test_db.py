@@ -1,10 +1,15 @@
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+
 from app import models
-from app.db import Base, SessionLocal, engine, ensure_schema
+from app.db import SessionLocal, run_migrations, schema_is_current
+from app.keyboards import mask_to_signs
 
 
 def test_create_db():
-    Base.metadata.create_all(bind=engine)
-    ensure_schema()
+    run_migrations()
     db = SessionLocal()
     try:
         existing = db.query(models.User).filter_by(telegram_id=12345).first()
@@ -19,3 +24,51 @@ def test_create_db():
         db.commit()
     finally:
         db.close()
+
+
+def test_migrations_create_schema_matching_models():
+    from alembic.autogenerate import compare_metadata
+    from alembic.migration import MigrationContext
+
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        run_migrations(conn)
+        assert compare_metadata(MigrationContext.configure(conn), models.Base.metadata) == []
+
+
+def test_migrations_upgrade_legacy_database_and_backfill_sign_mask():
+    legacy = create_engine("sqlite://", poolclass=StaticPool)
+    with legacy.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, telegram_id INTEGER, joke_subscribed BOOLEAN)"))
+        conn.execute(
+            text("CREATE TABLE subscriptions (id INTEGER PRIMARY KEY, user_id INTEGER, sign TEXT, active BOOLEAN)")
+        )
+        conn.execute(text("INSERT INTO users (id, telegram_id, joke_subscribed) VALUES (1, 10, 0), (2, 20, 0)"))
+        conn.execute(
+            text(
+                "INSERT INTO subscriptions (user_id, sign, active) "
+                "VALUES (1, 'aries', 1), (1, 'leo', 1), (1, 'pisces', 0), (2, 'pisces', 0)"
+            )
+        )
+
+    with legacy.begin() as conn:
+        run_migrations(conn)
+
+    with legacy.connect() as conn:
+        masks = dict(conn.execute(text("SELECT telegram_id, sign_mask FROM users")).fetchall())
+        assert mask_to_signs(masks[10]) == ["aries", "leo"]
+        assert masks[20] == 0
+        assert {"cached_horoscopes", "processed_updates"} <= set(inspect(conn).get_table_names())
+        counters = dict(conn.execute(text("SELECT name, value FROM subscriber_counters")).fetchall())
+        assert counters == {"active_users": 1, "joke_subscribers": 0, "sign:aries": 1, "sign:leo": 1}
+
+
+def test_up_to_date_schema_skips_alembic():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        assert not schema_is_current(conn)
+        run_migrations(conn)
+        assert schema_is_current(conn)
+        with patch("alembic.command.upgrade") as upgrade:
+            run_migrations(conn)
+        upgrade.assert_not_called()
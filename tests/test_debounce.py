@@ -0,0 +1,56 @@
+"""Tests for callback debouncing."""
+
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.debounce import CallbackDebouncer, RedisDebouncer
+
+
+def test_debouncer_expires_entries_after_window() -> None:
+    debouncer = CallbackDebouncer(window=1.0, max_size=100)
+
+    assert debouncer.is_duplicate("a", now=0.0) is False
+    assert debouncer.is_duplicate("a", now=0.5) is True
+    assert debouncer.is_duplicate("a", now=1.0) is False
+
+
+def test_debouncer_evicts_only_expired_heads() -> None:
+    debouncer = CallbackDebouncer(window=1.0, max_size=100)
+    debouncer.is_duplicate("a", now=0.0)
+    debouncer.is_duplicate("b", now=0.6)
+
+    debouncer.is_duplicate("c", now=1.2)
+
+    assert len(debouncer) == 2
+    assert debouncer.is_duplicate("b", now=1.3) is True
+
+
+def test_debouncer_respects_max_size() -> None:
+    debouncer = CallbackDebouncer(window=10.0, max_size=2)
+    for key in ("a", "b", "c"):
+        debouncer.is_duplicate(key, now=0.0)
+
+    assert len(debouncer) == 2
+    assert debouncer.is_duplicate("a", now=0.0) is False
+
+
+@pytest.mark.asyncio
+async def test_redis_debouncer_uses_set_nx() -> None:
+    """A key that already exists in Redis means another worker saw the click."""
+    debouncer = RedisDebouncer("redis://localhost:6379/0", window=1.0)
+    debouncer._client = AsyncMock()
+    debouncer._client.set.side_effect = [True, None]
+
+    assert await debouncer.is_duplicate(1, "sign:leo") is False
+    assert await debouncer.is_duplicate(1, "sign:leo") is True
+    debouncer._client.set.assert_awaited_with("tgbot:cb:1:sign:leo", b"1", nx=True, px=1000)
+
+
+@pytest.mark.asyncio
+async def test_redis_debouncer_fails_open() -> None:
+    debouncer = RedisDebouncer("redis://localhost:6379/0", window=1.0)
+    debouncer._client = AsyncMock()
+    debouncer._client.set.side_effect = ConnectionError("down")
+
+    assert await debouncer.is_duplicate(1, "sign:leo") is False
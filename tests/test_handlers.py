@@ -1,8 +1,21 @@
 """Tests for handlers module."""
 
-from unittest.mock import MagicMock, patch
-
-from app.handlers import _get_or_create_user, _is_duplicate_callback, _is_valid_sign
+import pytest
+from sqlalchemy import select
+
+from app import repository
+from app.handlers import (
+    _get_subscribers_stats,
+    _get_user_subscriptions,
+    _is_duplicate_callback,
+    _is_subscribed,
+    _is_valid_sign,
+    _set_joke_subscription,
+    _subscribe_user,
+    _unsubscribe_user,
+    _upsert_user,
+)
+from app.models import User
 
 
 def test_is_valid_sign_accepts_valid_signs() -> None:
@@ -31,37 +44,71 @@ def test_is_duplicate_callback_detects_duplicates() -> None:
     assert _is_duplicate_callback(user_id, callback_data) is True
 
 
-@patch("app.handlers.SessionLocal")
-def test_get_or_create_user_creates_new_user(mock_session_class: MagicMock) -> None:
+@pytest.mark.asyncio
+async def test_upsert_user_creates_new_user(async_session_factory) -> None:
     """New user should be created if not exists."""
-    mock_db = MagicMock()
-    mock_session_class.return_value = mock_db
-    mock_db.query.return_value.filter_by.return_value.first.return_value = None
-
-    user, created = _get_or_create_user(
+    await _upsert_user(
         telegram_id=12345,
         username="testuser",
         first_name="Test",
         last_name="User",
     )
 
-    assert created is True
-    mock_db.add.assert_called_once()
-    mock_db.commit.assert_called_once()
-
-
-@patch("app.handlers.SessionLocal")
-def test_get_or_create_user_returns_existing_user(mock_session_class: MagicMock) -> None:
-    """Existing user should be returned without creating new one."""
-    mock_db = MagicMock()
-    mock_session_class.return_value = mock_db
-
-    existing_user = MagicMock()
-    existing_user.telegram_id = 12345
-    mock_db.query.return_value.filter_by.return_value.first.return_value = existing_user
-
-    user, created = _get_or_create_user(telegram_id=12345)
-
-    assert created is False
-    assert user == existing_user
-    mock_db.add.assert_not_called()
+    async with async_session_factory() as db:
+        stored = (await db.execute(select(User).filter_by(telegram_id=12345))).scalars().one()
+    assert stored.username == "testuser"
+    assert stored.joke_subscribed is False
+
+
+@pytest.mark.asyncio
+async def test_upsert_user_updates_existing_user(async_session_factory) -> None:
+    """Existing user should be updated in place without creating a new row."""
+    await _upsert_user(telegram_id=12345, username="old")
+    await _set_joke_subscription(12345, True)
+
+    await _upsert_user(telegram_id=12345, username="new")
+
+    async with async_session_factory() as db:
+        users = (await db.execute(select(User).filter_by(telegram_id=12345))).scalars().all()
+    assert len(users) == 1
+    assert users[0].username == "new"
+    assert users[0].joke_subscribed is True
+
+
+@pytest.mark.asyncio
+async def test_subscribe_and_unsubscribe_roundtrip(async_session_factory) -> None:
+    """Subscribing twice reports no change; unsubscribing clears the flag."""
+    assert await _subscribe_user(12345, "leo") is True
+    assert await _subscribe_user(12345, "leo") is False
+    assert await _is_subscribed(12345, "leo") is True
+    assert await _get_user_subscriptions(12345) == ["leo"]
+
+    assert await _unsubscribe_user(12345, "leo") is True
+    assert await _unsubscribe_user(12345, "leo") is False
+    assert await _is_subscribed(12345, "leo") is False
+
+    assert await _subscribe_user(12345, "leo") is True
+    assert await _subscribe_user(12345, "aries") is True
+    assert await _unsubscribe_user(12345, "all") is True
+    assert await _get_user_subscriptions(12345) == []
+
+
+@pytest.mark.asyncio
+async def test_subscriber_counters_follow_writes(async_session_factory) -> None:
+    """Counters change only on real transitions and match a recount."""
+    await _subscribe_user(1, "leo")
+    await _subscribe_user(1, "aries")
+    await _subscribe_user(1, "leo")
+    await _subscribe_user(2, "leo")
+    await _unsubscribe_user(2, "leo")
+    await _unsubscribe_user(2, "leo")
+    await _subscribe_user(3, "pisces")
+    await _subscribe_user(3, "leo")
+    await _unsubscribe_user(3, "all")
+    await _set_joke_subscription(1, True)
+    await _set_joke_subscription(1, True)
+    await _set_joke_subscription(2, False)
+
+    assert await _get_subscribers_stats() == (1, 1, [("aries", 1), ("leo", 1)])
+    async with async_session_factory.begin() as db:
+        assert await repository.reconcile_counters(db) == {}
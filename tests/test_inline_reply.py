@@ -0,0 +1,68 @@
+"""Tests for inline webhook replies."""
+
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+
+from app import inline_reply
+from app.inline_reply import InlineReplyMiddleware
+from app.keyboards import signs_keyboard
+
+
+@pytest.fixture
+def bot() -> Bot:
+    return Bot(token="123:ABC", default=DefaultBotProperties(parse_mode="HTML"))
+
+
+@pytest.mark.asyncio
+async def test_single_call_is_returned_inline(bot: Bot) -> None:
+    """The only call of a handler should be deferred into the response."""
+    make_request = AsyncMock()
+    middleware = InlineReplyMiddleware()
+
+    with inline_reply.capture() as reply:
+        await middleware(make_request, bot, SendMessage(chat_id=1, text="hi", reply_markup=signs_keyboard()))
+
+    make_request.assert_not_called()
+    body = reply.as_response(bot)
+    assert body["method"] == "sendMessage"
+    assert body["text"] == "hi"
+    assert body["parse_mode"] == "HTML"
+    assert "sign:aries" in body["reply_markup"]
+
+
+@pytest.mark.asyncio
+async def test_second_call_flushes_deferred_call_in_order(bot: Bot) -> None:
+    """A second call should send the deferred one first and disable inlining."""
+    sent = []
+
+    async def make_request(bot, method):
+        sent.append(method)
+        return True
+
+    middleware = InlineReplyMiddleware()
+    first = SendMessage(chat_id=1, text="first")
+    second = SendMessage(chat_id=1, text="second")
+
+    with inline_reply.capture() as reply:
+        await middleware(make_request, bot, first)
+        await middleware(make_request, bot, second)
+        await middleware(make_request, bot, AnswerCallbackQuery(callback_query_id="1"))
+
+    assert sent[:2] == [first, second]
+    assert len(sent) == 3
+    assert reply.as_response(bot) == {"ok": True}
+
+
+@pytest.mark.asyncio
+async def test_calls_outside_capture_are_sent_directly(bot: Bot) -> None:
+    """Without an active capture the middleware should be transparent."""
+    make_request = AsyncMock(return_value=True)
+    method = SendMessage(chat_id=1, text="hi")
+
+    await InlineReplyMiddleware()(make_request, bot, method)
+
+    make_request.assert_awaited_once_with(bot, method)
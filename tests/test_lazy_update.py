@@ -0,0 +1,62 @@
+"""Tests for lazy update decoding."""
+
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.handlers import setup_handlers
+from app.lazy_update import LazyUpdate, loads
+
+USER = {"id": 7, "is_bot": False, "first_name": "Ivan", "username": "ivan"}
+CHAT = {"id": 7, "type": "private"}
+
+
+def test_loads_decodes_bytes() -> None:
+    assert loads(b'{"update_id": 1}') == {"update_id": 1}
+
+
+def test_lazy_update_exposes_message_fields() -> None:
+    """Routed fields should be read straight from the raw dict."""
+    update = LazyUpdate(
+        {"update_id": 1, "message": {"message_id": 3, "date": 0, "from": USER, "chat": CHAT, "text": "/help"}}
+    )
+
+    assert update.callback_query is None
+    assert update.message.text == "/help"
+    assert update.message.chat.id == 7
+    assert update.message.from_user.username == "ivan"
+    assert update.message.from_user.last_name is None
+
+
+def test_lazy_update_exposes_callback_fields_and_full_model() -> None:
+    """Callback fields should be cheap and the full model available on demand."""
+    raw = {
+        "update_id": 2,
+        "callback_query": {
+            "id": "cb1",
+            "from": USER,
+            "chat_instance": "1",
+            "data": "sign:leo",
+            "message": {"message_id": 5, "date": 0, "chat": CHAT, "text": "x"},
+        },
+    }
+    update = LazyUpdate(raw)
+
+    assert update.message is None
+    assert update.callback_query.data == "sign:leo"
+    assert update.callback_query.message.message_id == 5
+    assert update.to_model().callback_query.from_user.id == 7
+
+
+@pytest.mark.asyncio
+async def test_setup_handlers_routes_lazy_update() -> None:
+    """Unknown commands should be answered without building aiogram models."""
+    bot = AsyncMock()
+    update = LazyUpdate(
+        {"update_id": 3, "message": {"message_id": 1, "date": 0, "from": USER, "chat": CHAT, "text": "hello"}}
+    )
+
+    await setup_handlers(bot, update)
+
+    bot.send_message.assert_awaited_once()
+    assert bot.send_message.await_args.args[0] == 7
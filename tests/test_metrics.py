@@ -0,0 +1,90 @@
+"""Tests for Prometheus instrumentation."""
+
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram import Bot
+from aiogram.methods import SendMessage
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from app import metrics
+from app.updates import accept_update
+
+
+def _sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_bot_api_middleware_records_method_and_outcome() -> None:
+    """Bot API calls should be timed by method, failures included."""
+    bot = Bot(token="123:ABC")
+    middleware = metrics.BotApiMetricsMiddleware()
+    ok_before = _sample("tgbot_bot_api_latency_seconds_count", method="sendMessage", outcome="ok")
+    error_before = _sample("tgbot_bot_api_latency_seconds_count", method="sendMessage", outcome="error")
+
+    await middleware(AsyncMock(return_value=True), bot, SendMessage(chat_id=1, text="hi"))
+    with pytest.raises(RuntimeError):
+        await middleware(AsyncMock(side_effect=RuntimeError), bot, SendMessage(chat_id=1, text="hi"))
+
+    assert _sample("tgbot_bot_api_latency_seconds_count", method="sendMessage", outcome="ok") == ok_before + 1
+    assert _sample("tgbot_bot_api_latency_seconds_count", method="sendMessage", outcome="error") == error_before + 1
+
+
+def test_instrumented_engine_records_statement_latency() -> None:
+    """Statements should be timed under their leading keyword."""
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+    before = _sample("tgbot_db_latency_seconds_count", operation="SELECT")
+
+    with engine.connect() as conn:
+        conn.execute(text("select 1"))
+
+    assert _sample("tgbot_db_latency_seconds_count", operation="SELECT") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_dropped_updates_are_counted_by_reason(async_session_factory) -> None:
+    """Duplicate and stale updates should increment their own counters."""
+    duplicate_before = _sample("tgbot_updates_dropped_total", reason="duplicate")
+    stale_before = _sample("tgbot_updates_dropped_total", reason="stale")
+
+    assert await accept_update({"update_id": 1, "message": {"date": int(time.time())}})
+    assert not await accept_update({"update_id": 1, "message": {"date": int(time.time())}})
+    assert not await accept_update({"update_id": 2, "message": {"date": 1}})
+
+    assert _sample("tgbot_updates_dropped_total", reason="duplicate") == duplicate_before + 1
+    assert _sample("tgbot_updates_dropped_total", reason="stale") == stale_before + 1
+
+
+def test_render_includes_scrape_time_state() -> None:
+    """The exposition should include values read from other modules at scrape time."""
+    body = metrics.render().decode()
+
+    assert "tgbot_webhook_latency_seconds_bucket" in body
+    assert 'tgbot_user_cache_requests_total{result="hit"}' in body
+    assert "tgbot_analytics_events_dropped_total" in body
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_requires_token_when_configured(monkeypatch) -> None:
+    """With METRICS_TOKEN set, /metrics should only answer a matching bearer header or ?token=."""
+    import httpx
+
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        monkeypatch.delenv("METRICS_TOKEN", raising=False)
+        assert (await client.get("/metrics")).status_code == 200
+
+        monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+        assert (await client.get("/metrics")).status_code == 404
+        assert (await client.get("/metrics", headers={"Authorization": "Bearer wrong"})).status_code == 403
+        assert (await client.get("/metrics", params={"token": "wrong"})).status_code == 403
+
+        response = await client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+        assert response.status_code == 200
+        assert b"tgbot_" in response.content
+        assert (await client.get("/metrics", params={"token": "s3cret"})).status_code == 200
@@ -1,4 +1,12 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from app.horo import parser
 from app.horo.parser import sanitize_for_telegram_html, truncate_text
+from app.models import CachedHoroscope
 
 
 def test_sanitize_for_telegram_html_escapes_markup() -> None:
@@ -19,3 +27,78 @@ def test_truncate_text_long_string_appends_ellipsis() -> None:
 
     assert len(result) <= 123
     assert result.endswith("...")
+
+
+@pytest.fixture
+def fake_scrape(monkeypatch):
+    """Replace the scrape with one that caches "<sign> text" after a short wait and records peak concurrency."""
+    monkeypatch.setattr(parser, "_fetches", {})
+    monkeypatch.setattr(parser, "_warm", set())
+    monkeypatch.setattr(parser, "_failed", {})
+    monkeypatch.setattr(parser, "_prefetch_slots", asyncio.Semaphore(2))
+    calls: list[str] = []
+    running = [0, 0]  # current, peak
+
+    async def scrape(sign: str) -> str:
+        calls.append(sign)
+        running[0] += 1
+        running[1] = max(running[1], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        parser._mark_warm(sign, parser._today_msk())
+        return f"{sign} text"
+
+    with patch.object(parser, "_scrape", scrape):
+        yield calls, running
+
+
+@pytest.mark.asyncio
+async def test_prefetch_skips_cached_signs_and_shares_inflight_scrapes(async_session_factory, fake_scrape) -> None:
+    calls, running = fake_scrape
+    async with async_session_factory() as db:
+        db.add(CachedHoroscope(sign="aries", date=parser._today_msk(), content="cached"))
+        await db.commit()
+
+    prefetching = asyncio.create_task(parser.prefetch(["aries", "taurus", "gemini"]))
+    while "taurus" not in parser._fetches:
+        await asyncio.sleep(0)
+    text = await parser.fetch_horoscope("taurus")
+
+    assert text == "taurus text"
+    assert await prefetching == 2
+    assert sorted(calls) == ["gemini", "taurus"]
+    assert running[1] <= 2
+    assert await parser.prefetch(["aries", "taurus", "gemini"]) == 0
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_prefetch_bounds_concurrent_scrapes(async_session_factory, fake_scrape) -> None:
+    calls, running = fake_scrape
+    signs = ["aries", "taurus", "gemini", "cancer", "leo", "virgo"]
+
+    assert await parser.prefetch(signs) == len(signs)
+    assert sorted(calls) == sorted(signs)
+    assert running[1] == 2
+
+
+@pytest.mark.asyncio
+async def test_prefetch_backs_off_from_signs_that_failed(async_session_factory, monkeypatch) -> None:
+    monkeypatch.setattr(parser, "_fetches", {})
+    monkeypatch.setattr(parser, "_warm", set())
+    monkeypatch.setattr(parser, "_failed", {})
+    monkeypatch.setattr(parser, "_prefetch_slots", asyncio.Semaphore(2))
+    requests: list[str] = []
+
+    def outage(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        return httpx.Response(503)
+
+    client = httpx.AsyncClient
+    monkeypatch.setattr(parser.httpx, "AsyncClient", lambda **kw: client(transport=httpx.MockTransport(outage), **kw))
+    with patch("app.horo.parser.asyncio.sleep", AsyncMock()):
+        assert await parser.prefetch(["aries"]) == 0
+        assert len(requests) == 3
+        assert await parser.prefetch(["aries"]) == 0
+
+    assert len(requests) == 3
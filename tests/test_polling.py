@@ -0,0 +1,51 @@
+"""Tests for the long-polling runner."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.polling import _chat_key, process_batch
+
+
+def _message(update_id: int, chat_id: int) -> dict:
+    return {"update_id": update_id, "message": {"date": 0, "chat": {"id": chat_id}, "from": {"id": chat_id}}}
+
+
+def test_chat_key_for_message_and_callback() -> None:
+    assert _chat_key(_message(1, 10)) == 10
+    assert _chat_key({"update_id": 2, "callback_query": {"from": {"id": 5}, "message": {"chat": {"id": 11}}}}) == 11
+    assert _chat_key({"update_id": 3, "callback_query": {"from": {"id": 5}}}) == 5
+
+
+@pytest.mark.asyncio
+@patch("app.polling.accept_update", new_callable=AsyncMock, return_value=True)
+async def test_process_batch_keeps_per_chat_order(mock_accept: AsyncMock) -> None:
+    """Updates of one chat run in order even when another chat is slow."""
+    seen: list[int] = []
+
+    async def fake_process(update: dict) -> None:
+        if update["update_id"] == 1:
+            await asyncio.sleep(0.01)
+        seen.append(update["update_id"])
+
+    with patch("app.polling.process_update", side_effect=fake_process):
+        failed = await process_batch([_message(3, 20), _message(2, 10), _message(1, 10)])
+
+    assert failed == []
+    assert seen.index(1) < seen.index(2)
+    assert seen[0] == 3
+
+
+@pytest.mark.asyncio
+@patch("app.polling._unmark_update_processed")
+@patch("app.polling.accept_update", new_callable=AsyncMock, return_value=True)
+async def test_process_batch_reports_failed_and_following_updates(mock_accept: AsyncMock, mock_unmark) -> None:
+    """A failure stops its chat and the failed update is unmarked for redelivery."""
+    process = AsyncMock(side_effect=[RuntimeError("boom"), None])
+
+    with patch("app.polling.process_update", process):
+        failed = await process_batch([_message(1, 10), _message(2, 10)])
+
+    assert failed == [1, 2]
+    mock_unmark.assert_called_once_with(1)
@@ -0,0 +1,85 @@
+"""Tests for the sampling profiler and event-loop lag monitor."""
+
+import asyncio
+import time
+
+import pytest
+
+from app import profiling
+from app.handlers import _parse_profile_args
+
+
+def _busy_handler(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_profile_stops_after_requests_and_collapses_stacks() -> None:
+    """A request-bounded profile should end after N updates with samples of the busy code."""
+
+    async def traffic() -> None:
+        for _ in range(3):
+            _busy_handler(0.05)
+            profiling.request_finished()
+            await asyncio.sleep(0)
+
+    profile_task = asyncio.create_task(profiling.profile(seconds=10, requests=3))
+    await asyncio.sleep(0)
+    assert profiling.is_running()
+    await traffic()
+    profile = await profile_task
+
+    assert not profiling.is_running()
+    assert profile.duration < 5
+    assert profile.samples > 0
+    lines = profile.collapsed().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any("tests.test_profiling:_busy_handler" in line for line in lines)
+    assert stack.split(";")[-1].startswith("tests.test_profiling:_busy_handler")
+
+
+@pytest.mark.asyncio
+async def test_request_finished_is_a_noop_without_profile() -> None:
+    profiling.request_finished()
+    assert not profiling.is_running()
+
+
+@pytest.mark.asyncio
+async def test_lag_monitor_reports_blocking_callback_with_stack(caplog) -> None:
+    """A callback blocking the loop should be logged once with its stack."""
+    monitor = profiling.LoopLagMonitor(threshold=0.05, interval=0.01)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.03)
+        with caplog.at_level("WARNING", logger="app.profiling"):
+            _busy_handler(0.2)
+            await asyncio.sleep(0.03)
+    finally:
+        await monitor.stop()
+
+    assert monitor.stalls == 1
+    assert any("_busy_handler" in record.getMessage() for record in caplog.records)
+    assert any("was blocked for" in record.getMessage() for record in caplog.records)
+
+
+def test_parse_profile_args() -> None:
+    assert _parse_profile_args("/profile") == (30.0, None)
+    assert _parse_profile_args("/profile 5") == (5.0, None)
+    assert _parse_profile_args("/profile 200 req") == (None, 200)
+    with pytest.raises(ValueError):
+        _parse_profile_args("/profile soon")
+    with pytest.raises(ValueError):
+        _parse_profile_args("/profile 0 req")
+    for value in ("nan", "inf", "-0"):
+        with pytest.raises(ValueError):
+            _parse_profile_args(f"/profile {value}")
+
+
+@pytest.mark.asyncio
+async def test_profile_rejects_non_finite_duration() -> None:
+    with pytest.raises(ValueError):
+        await profiling.profile(float("nan"))
+    assert profiling._active is None
@@ -0,0 +1,67 @@
+"""Query-plan checks: hot queries must not scan whole tables."""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app import analytics, handlers, repository, scheduler
+from app.updates import _mark_update_processed
+
+# Tables whose size does not grow with users; scanning them is the intended access.
+BOUNDED_TABLES = ("subscriber_counters",)
+
+
+def _full_scans(plan: list[str]) -> list[str]:
+    # "SCAN t USING [COVERING] INDEX" over a partial index only visits matching rows.
+    return [
+        line
+        for line in plan
+        if line.startswith("SCAN")
+        and "INDEX" not in line
+        and "CONSTANT" not in line
+        and line.split()[1] not in BOUNDED_TABLES
+    ]
+
+
+@pytest.mark.asyncio
+async def test_handler_and_scheduler_queries_use_indexes(async_session_factory) -> None:
+    engine = async_session_factory.kw["bind"]
+    if engine.dialect.name != "sqlite":
+        pytest.skip("EXPLAIN QUERY PLAN output is SQLite-specific")
+    statements: list[tuple[str, tuple]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany) -> None:
+        if not statement.startswith(("PRAGMA", "EXPLAIN")):
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        for telegram_id in range(1, 20):
+            await handlers._upsert_user(telegram_id, "user", "User", None)
+            await handlers._subscribe_user(telegram_id, "leo")
+        await handlers._set_joke_subscription(1, True)
+        await handlers._unsubscribe_user(2, "leo")
+        await handlers._unsubscribe_user(3, "all")
+        handlers.user_state_cache.clear()
+        await handlers._get_user_state(4)
+        await handlers._get_subscribers_stats()
+        await scheduler._load_recipients_by_sign()
+        await scheduler._load_joke_recipients()
+        await _mark_update_processed(1)
+        analytics.interaction_log.record("cb:sign", "leo", 1.0, True)
+        await analytics.interaction_log.flush()
+        async with async_session_factory.begin() as db:
+            await analytics.rollup_day(db, date.today())
+            await analytics.prune_events(db)
+            await analytics.report(db)
+        async with async_session_factory() as db:
+            await repository.get_joke_subscription(db, 1)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plan = [row[3] for row in rows]
+            assert _full_scans(plan) == [], f"{statement}\n{plan}"
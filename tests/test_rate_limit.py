@@ -0,0 +1,36 @@
+"""Tests for per-user rate limiting."""
+
+from app.rate_limit import TokenBucketLimiter, extract_user_id
+
+
+def test_extract_user_id_from_message_and_callback() -> None:
+    assert extract_user_id({"update_id": 1, "message": {"from": {"id": 5}}}) == 5
+    assert extract_user_id({"update_id": 1, "callback_query": {"from": {"id": 6}}}) == 6
+    assert extract_user_id({"update_id": 1}) is None
+
+
+def test_bucket_throttles_after_burst_and_refills() -> None:
+    """A user should get `burst` updates at once, then one per refill interval."""
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=3, idle_seconds=600)
+
+    assert [limiter.allow(1, now=0.0) for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow(1, now=0.5) is False
+    assert limiter.allow(1, now=1.1) is True
+
+
+def test_throttled_user_does_not_affect_others() -> None:
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=1, idle_seconds=600)
+
+    assert limiter.allow(1, now=0.0) is True
+    assert limiter.allow(1, now=0.0) is False
+    assert limiter.allow(2, now=0.0) is True
+
+
+def test_idle_buckets_are_evicted() -> None:
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=1, idle_seconds=10)
+    limiter.allow(1, now=0.0)
+    limiter.allow(2, now=5.0)
+
+    limiter.allow(3, now=12.0)
+
+    assert len(limiter) == 2
@@ -1,61 +1,92 @@
 """Tests for scheduler module."""
 
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, patch
 
 import pytest
 
+from app.keyboards import SIGN_BITS
+from app.models import SubscriberCounter, Subscription, User
 from app.scheduler import _load_recipients_by_sign
 
 
-@patch("app.scheduler.SessionLocal")
-def test_load_recipients_by_sign_groups_correctly(mock_session_class: MagicMock) -> None:
-    """Recipients should be grouped by zodiac sign."""
-    mock_db = MagicMock()
-    mock_session_class.return_value = mock_db
-
-    mock_db.query.return_value.join.return_value.filter.return_value.all.return_value = [
-        ("aries", 100),
-        ("aries", 101),
-        ("leo", 200),
-        ("pisces", 300),
-        ("pisces", 301),
-        ("pisces", 302),
-    ]
+async def _seed(factory, subscriptions: list[tuple[int, str, bool]]) -> None:
+    async with factory() as db:
+        users: dict[int, User] = {}
+        for telegram_id, sign, active in subscriptions:
+            if telegram_id not in users:
+                users[telegram_id] = User(telegram_id=telegram_id, sign_mask=0)
+                db.add(users[telegram_id])
+                await db.flush()
+            db.add(Subscription(user_id=users[telegram_id].id, sign=sign, active=active))
+            if active:
+                users[telegram_id].sign_mask |= SIGN_BITS[sign]
+        await db.commit()
 
-    result = _load_recipients_by_sign()
 
-    assert result == {
+@pytest.mark.asyncio
+async def test_load_recipients_by_sign_groups_correctly(async_session_factory) -> None:
+    """Recipients should be grouped by zodiac sign."""
+    await _seed(
+        async_session_factory,
+        [
+            (100, "aries", True),
+            (101, "aries", True),
+            (200, "leo", True),
+            (300, "pisces", True),
+            (301, "pisces", True),
+            (302, "pisces", True),
+            (303, "pisces", False),
+        ],
+    )
+
+    result = await _load_recipients_by_sign()
+
+    assert {sign: sorted(ids) for sign, ids in result.items()} == {
         "aries": [100, 101],
         "leo": [200],
         "pisces": [300, 301, 302],
     }
 
 
-@patch("app.scheduler.SessionLocal")
-def test_load_recipients_by_sign_handles_empty_result(mock_session_class: MagicMock) -> None:
-    """Empty database should return empty dict."""
-    mock_db = MagicMock()
-    mock_session_class.return_value = mock_db
+@pytest.mark.asyncio
+async def test_reconcile_subscriber_counters_fixes_drift(async_session_factory) -> None:
+    """The reconciler should overwrite counters that disagree with the tables."""
+    from app import repository
+    from app.scheduler import reconcile_subscriber_counters
 
-    mock_db.query.return_value.join.return_value.filter.return_value.all.return_value = []
+    await _seed(async_session_factory, [(100, "aries", True), (101, "aries", True), (102, "leo", False)])
+    async with async_session_factory() as db:
+        db.add(SubscriberCounter(name=repository.sign_counter("leo"), value=5))
+        await db.commit()
 
-    result = _load_recipients_by_sign()
+    await reconcile_subscriber_counters()
+
+    async with async_session_factory() as db:
+        assert await repository.get_subscribers_stats(db) == (2, 0, [("aries", 2)])
+        assert await repository.reconcile_counters(db) == {}
+
+
+@pytest.mark.asyncio
+async def test_load_recipients_by_sign_handles_empty_result(async_session_factory) -> None:
+    """Empty database should return empty dict."""
+    result = await _load_recipients_by_sign()
 
     assert result == {}
 
 
 @pytest.mark.asyncio
 @patch("app.scheduler.fetch_horoscope")
-@patch("app.scheduler.asyncio.to_thread")
+@patch("app.scheduler._load_recipients_by_sign", new_callable=AsyncMock)
 async def test_send_daily_distributes_to_all_recipients(
-    mock_to_thread: AsyncMock,
+    mock_load_recipients: AsyncMock,
     mock_fetch_horoscope: AsyncMock,
+    async_session_factory,
 ) -> None:
     """Daily horoscope should be sent to all subscribers."""
     from app.scheduler import send_daily
 
     mock_bot = AsyncMock()
-    mock_to_thread.return_value = {
+    mock_load_recipients.return_value = {
         "aries": [100, 101],
         "leo": [200],
     }
@@ -65,3 +96,63 @@ async def test_send_daily_distributes_to_all_recipients(
 
     assert mock_fetch_horoscope.call_count == 2
     assert mock_bot.send_message.call_count == 3
+
+
+@pytest.mark.asyncio
+@patch("app.scheduler.asyncio.sleep", new_callable=AsyncMock)
+async def test_deliver_retries_flood_control_and_counts_blocked(mock_sleep: AsyncMock) -> None:
+    """429s should be waited out and retried; Forbidden should not be retried."""
+    from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+    from aiogram.methods import SendMessage
+
+    from app.scheduler import BROADCAST_MAX_RETRIES, _deliver
+
+    method = SendMessage(chat_id=1, text="hi")
+    flood = TelegramRetryAfter(method=method, message="Flood control exceeded", retry_after=3)
+    bot = AsyncMock()
+
+    bot.send_message.side_effect = [flood, True]
+    assert await _deliver(bot, 1, "hi", "horoscope") == "sent"
+    mock_sleep.assert_awaited_once_with(3)
+
+    bot.send_message.side_effect = [flood] * (BROADCAST_MAX_RETRIES + 1)
+    assert await _deliver(bot, 1, "hi", "horoscope") == "failed"
+
+    bot.send_message.reset_mock()
+    bot.send_message.side_effect = TelegramForbiddenError(
+        method=method, message="Forbidden: bot was blocked by the user"
+    )
+    assert await _deliver(bot, 1, "hi", "joke") == "blocked"
+    assert bot.send_message.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_stopped_broadcast_resumes_after_last_recipient(async_session_factory) -> None:
+    """A broadcast stopped for shutdown should checkpoint and resume where it left off."""
+    from app import scheduler
+
+    sent: list[int] = []
+
+    async def send_message(chat_id: int, text: str) -> None:
+        sent.append(chat_id)
+        if len(sent) == 2:
+            scheduler.request_stop()
+
+    bot = AsyncMock()
+    bot.send_message.side_effect = send_message
+    recipients = AsyncMock(return_value={"leo": [300, 200], "aries": [101, 100]})
+    with (
+        patch.object(scheduler, "_stopping", False),
+        patch("app.scheduler._load_recipients_by_sign", recipients),
+        patch("app.scheduler.fetch_horoscope", AsyncMock(return_value="Test horoscope")),
+        patch("app.scheduler.fetch_random_joke", AsyncMock(return_value=None)),
+    ):
+        await scheduler.send_daily(bot)
+        assert sent == [100, 101]
+
+        scheduler._stopping = False
+        await scheduler.resume_interrupted_broadcasts(bot)
+        assert sent == [100, 101, 200, 300]
+
+        await scheduler.resume_interrupted_broadcasts(bot)
+        assert len(sent) == 4
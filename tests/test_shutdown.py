@@ -0,0 +1,47 @@
+"""Tests for graceful shutdown."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from app import scheduler, shutdown
+from app.webhook import _handle_webhook
+
+
+@pytest.fixture
+def restore_state():
+    with patch.object(shutdown, "_draining", False), patch.object(scheduler, "_stopping", False):
+        yield
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_in_flight_updates(restore_state) -> None:
+    finished: list[int] = []
+
+    async def update() -> None:
+        with shutdown.in_flight():
+            await asyncio.sleep(0.05)
+            finished.append(1)
+
+    task = asyncio.create_task(update())
+    await asyncio.sleep(0)
+    with patch("app.shutdown.close_bot", new_callable=AsyncMock) as close_bot:
+        await shutdown.drain(timeout=1)
+
+    assert task.done() and finished == [1]
+    assert shutdown.is_draining() and scheduler._stopping
+    close_bot.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_webhook_refuses_updates_while_draining(restore_state, monkeypatch) -> None:
+    monkeypatch.setenv("WEBHOOK_SECRET", "secret")
+    request = AsyncMock()
+    request.body.return_value = b'{"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": 1}}}'
+    shutdown._draining = True
+
+    with pytest.raises(HTTPException) as excinfo:
+        await _handle_webhook(request, "secret")
+    assert excinfo.value.status_code == 503
@@ -0,0 +1,102 @@
+"""Tests for request tracing."""
+
+import time
+from unittest.mock import AsyncMock, patch
+
+import orjson
+import pytest
+
+from app import tracing
+from app.handlers import setup_handlers
+from app.lazy_update import LazyUpdate
+
+
+@pytest.fixture
+def enabled():
+    tracing.clear()
+    with patch.object(tracing, "TRACING_ENABLED", True):
+        yield
+    tracing.clear()
+
+
+@tracing.traced("db lookup")
+async def _lookup() -> int:
+    with tracing.span("http GET", url="https://example.com"):
+        return 1
+
+
+@pytest.mark.asyncio
+async def test_spans_are_nested_under_the_root(enabled) -> None:
+    with tracing.trace("webhook", update_id=7):
+        assert await _lookup() == 1
+
+    (trace,) = tracing.slowest()
+    root, db, http = trace.spans
+    assert (root.name, db.name, http.name) == ("webhook", "db lookup", "http GET")
+    assert root.parent_id is None
+    assert db.parent_id == root.span_id
+    assert http.parent_id == db.span_id
+    assert root.attributes == {"update_id": 7}
+    assert root.end_ns >= http.end_ns
+
+
+@pytest.mark.asyncio
+async def test_spans_are_noops_when_disabled() -> None:
+    tracing.clear()
+    with tracing.trace("webhook") as root:
+        root.set("dropped", "stale")
+        assert tracing.span("db lookup") is tracing._NOOP
+        await _lookup()
+    assert tracing.slowest() == []
+
+
+@pytest.mark.asyncio
+async def test_only_the_slowest_traces_are_kept(enabled) -> None:
+    with patch.object(tracing, "TRACE_KEEP_SLOWEST", 2):
+        for delay in (0.03, 0.0, 0.02, 0.01):
+            with tracing.trace("webhook", delay=delay):
+                time.sleep(delay)
+
+    assert [t.root.attributes["delay"] for t in tracing.slowest()] == [0.03, 0.02]
+
+
+@pytest.mark.asyncio
+async def test_failed_span_is_marked_and_exported_as_otlp(enabled, tmp_path) -> None:
+    path = tmp_path / "traces.jsonl"
+    with patch.object(tracing, "TRACE_FILE", str(path)), patch.object(tracing, "TRACE_SAMPLE_RATE", 1.0):
+        with pytest.raises(ValueError):
+            with tracing.trace("webhook"):
+                with tracing.span("db lookup"):
+                    raise ValueError("boom")
+        assert await tracing.export_pending() == 1
+
+    (line,) = path.read_bytes().splitlines()
+    spans = orjson.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [s["name"] for s in spans] == ["webhook", "db lookup"]
+    assert spans[1]["parentSpanId"] == spans[0]["spanId"]
+    assert spans[1]["status"] == {"code": 2, "message": "ValueError: boom"}
+    assert "db lookup" in tracing.format_trace(tracing.slowest()[0])
+
+
+@pytest.mark.asyncio
+async def test_handler_and_db_helpers_are_traced(enabled, async_session_factory) -> None:
+    bot = AsyncMock()
+    update = LazyUpdate(
+        {
+            "update_id": 1,
+            "message": {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": 5, "type": "private"},
+                "from": {"id": 5, "is_bot": False, "first_name": "A"},
+                "text": "/me",
+            },
+        }
+    )
+
+    with tracing.trace("webhook"):
+        await setup_handlers(bot, update)
+
+    names = [s.name for s in tracing.slowest()[0].spans]
+    assert names[:2] == ["webhook", "handler /me"]
+    assert "db get_user_state" in names
@@ -0,0 +1,87 @@
+"""Tests for the user state cache."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app import repository
+from app.handlers import (
+    _get_joke_subscription,
+    _is_subscribed,
+    _set_joke_subscription,
+    _subscribe_user,
+)
+from app.keyboards import SIGN_BITS
+from app.user_cache import UserStateCache, user_state_cache
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    cache = UserStateCache(max_size=2, ttl=60)
+    cache.put(1, False, 0)
+    cache.put(2, False, 0)
+    cache.get(1)
+
+    cache.put(3, False, 0)
+
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.evictions == 1
+
+
+def test_cache_counts_hits_and_misses() -> None:
+    cache = UserStateCache(max_size=10, ttl=60)
+    assert cache.get(1) is None
+    cache.put(1, True, SIGN_BITS["leo"])
+
+    assert cache.get(1).sign_mask == SIGN_BITS["leo"]
+    assert cache.hit_rate == 0.5
+
+
+def test_cache_entries_expire_after_ttl() -> None:
+    cache = UserStateCache(max_size=10, ttl=0)
+    cache.put(1, True, 0)
+
+    assert cache.get(1) is None
+
+
+@pytest.mark.asyncio
+async def test_reads_after_write_are_served_from_cache(async_session_factory) -> None:
+    """Writes update the cached state so later reads skip the database."""
+    assert await _is_subscribed(5, "leo") is False
+    await _subscribe_user(5, "leo")
+    await _set_joke_subscription(5, True)
+
+    with patch("app.handlers.repository.get_user_state") as mock_load:
+        assert await _is_subscribed(5, "leo") is True
+        assert await _get_joke_subscription(5) is True
+
+    mock_load.assert_not_called()
+    assert user_state_cache.hits == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_miss_overlapping_a_write_does_not_cache_the_old_state(async_session_factory) -> None:
+    """A read that started before a subscribe commits must not cache the pre-subscribe mask."""
+    load_started, finish_load = asyncio.Event(), asyncio.Event()
+    real_load = repository.get_user_state
+    calls = 0
+
+    async def slow_first_load(db, telegram_id):
+        nonlocal calls
+        calls += 1
+        state = await real_load(db, telegram_id)
+        if calls == 1:
+            load_started.set()
+            await finish_load.wait()
+        return state
+
+    with patch("app.handlers.repository.get_user_state", slow_first_load):
+        reading = asyncio.create_task(_is_subscribed(6, "leo"))
+        await load_started.wait()
+        await _subscribe_user(6, "leo")
+        finish_load.set()
+        assert await reading is True
+
+    assert calls == 2
+    assert user_state_cache.get(6).sign_mask == SIGN_BITS["leo"]
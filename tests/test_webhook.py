@@ -1,4 +1,14 @@
-from app.webhook import _extract_update_timestamp
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.updates import _extract_update_timestamp, _mark_update_processed, accept_update
 
 
 def test_extract_update_timestamp_from_message() -> None:
@@ -14,3 +24,24 @@ def test_extract_update_timestamp_from_callback_message() -> None:
 def test_extract_update_timestamp_when_absent() -> None:
     update = {"update_id": 1}
     assert _extract_update_timestamp(update) == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_dedup_writes_do_not_hit_sqlite_lock(tmp_path) -> None:
+    # No busy timeout: any two overlapping write transactions would raise "database is locked".
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/dedup.db", connect_args={"timeout": 0})
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        with patch("app.updates.AsyncSessionLocal", factory):
+            results = await asyncio.gather(*(_mark_update_processed(update_id % 40) for update_id in range(80)))
+    finally:
+        await engine.dispose()
+    assert results.count(True) == 40
+
+
+@pytest.mark.asyncio
+@patch("app.updates._mark_update_processed", side_effect=OperationalError("INSERT", {}, Exception("locked")))
+async def test_accept_update_processes_without_dedup_when_it_fails(mock_mark) -> None:
+    assert await accept_update({"update_id": 1, "message": {"date": int(time.time())}})
@@ -0,0 +1,70 @@
+"""Tests for the group-commit write batcher."""
+
+import asyncio
+import contextlib
+
+import pytest
+
+from app.write_batcher import WriteBatcher
+
+
+class FakeTransactions:
+    def __init__(self) -> None:
+        self.opened = 0
+        self.committed: list[list[str]] = []
+
+    @contextlib.asynccontextmanager
+    async def __call__(self):
+        self.opened += 1
+        writes: list[str] = []
+        yield writes
+        self.committed.append(writes)
+
+
+def _write(value: str):
+    async def op(db: list[str]) -> str:
+        if value == "bad":
+            raise ValueError("bad write")
+        db.append(value)
+        return value.upper()
+
+    return op
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_one_commit() -> None:
+    transactions = FakeTransactions()
+    batcher = WriteBatcher(transactions, max_batch=100, max_delay=0.01)
+
+    results = await asyncio.gather(*(batcher.submit(_write(v)) for v in ("a", "b", "c")))
+
+    assert results == ["A", "B", "C"]
+    assert transactions.committed == [["a", "b", "c"]]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_flushed_without_waiting() -> None:
+    transactions = FakeTransactions()
+    batcher = WriteBatcher(transactions, max_batch=2, max_delay=10)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit(_write(v)) for v in ("a", "b", "c", "d"))), timeout=1
+    )
+
+    assert results == ["A", "B", "C", "D"]
+    assert transactions.committed == [["a", "b"], ["c", "d"]]
+
+
+@pytest.mark.asyncio
+async def test_failing_write_does_not_fail_the_batch() -> None:
+    """A failed batch is retried per operation and only the bad one raises."""
+    transactions = FakeTransactions()
+    batcher = WriteBatcher(transactions, max_batch=100, max_delay=0.01)
+
+    results = await asyncio.gather(
+        batcher.submit(_write("a")), batcher.submit(_write("bad")), batcher.submit(_write("b")), return_exceptions=True
+    )
+
+    assert results[0] == "A" and results[2] == "B"
+    assert isinstance(results[1], ValueError)
+    assert transactions.committed == [["a"], ["b"]]